@@ -2,14 +2,18 @@ import os
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
-from flask import Flask, request, jsonify
-import tempfile, os, json, re
-
-from chains.crop_chain import recommend_crop
-from chains.soil_chain import analyze_soil
-from chains.irrigation_chain import analyze_irrigation
-from chains.disease_chain import analyze_leaf
-from chains.qna_chain import krishimitra_answer
+from flask import Flask, Request, Response, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+import io
+
+from chains.crop_chain import recommend_crop, recommend_crop_stream
+from chains.soil_chain import analyze_soil, analyze_soil_stream
+from chains.irrigation_chain import analyze_irrigation, analyze_irrigation_plots, analyze_irrigation_stream
+from chains.qna_chain import FALLBACK_ANSWER, krishimitra_answer, krishimitra_answer_stream, answer_cache
+from chains.router import BATCH_MAX_ITEMS, detect_module, dispatch_batch
+from services import advisory_store, crop_suitability, geocoding, knowledge_base, llm_gateway, metrics, open_meteo, remedy_store, response_cache
+from services.log import get_logger
+from services.streaming import SSE_HEADERS, sse_stream, wants_stream
 
 import warnings
 from dotenv import load_dotenv
@@ -17,16 +21,64 @@ from flask_cors import CORS
 
 load_dotenv()
 API_KEY = os.getenv("KRISHIMITRA_API_KEY")
+log = get_logger("app")
 
 warnings.filterwarnings("ignore")
 
+# "full" serves every module; "text" never imports the vision stack (no torch).
+PROFILE = os.getenv("KRISHIMITRA_PROFILE", "full")
+# Set by gunicorn.conf.py: the master loads the weights, each worker warms up after fork.
+PRELOAD = os.getenv("KRISHIMITRA_PRELOAD", "0") == "1"
+disease_chain = None
+if PROFILE != "text":
+    from chains import disease_chain
+    if PRELOAD:
+        disease_chain.preload()
+    elif os.getenv("KRISHIMITRA_WARMUP", "1") == "1":
+        disease_chain.start_warmup()
+
+UPLOAD_LIMIT_MB = int(os.getenv("KRISHIMITRA_UPLOAD_LIMIT_MB", "16"))
+
+
+class InMemoryRequest(Request):
+    """Werkzeug spools uploads over 500 KB to a temp file; leaf photos stay in memory."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
 app = Flask(__name__)
+app.request_class = InMemoryRequest
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_LIMIT_MB * 1024 * 1024
 CORS(app)
 
+CHAINS = {
+    "irrigation_chain": analyze_irrigation,
+    "irrigation_plots": analyze_irrigation_plots,
+    "soil_chain": analyze_soil,
+    "crop_chain": recommend_crop,
+}
+
+# Opt-in SSE mode: {"stream": true}, ?stream=1 or Accept: text/event-stream
+STREAM_CHAINS = {
+    "qna_chain": lambda data: krishimitra_answer_stream(data["query"]),
+    "irrigation_chain": analyze_irrigation_stream,
+    "soil_chain": analyze_soil_stream,
+    "crop_chain": recommend_crop_stream,
+}
+
+
+def stream_response(module, events):
+    return Response(
+        stream_with_context(sse_stream(module, events)),
+        mimetype="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 
 @app.before_request
 def verify_api_key():
-    if request.path in ["/", "/health"]:
+    if request.path in ["/", "/health", "/health/live", "/health/ready", "/metrics"]:
         return
     client_key = request.headers.get("x-api-key") or request.args.get("api_key")
     if not client_key or client_key != API_KEY:
@@ -34,64 +86,149 @@ def verify_api_key():
 
 
 @app.route("/health", methods=["GET"])
+@app.route("/health/live", methods=["GET"])
 def health():
     return "OK", 200
 
 
+@app.route("/health/ready", methods=["GET"])
+def ready():
+    vision = disease_chain.model_status() if disease_chain else {"state": "disabled", "ready": True}
+    status = {"ready": vision["ready"], "profile": PROFILE, "vision_model": vision}
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "geocoding": geocoding.stats(),
+        "forecast_cells": open_meteo.stats(),
+        "llm": llm_gateway.stats(),
+        "qna_answers": answer_cache.stats(),
+        "knowledge_base": knowledge_base.stats(),
+        "crop_advisories": advisory_store.stats(),
+        "disease_batcher": disease_chain.batcher.stats() if disease_chain and disease_chain.batcher else None,
+        "remedies": remedy_store.stats() if disease_chain else None,
+        "responses": response_cache.stats(),
+    })
+
+
 @app.route("/", methods=["GET"])
 def home():
     return jsonify({
         "message": "🌾 KrishiMitra Unified Flask API is running successfully!",
-        "endpoints": ["/krishimitra (POST)"],
+        "endpoints": ["/krishimitra (GET, POST)", "/krishimitra/batch (POST)"],
         "note": "Include your x-api-key header in every request."
     })
 
 
-@app.route("/krishimitra", methods=["POST"])
+def handle_payload(data: dict) -> dict:
+    """Route one JSON payload to its chain and build the response body."""
+    module = detect_module(data)
+
+    if module == "qna_chain":
+        with metrics.track(module):
+            answer = krishimitra_answer(data["query"])
+        if answer == FALLBACK_ANSWER:
+            return {"module": module, "answer": answer, "degraded": True}
+        return {"module": module, "answer": answer}
+
+    if module:
+        with metrics.track(module):
+            result = CHAINS[module](data)
+        return {"module": module, "result": result}
+
+    return {"error": "Invalid input — please provide a valid image, query, or structured data."}
+
+
+def cached_json(data: dict):
+    """handle_payload() behind the response cache, with ETag / Cache-Control headers."""
+    module = detect_module(data)
+    key = response_cache.key_for(module, data)
+    if key is None:
+        return jsonify(handle_payload(data))
+
+    mode = response_cache.mode(data, request.headers)
+    entry = response_cache.get(key) if mode == "use" else None
+    state = "HIT" if entry else ("MISS" if mode == "use" else "BYPASS")
+    if entry is None:
+        body = handle_payload(data)
+        if not response_cache.cacheable(body):
+            return jsonify(body)
+        entry = response_cache.put(key, module, body, store=mode != "skip")
+
+    headers = response_cache.headers(entry, state)
+    if request.method in ("GET", "HEAD") and request.if_none_match.contains(entry["etag"]):
+        return Response(status=304, headers=headers)
+    return jsonify(entry["body"]), 200, headers
+
+
+@app.route("/krishimitra", methods=["GET", "POST"])
 def krishimitra_api():
     """
     🔹 Single endpoint that automatically detects which AI chain to use:
       - Image → Disease detection
       - Query text → Q&A
       - city + crop + soil_type → Irrigation
+      - plots: [{city, crop, soil_type}, ...] → Irrigation for every plot
       - crop + location → Soil
       - location + season → Crop
+    GET with the same fields as query parameters is cacheable by clients / CDNs.
     """
     try:
         if "file" in request.files:
-            file = request.files["file"]
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-                file.save(tmp.name)
-                result = analyze_leaf(tmp.name)
-            os.remove(tmp.name)
+            if disease_chain is None:
+                return jsonify({"error": "Leaf disease detection is not enabled on this worker."}), 503
+            source = request.files["file"].stream
+            if wants_stream(request.form, request.args, request.headers):
+                return stream_response("disease_chain", disease_chain.analyze_leaf_stream(source))
+            with metrics.track("disease_chain"):
+                result = disease_chain.analyze_leaf(source)
             return jsonify({"module": "disease_chain", "result": result})
 
-        data = request.get_json(silent=True) or request.form.to_dict()
-        print("[DEBUG] Received:", data)
-
-        if "query" in data:
-            answer = krishimitra_answer(data["query"])
-            return jsonify({"module": "qna_chain", "answer": answer})
-
-        if all(k in data for k in ["city", "crop", "soil_type"]):
-            result = analyze_irrigation(data)
-            return jsonify({"module": "irrigation_chain", "result": result})
-
-        if all(k in data for k in ["crop", "location"]):
-            result = analyze_soil(data)
-            return jsonify({"module": "soil_chain", "result": result})
+        if request.method == "GET":
+            data = {k: v for k, v in request.args.items() if k != "api_key"}
+        else:
+            data = request.get_json(silent=True) or request.form.to_dict()
+        log.debug("Received payload with keys %s", sorted(data))
 
-        if all(k in data for k in ["location", "season"]):
-            result = recommend_crop(data)
-            return jsonify({"module": "crop_chain", "result": result})
+        module = detect_module(data)
+        if module in STREAM_CHAINS and wants_stream(data, request.args, request.headers):
+            return stream_response(module, STREAM_CHAINS[module](data))
 
-        return jsonify({"error": "Invalid input — please provide a valid image, query, or structured data."})
+        return cached_json(data)
 
+    except (geocoding.LocationNotFound, crop_suitability.UnknownSeason) as e:
+        return jsonify({"error": str(e)}), 422
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Upload larger than {UPLOAD_LIMIT_MB} MB."}), 413
     except Exception as e:
-        print("[ERROR]", e)
+        log.error("Request failed: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/krishimitra/batch", methods=["POST"])
+def krishimitra_batch():
+    """
+    Many advisory payloads in one call (field-agent sync):
+      {"items": [{"query": ...}, {"location": ..., "season": ...}, ...]}
+    Results come back in input order; a failing item only fails its own slot.
+    """
+    body = request.get_json(silent=True)
+    items = body.get("items") if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Send a JSON list of payloads, or {\"items\": [...]}."}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Batch too large — max {BATCH_MAX_ITEMS} items."}), 413
+
+    return jsonify({"results": dispatch_batch(items, handle_payload)})
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
     app.run(host="0.0.0.0", port=port, debug=False)
@@ -0,0 +1,237 @@
+"""
+Async serving mode for KrishiMitra.
+
+Same routes and payloads as app.py, but every network wait (Groq,
+Open-Meteo, geocoding) is awaited instead of blocking a worker, so one
+process can hold hundreds of in-flight requests:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 10000
+"""
+
+import os
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
+os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
+
+import io
+import warnings
+from quart import Quart, Request, Response, request, jsonify
+from quart.formparser import FormDataParser
+from quart_cors import cors
+from dotenv import load_dotenv
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from chains.crop_chain import recommend_crop_async, recommend_crop_stream
+from chains.soil_chain import analyze_soil_async, analyze_soil_stream
+from chains.irrigation_chain import analyze_irrigation_async, analyze_irrigation_plots_async, analyze_irrigation_stream
+from chains.qna_chain import FALLBACK_ANSWER, krishimitra_answer_async, krishimitra_answer_stream, answer_cache
+from chains.router import BATCH_MAX_ITEMS, detect_module, dispatch_batch_async
+from services import advisory_store, crop_suitability, geocoding, knowledge_base, llm_gateway, metrics, open_meteo, remedy_store, response_cache
+from services.log import get_logger
+from services.streaming import SSE_HEADERS, iterate_in_thread, sse_stream, wants_stream
+
+load_dotenv()
+API_KEY = os.getenv("KRISHIMITRA_API_KEY")
+log = get_logger("asgi")
+
+warnings.filterwarnings("ignore")
+
+# "full" serves every module; "text" never imports the vision stack (no torch).
+PROFILE = os.getenv("KRISHIMITRA_PROFILE", "full")
+# Set by gunicorn.conf.py: the master loads the weights, each worker warms up after fork.
+PRELOAD = os.getenv("KRISHIMITRA_PRELOAD", "0") == "1"
+disease_chain = None
+if PROFILE != "text":
+    from chains import disease_chain
+    if PRELOAD:
+        disease_chain.preload()
+    elif os.getenv("KRISHIMITRA_WARMUP", "1") == "1":
+        disease_chain.start_warmup()
+
+UPLOAD_LIMIT_MB = int(os.getenv("KRISHIMITRA_UPLOAD_LIMIT_MB", "16"))
+
+
+class InMemoryFormDataParser(FormDataParser):
+    """Werkzeug spools uploads over 500 KB to a temp file; leaf photos stay in memory."""
+
+    def __init__(self, **kwargs):
+        super().__init__(stream_factory=lambda *args, **kw: io.BytesIO(), **kwargs)
+
+
+class InMemoryRequest(Request):
+    form_data_parser_class = InMemoryFormDataParser
+
+
+app = cors(Quart(__name__))
+app.request_class = InMemoryRequest
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_LIMIT_MB * 1024 * 1024
+
+CHAINS = {
+    "irrigation_chain": analyze_irrigation_async,
+    "irrigation_plots": analyze_irrigation_plots_async,
+    "soil_chain": analyze_soil_async,
+    "crop_chain": recommend_crop_async,
+}
+
+# Opt-in SSE mode. Groq's streaming iterator is blocking, so each chunk
+# is pulled on a worker thread while the event loop keeps serving others.
+STREAM_CHAINS = {
+    "qna_chain": lambda data: krishimitra_answer_stream(data["query"]),
+    "irrigation_chain": analyze_irrigation_stream,
+    "soil_chain": analyze_soil_stream,
+    "crop_chain": recommend_crop_stream,
+}
+
+
+def stream_response(module, events):
+    return Response(iterate_in_thread(sse_stream(module, events)), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.before_request
+async def verify_api_key():
+    if request.path in ["/", "/health", "/health/live", "/health/ready", "/metrics"]:
+        return
+    client_key = request.headers.get("x-api-key") or request.args.get("api_key")
+    if not client_key or client_key != API_KEY:
+        return jsonify({"error": "Unauthorized — invalid or missing API key."}), 401
+
+
+@app.route("/health", methods=["GET"])
+@app.route("/health/live", methods=["GET"])
+async def health():
+    return "OK", 200
+
+
+@app.route("/health/ready", methods=["GET"])
+async def ready():
+    vision = disease_chain.model_status() if disease_chain else {"state": "disabled", "ready": True}
+    status = {"ready": vision["ready"], "profile": PROFILE, "vision_model": vision}
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@app.route("/metrics", methods=["GET"])
+async def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/stats", methods=["GET"])
+async def stats():
+    return jsonify({
+        "geocoding": geocoding.stats(),
+        "forecast_cells": open_meteo.stats(),
+        "llm": llm_gateway.stats(),
+        "qna_answers": answer_cache.stats(),
+        "knowledge_base": knowledge_base.stats(),
+        "crop_advisories": advisory_store.stats(),
+        "disease_batcher": disease_chain.batcher.stats() if disease_chain and disease_chain.batcher else None,
+        "remedies": remedy_store.stats() if disease_chain else None,
+        "responses": response_cache.stats(),
+    })
+
+
+@app.route("/", methods=["GET"])
+async def home():
+    return jsonify({
+        "message": "🌾 KrishiMitra Unified ASGI API is running successfully!",
+        "endpoints": ["/krishimitra (GET, POST)", "/krishimitra/batch (POST)"],
+        "note": "Include your x-api-key header in every request."
+    })
+
+
+async def handle_payload(data: dict) -> dict:
+    """Route one JSON payload to its chain and build the response body."""
+    module = detect_module(data)
+
+    if module == "qna_chain":
+        with metrics.track(module):
+            answer = await krishimitra_answer_async(data["query"])
+        if answer == FALLBACK_ANSWER:
+            return {"module": module, "answer": answer, "degraded": True}
+        return {"module": module, "answer": answer}
+
+    if module:
+        with metrics.track(module):
+            result = await CHAINS[module](data)
+        return {"module": module, "result": result}
+
+    return {"error": "Invalid input — please provide a valid image, query, or structured data."}
+
+
+async def cached_json(data: dict):
+    """handle_payload() behind the response cache, with ETag / Cache-Control headers."""
+    module = detect_module(data)
+    key = response_cache.key_for(module, data)
+    if key is None:
+        return jsonify(await handle_payload(data))
+
+    mode = response_cache.mode(data, request.headers)
+    entry = await response_cache.get_async(key) if mode == "use" else None
+    state = "HIT" if entry else ("MISS" if mode == "use" else "BYPASS")
+    if entry is None:
+        body = await handle_payload(data)
+        if not response_cache.cacheable(body):
+            return jsonify(body)
+        entry = await response_cache.put_async(key, module, body, store=mode != "skip")
+
+    headers = response_cache.headers(entry, state)
+    if request.method in ("GET", "HEAD") and request.if_none_match.contains(entry["etag"]):
+        return Response(status=304, headers=headers)
+    return jsonify(entry["body"]), 200, headers
+
+
+@app.route("/krishimitra", methods=["GET", "POST"])
+async def krishimitra_api():
+    """Async twin of app.krishimitra_api — same routing rules and response shapes."""
+    try:
+        files = await request.files
+        if "file" in files:
+            if disease_chain is None:
+                return jsonify({"error": "Leaf disease detection is not enabled on this worker."}), 503
+            source = files["file"].stream
+            if wants_stream(await request.form, request.args, request.headers):
+                return stream_response("disease_chain", disease_chain.analyze_leaf_stream(source))
+            with metrics.track("disease_chain"):
+                result = await disease_chain.analyze_leaf_async(source)
+            return jsonify({"module": "disease_chain", "result": result})
+
+        if request.method == "GET":
+            data = {k: v for k, v in request.args.items() if k != "api_key"}
+        else:
+            data = await request.get_json(silent=True) or (await request.form).to_dict()
+        log.debug("Received payload with keys %s", sorted(data))
+
+        module = detect_module(data)
+        if module in STREAM_CHAINS and wants_stream(data, request.args, request.headers):
+            return stream_response(module, STREAM_CHAINS[module](data))
+
+        return await cached_json(data)
+
+    except (geocoding.LocationNotFound, crop_suitability.UnknownSeason) as e:
+        return jsonify({"error": str(e)}), 422
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Upload larger than {UPLOAD_LIMIT_MB} MB."}), 413
+    except Exception as e:
+        log.error("Request failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/krishimitra/batch", methods=["POST"])
+async def krishimitra_batch():
+    """
+    Many advisory payloads in one call (field-agent sync):
+      {"items": [{"query": ...}, {"location": ..., "season": ...}, ...]}
+    Results come back in input order; a failing item only fails its own slot.
+    """
+    body = await request.get_json(silent=True)
+    items = body.get("items") if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Send a JSON list of payloads, or {\"items\": [...]}."}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Batch too large — max {BATCH_MAX_ITEMS} items."}), 413
+
+    return jsonify({"results": await dispatch_batch_async(items, handle_payload)})
+
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(os.environ.get("PORT", 10000))
+    uvicorn.run(app, host="0.0.0.0", port=port)
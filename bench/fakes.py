@@ -0,0 +1,225 @@
+"""
+Local stand-ins for every external service, for benchmarks and load tests.
+
+    python -m bench.fakes --port 8765 --latency groq=0.8,open_meteo=0.15 --errors groq=0.02
+
+One HTTP server answers all of them, replaying the responses in
+bench/fixtures/ (swap in captured responses to change what is replayed):
+
+    /openai/v1/chat/completions   Groq / OpenAI-compatible chat (plain and stream=true)
+    /openai/v1/models             Groq model list (the gateway's keep-alive ping)
+    /v1/forecast                  Open-Meteo forecast (comma-separated coordinates answer with a list)
+    /v1/search                    Open-Meteo geocoding
+    /search                       Nominatim
+
+Point the app at it with the variables printed on startup (GROQ_BASE_URL,
+OPEN_METEO_FORECAST_URL, OPEN_METEO_GEOCODING_URL, NOMINATIM_URL).
+Latency is the mean per call (uniform jitter of ±50%); a failed call
+returns 429 with Retry-After for Groq and 503 for the others.
+"""
+
+import os, sys, json, time, uuid, zlib, random, datetime, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+SERVICES = ("groq", "open_meteo", "geocoding", "nominatim")
+
+
+def _fixture(name: str):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_rates(text: str) -> dict:
+    """'groq=0.8,open_meteo=0.1' -> {"groq": 0.8, "open_meteo": 0.1}"""
+    rates = {}
+    for part in filter(None, (text or "").split(",")):
+        name, _, value = part.partition("=")
+        if name.strip() not in SERVICES:
+            raise ValueError(f"Unknown service '{name.strip()}' (expected one of {', '.join(SERVICES)})")
+        rates[name.strip()] = float(value)
+    return rates
+
+
+class Replay:
+    """Fixture data plus the latency / error profile of each service."""
+
+    def __init__(self, latency=None, errors=None, seed=None):
+        self.latency = latency or {}
+        self.errors = errors or {}
+        self.random = random.Random(seed)
+        self.groq = _fixture("groq.json")
+        self.forecast = _fixture("open_meteo_forecast.json")
+        self.places = _fixture("places.json")
+        self.calls = {name: 0 for name in SERVICES}
+        self._lock = threading.Lock()
+
+    def begin(self, service: str) -> bool:
+        """Count the call and sleep its latency; False means answer with an error."""
+        with self._lock:
+            self.calls[service] += 1
+            delay = self.latency.get(service, 0.0) * self.random.uniform(0.5, 1.5)
+            failed = self.random.random() < self.errors.get(service, 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        return not failed
+
+    def chat_reply(self, messages) -> str:
+        prompt = " ".join(str(m.get("content", "")) for m in messages or [])
+        for reply in self.groq["replies"]:
+            if reply["match"] in prompt:
+                return reply["content"]
+        return self.groq["default"]
+
+    def place(self, name: str):
+        """Known cities from places.json; anything else lands at a stable point inside India."""
+        key = name.strip().casefold().split(",")[0]
+        if key in self.places:
+            return self.places[key]
+        h = zlib.crc32(key.encode("utf-8"))
+        return [round(8 + (h % 2700) / 100, 4), round(69 + (h // 2700 % 2700) / 100, 4)]
+
+    def forecast_for(self, lat: float, lon: float) -> dict:
+        data = json.loads(json.dumps(self.forecast))
+        data["latitude"], data["longitude"] = lat, lon
+        today = datetime.date.today()
+        data["daily"]["time"] = [str(today + datetime.timedelta(days=i)) for i in range(len(data["daily"]["time"]))]
+        data["current"]["time"] = today.isoformat() + "T06:00"
+        return data
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    replay: Replay = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path in ("/openai/v1/models", "/v1/models"):
+            if not self.replay.begin("groq"):
+                return self._send(429, {"error": {"message": "Rate limit reached (fake)"}}, {"Retry-After": "1"})
+            return self._send(200, {"object": "list", "data": [
+                {"id": self.replay.groq["model"], "object": "model", "created": 0, "owned_by": "fake"},
+            ]})
+        service = {"/v1/forecast": "open_meteo", "/v1/search": "geocoding", "/search": "nominatim"}.get(url.path)
+        if service is None:
+            return self._send(404, {"error": f"No fake for GET {url.path}"})
+        if not self.replay.begin(service):
+            return self._send(503, {"error": True, "reason": "fake outage"})
+
+        if service == "open_meteo":
+            coords = list(zip(query["latitude"].split(","), query["longitude"].split(",")))
+            forecasts = [self.replay.forecast_for(float(lat), float(lon)) for lat, lon in coords]
+            return self._send(200, forecasts if len(forecasts) > 1 else forecasts[0])
+        name = query.get("name") or query.get("q") or ""
+        lat, lon = self.replay.place(name)
+        if service == "geocoding":
+            return self._send(200, {"results": [{"name": name, "latitude": lat, "longitude": lon, "country": "India"}]})
+        return self._send(200, [{"display_name": name, "lat": str(lat), "lon": str(lon)}])
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ("/openai/v1/chat/completions", "/v1/chat/completions"):
+            return self._send(404, {"error": f"No fake for POST {url.path}"})
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if not self.replay.begin("groq"):
+            return self._send(
+                429, {"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_exceeded"}},
+                {"Retry-After": "1"},
+            )
+
+        content = self.replay.chat_reply(body.get("messages"))
+        usage = dict(self.replay.groq["usage"], total_tokens=sum(self.replay.groq["usage"].values()))
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "created": int(time.time()),
+            "model": body.get("model") or self.replay.groq["model"],
+        }
+        if not body.get("stream"):
+            return self._send(200, dict(
+                base, object="chat.completion", usage=usage,
+                choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            ))
+        self._stream(base, content, usage)
+
+    def _stream(self, base: dict, content: str, usage: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta, finish=None, **extra):
+            event = dict(base, object="chat.completion.chunk", **extra,
+                         choices=[{"index": 0, "delta": delta, "finish_reason": finish}])
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+
+        chunk({"role": "assistant", "content": ""})
+        words = content.split(" ")
+        for i in range(0, len(words), 4):
+            chunk({"content": " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")})
+        chunk({}, "stop", x_groq={"usage": usage})
+        self._write_chunk("data: [DONE]\n\n")
+        self._write_chunk("")
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def serve(port: int = 0, latency=None, errors=None, seed=None):
+    """Start the fakes on a background thread. -> (server, base_url)"""
+    handler = type("FakeHandler", (Handler,), {"replay": Replay(latency, errors, seed)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bench-fakes", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def app_env(base_url: str) -> dict:
+    """Environment that points every chain at the fakes."""
+    return {
+        "GROQ_BASE_URL": base_url,
+        "GROQ_API_KEY": os.getenv("GROQ_API_KEY") or "bench",
+        "OPEN_METEO_FORECAST_URL": f"{base_url}/v1/forecast",
+        "OPEN_METEO_GEOCODING_URL": f"{base_url}/v1/search",
+        "NOMINATIM_URL": f"{base_url}/search",
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Groq / Open-Meteo / Nominatim for benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="", help="mean seconds per call, e.g. groq=0.8,open_meteo=0.15")
+    parser.add_argument("--errors", default="", help="error rate per service, e.g. groq=0.02")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server, base_url = serve(args.port, parse_rates(args.latency), parse_rates(args.errors), args.seed)
+    for name, value in app_env(base_url).items():
+        print(f"export {name}={value}")
+    print(f"# fakes listening on {base_url} — Ctrl+C to stop", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
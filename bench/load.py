@@ -0,0 +1,241 @@
+"""
+Load scenarios against /krishimitra, one module at a time.
+
+    # start the fakes and the app with them, run every module, save the report
+    python -m bench.load --app "gunicorn -w 2 -b 127.0.0.1:5055 app:app" \\
+        --url http://127.0.0.1:5055 --latency groq=0.8,open_meteo=0.15 --json runs/new.json
+
+    # same scenarios, compared with an earlier run
+    python -m bench.load --app "..." --url ... --json runs/new.json --compare runs/base.json
+
+Without --app the server at --url must already use the fakes (see
+`python -m bench.fakes`). Each module reports throughput and p50/p95/p99
+latency; --cold makes every payload unique so the caches cannot answer.
+The app started by --app gets fresh cache files and no GPU, so leaf
+uploads run through detect_disease on CPU.
+"""
+
+import os, io, sys, json, time, shlex, signal, argparse, tempfile, subprocess, threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+from bench import fakes
+
+MODULES = ["qna", "crop", "soil", "irrigation", "disease"]
+CITIES = ["Jaipur", "Pune", "Lucknow", "Indore", "Nagpur", "Patna", "Ludhiana", "Nashik"]
+CROPS = [("wheat", "loamy"), ("rice", "clay"), ("cotton", "black"), ("maize", "sandy loam")]
+SEASONS = ["Kharif", "Rabi", "Zaid"]
+QUERIES = [
+    "Gehu ki buwai kab karein?",
+    "Dhan me kitna urea dalna chahiye?",
+    "Tamatar me patte peele ho rahe hain, kya karein?",
+    "Sarson ke liye sabse achhi khaad kaunsi hai?",
+    "Kapas me sinchai kitne din me karein?",
+]
+
+
+def payload(module: str, i: int, cold: bool):
+    """-> (json body or None, files or None) for request number i."""
+    city = CITIES[i % len(CITIES)] + (f" {i}" if cold else "")
+    crop, soil = CROPS[i % len(CROPS)]
+    if module == "qna":
+        query = QUERIES[i % len(QUERIES)]
+        return {"query": f"{query} ({i})" if cold else query}, None
+    if module == "crop":
+        return {"location": city, "season": SEASONS[i % len(SEASONS)]}, None
+    if module == "soil":
+        return {"location": city, "crop": crop}, None
+    if module == "irrigation":
+        return {"city": city, "crop": crop, "soil_type": soil}, None
+    return None, {"file": (f"leaf_{i}.jpg", LEAVES[i % len(LEAVES)], "image/jpeg")}
+
+
+def leaf_images(folder=None, count=4):
+    """JPEG bytes from `folder`, or synthetic green leaves when none is given."""
+    if folder:
+        names = sorted(n for n in os.listdir(folder) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+        if names:
+            images = []
+            for name in names:
+                with open(os.path.join(folder, name), "rb") as f:
+                    images.append(f.read())
+            return images
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        pixels = rng.normal((70, 140, 60), 30, size=(256, 256, 3)).clip(0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+LEAVES = []
+_local = threading.local()
+
+
+def _session():
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def send(url: str, headers: dict, module: str, i: int, cold: bool, timeout: float):
+    """-> (seconds, ok)"""
+    body, files = payload(module, i, cold)
+    started = time.perf_counter()
+    try:
+        if files:
+            r = _session().post(url, files=files, headers=headers, timeout=timeout)
+        else:
+            r = _session().post(url, json=body, headers=headers, timeout=timeout)
+        ok = r.status_code == 200 and "error" not in r.json()
+    except (requests.RequestException, ValueError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run_scenario(url, headers, module, requests_n, concurrency, warmup, cold, timeout):
+    for i in range(warmup):
+        send(url, headers, module, -1 - i, False, timeout)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: send(url, headers, module, i, cold, timeout), range(requests_n)))
+    wall = time.perf_counter() - started
+
+    latency = np.array([s for s, _ in results]) * 1000
+    errors = sum(1 for _, ok in results if not ok)
+    p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+    return {
+        "requests": requests_n,
+        "errors": errors,
+        "rps": round(requests_n / wall, 2),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "mean_ms": round(float(latency.mean()), 1),
+    }
+
+
+def start_app(command: str, url: str, env: dict, timeout: float):
+    process = subprocess.Popen(shlex.split(command), env=dict(os.environ, **env))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode}")
+        try:
+            if requests.get(f"{url}/health/ready", timeout=2).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    stop_app(process)
+    raise RuntimeError(f"App at {url} not ready after {timeout:.0f}s")
+
+
+def stop_app(process):
+    # SIGINT is gunicorn's quick shutdown; TERM would wait out idle keep-alive connections.
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def print_report(results: dict, baseline=None):
+    columns = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"]
+    print(f"{'module':<12}" + "".join(f"{c:>16}" for c in columns))
+    for module, row in results.items():
+        cells = []
+        for c in columns:
+            cell = f"{row[c]}"
+            old = (baseline or {}).get(module, {}).get(c)
+            if old and c not in ("requests", "errors"):
+                cell += f" ({(row[c] - old) / old * 100:+.0f}%)"
+            cells.append(f"{cell:>16}")
+        print(f"{module:<12}" + "".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KrishiMitra load scenarios")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--modules", default=",".join(MODULES))
+    parser.add_argument("--requests", type=int, default=200, help="requests per module")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests per module")
+    parser.add_argument("--cold", action="store_true", help="unique payloads, so caches never answer")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--images", help="folder of leaf images (default: synthetic leaves)")
+    parser.add_argument("--app", help="command that starts the app; it is pointed at the fakes")
+    parser.add_argument("--latency", default="", help="fake latency per service, e.g. groq=0.8,open_meteo=0.15")
+    parser.add_argument("--errors", default="", help="fake error rate per service, e.g. groq=0.02")
+    parser.add_argument("--ready-timeout", type=float, default=180)
+    parser.add_argument("--json", help="write the report here")
+    parser.add_argument("--compare", help="earlier --json report to diff against")
+    args = parser.parse_args(argv)
+
+    url = args.url.rstrip("/")
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    unknown = set(modules) - set(MODULES)
+    if unknown:
+        parser.error(f"unknown module(s): {', '.join(sorted(unknown))}")
+    api_key = os.getenv("KRISHIMITRA_API_KEY") or "bench"
+    headers = {"x-api-key": api_key}
+    if "disease" in modules:
+        LEAVES.extend(leaf_images(args.images))
+
+    process = server = None
+    if args.app:
+        server, base_url = fakes.serve(0, fakes.parse_rates(args.latency), fakes.parse_rates(args.errors), seed=0)
+        scratch = tempfile.mkdtemp(prefix="krishimitra-bench-")
+        env = dict(
+            fakes.app_env(base_url),
+            KRISHIMITRA_API_KEY=api_key,
+            GROQ_RPM=os.getenv("GROQ_RPM", "100000"),   # the fakes have no quota
+            CUDA_VISIBLE_DEVICES="",
+            GEOCODE_CACHE_DB=os.path.join(scratch, "geocode.sqlite3"),
+            QNA_CACHE_DB=os.path.join(scratch, "answers.sqlite3"),
+            LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+        )
+        process = start_app(args.app, url, env, args.ready_timeout)
+
+    results = {}
+    try:
+        for module in modules:
+            results[module] = run_scenario(
+                f"{url}/krishimitra", headers, module,
+                args.requests, args.concurrency, args.warmup, args.cold, args.timeout,
+            )
+            print(f"{module}: {json.dumps(results[module])}", file=sys.stderr)
+    finally:
+        if process:
+            stop_app(process)
+        if server:
+            server.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.json:
+        report = {
+            "when": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+            "results": results,
+        }
+        folder = os.path.dirname(args.json)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(r["errors"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Per-worker memory of a gunicorn deployment, with and without --preload.
+
+    python -m bench.memory --workers 4 --uploads 20
+    python -m bench.memory --workers 4 --modes preload --json runs/memory.json
+
+Each mode starts `gunicorn app:app` (gunicorn.conf.py, pointed at the
+fakes), waits until every worker is warm, sends leaf uploads so inference
+has run in the workers, then reads /proc/<pid>/smaps_rollup (Linux) for
+the master and every worker:
+
+    rss   resident pages, shared ones counted in full
+    pss   shared pages split between the processes sharing them
+    uss   pages private to the process — what another worker really adds
+
+The sum of PSS is the deployment's real footprint.
+"""
+
+import os, sys, json, time, argparse, tempfile
+
+import requests
+
+from bench import fakes
+from bench.load import leaf_images, start_app, stop_app
+
+MODES = {"preload": "1", "no-preload": "0"}
+
+
+def smaps(pid: int) -> dict:
+    """-> {"rss", "pss", "uss"} in MB for one process."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            parts = rest.split()
+            if len(parts) == 2 and parts[1] == "kB":
+                fields[name] = int(parts[0]) / 1024
+    return {
+        "rss": round(fields.get("Rss", 0), 1),
+        "pss": round(fields.get("Pss", 0), 1),
+        "uss": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+    }
+
+
+def children(pid: int):
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+
+def measure(mode: str, workers: int, uploads: int, port: int, settle: float, ready_timeout: float) -> dict:
+    server, base_url = fakes.serve(0)
+    url = f"http://127.0.0.1:{port}"
+    scratch = tempfile.mkdtemp(prefix="krishimitra-memory-")
+    env = dict(
+        fakes.app_env(base_url),
+        KRISHIMITRA_API_KEY="bench",
+        GUNICORN_PRELOAD=MODES[mode],
+        WEB_CONCURRENCY=str(workers),
+        CUDA_VISIBLE_DEVICES="",
+        GEOCODE_CACHE_DB=os.path.join(scratch, "geocode.sqlite3"),
+        QNA_CACHE_DB=os.path.join(scratch, "answers.sqlite3"),
+        LOG_LEVEL="WARNING",
+    )
+    process = start_app(f"gunicorn -b 127.0.0.1:{port} app:app", url, env, ready_timeout)
+    try:
+        # /health/ready only proves one worker is warm; give the others time too.
+        time.sleep(settle)
+        leaves = leaf_images()
+        session = requests.Session()
+        for i in range(uploads):
+            session.post(f"{url}/krishimitra", headers={"x-api-key": "bench"},
+                         files={"file": (f"leaf_{i}.jpg", leaves[i % len(leaves)], "image/jpeg")}, timeout=60)
+        time.sleep(1)
+
+        master = smaps(process.pid)
+        per_worker = [dict(pid=pid, **smaps(pid)) for pid in children(process.pid)]
+    finally:
+        stop_app(process)
+        server.shutdown()
+
+    return {
+        "mode": mode,
+        "master": master,
+        "workers": per_worker,
+        "total_pss": round(master["pss"] + sum(w["pss"] for w in per_worker), 1),
+        "avg_worker_uss": round(sum(w["uss"] for w in per_worker) / max(1, len(per_worker)), 1),
+    }
+
+
+def print_report(reports):
+    for report in reports:
+        print(f"\n{report['mode']}: total PSS {report['total_pss']} MB, "
+              f"avg worker USS {report['avg_worker_uss']} MB")
+        print(f"  {'process':<16}{'rss MB':>10}{'pss MB':>10}{'uss MB':>10}")
+        m = report["master"]
+        print(f"  {'master':<16}{m['rss']:>10}{m['pss']:>10}{m['uss']:>10}")
+        for w in report["workers"]:
+            print(f"  {'worker ' + str(w['pid']):<16}{w['rss']:>10}{w['pss']:>10}{w['uss']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-worker memory of the gunicorn deployment")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--uploads", type=int, default=20, help="leaf uploads before measuring")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--settle", type=float, default=10, help="seconds to let every worker warm up")
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--json", help="write the report here")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        parser.error("needs Linux /proc/<pid>/smaps_rollup")
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+
+    reports = [measure(m, args.workers, args.uploads, args.port, args.settle, args.ready_timeout) for m in modes]
+    print_report(reports)
+    if args.json:
+        folder = os.path.dirname(args.json)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,61 +1,50 @@
-import requests, json, re, os
+import json, re, os
 from dotenv import load_dotenv
-from groq import Groq
+
+from services import advisory_store, crop_suitability, geocoding, llm_gateway, metrics, open_meteo
+from services.log import get_logger
+from services.stages import Stage, run_stages
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+log = get_logger(__name__)
 
+# "llm": Groq explains a locally ranked shortlist; "fast": the ranking alone.
+CROP_MODE = os.getenv("CROP_RECOMMEND_MODE", "llm")
+CROP_MAX_TOKENS = 400
 
-def get_location_coords(location):
-    print(f"[DEBUG] Fetching coordinates for: {location}")
-    try:
-        r = requests.get(f"https://geocoding-api.open-meteo.com/v1/search?name={location}&count=1")
-        data = r.json()
-        if "results" in data and len(data["results"]) > 0:
-            lat = data["results"][0]["latitude"]
-            lon = data["results"][0]["longitude"]
-            print(f"[DEBUG] Found coordinates: ({lat}, {lon})")
-            return lat, lon
-    except Exception as e:
-        print("[ERROR] Location fetch failed:", e)
-    print("[DEBUG] Using default coordinates (Delhi)")
-    return 28.61, 77.23
 
-def fetch_weather(lat, lon):
-    print(f"[DEBUG] Fetching live weather for ({lat}, {lon})")
+def get_location(location):
+    """The resolved place with its match confidence; LocationNotFound instead of a guessed default."""
+    log.debug("Resolving location: %s", location)
+    place = geocoding.locate(location)
+    if place is None:
+        raise geocoding.LocationNotFound(location)
+    log.debug("Resolved %s -> %s", location, place)
+    return place
+
+def fetch_weather(lat, lon, forecast=None):
+    log.debug("Fetching live weather for (%s, %s)", lat, lon)
     try:
-        r = requests.get(
-            f"https://api.open-meteo.com/v1/forecast?"
-            f"latitude={lat}&longitude={lon}&"
-            f"current=temperature_2m,relative_humidity_2m,soil_moisture_0_to_10cm"
-        )
-        current = r.json().get("current", {})
+        if forecast is None:
+            forecast = open_meteo.fetch_forecast(lat, lon)
+        current = forecast.get("current", {})
         result = {
             "temperature": current.get("temperature_2m", 30),
             "humidity": current.get("relative_humidity_2m", 60),
             "moisture": round(current.get("soil_moisture_0_to_10cm", 0.25) * 100, 1)
         }
-        print(f"[DEBUG] Weather data: {result}")
+        log.debug("Weather data: %s", result)
         return result
     except Exception as e:
-        print("[ERROR] Weather fetch failed:", e)
+        log.error("Weather fetch failed: %s", e)
         raise RuntimeError("Weather fetch failed — stopping.")
 
-def fetch_soil(lat, lon):
-    print(f"[DEBUG] Fetching soil data for ({lat}, {lon})")
-    url = (
-        f"https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&longitude={lon}&"
-        f"current=soil_temperature_0cm,soil_moisture_0_to_10cm"
-    )
-    print("[DEBUG] Request URL:", url)
-    r = requests.get(url, timeout=10)
-    print("[DEBUG] HTTP Status:", r.status_code)
+def fetch_soil(lat, lon, forecast=None):
+    log.debug("Fetching soil data for (%s, %s)", lat, lon)
+    if forecast is None:
+        forecast = open_meteo.fetch_forecast(lat, lon)
 
-    if r.status_code != 200:
-        raise RuntimeError(f"HTTP Error {r.status_code}: {r.text[:200]}")
-
-    data = r.json().get("current")
+    data = forecast.get("current")
     if not data:
         raise ValueError("No soil data in response.")
 
@@ -63,33 +52,39 @@ def fetch_soil(lat, lon):
         "soil_temperature": data["soil_temperature_0cm"],
         "soil_moisture": round(data["soil_moisture_0_to_10cm"] * 100, 2)
     }
-    print(f"[DEBUG] Soil data: {result}")
+    log.debug("Soil data: %s", result)
     return result
 
-def recommend_crop(data: dict):
-    """
-    Input: {"location": "Jaipur", "season": "Kharif"}
-    Output: {"crops": ["Rice", "Maize", "Pulses"], "explanation": "..."}
-    """
-    print("[DEBUG] Starting crop recommendation via Groq AI...\n")
-    location = data.get("location", "Delhi")
-    season = data.get("season", "Kharif")
+def gather_inputs(location):
+    """place -> one Open-Meteo forecast -> weather + soil readings."""
+    stages = run_stages([
+        Stage("place", lambda: get_location(location), timeout=15),
+        Stage("forecast", lambda place: open_meteo.fetch_forecast(place["lat"], place["lon"]), deps=["place"], timeout=20),
+        Stage("weather", lambda place, forecast: fetch_weather(place["lat"], place["lon"], forecast),
+              deps=["place", "forecast"]),
+        Stage("soil", lambda place, forecast: fetch_soil(place["lat"], place["lon"], forecast),
+              deps=["place", "forecast"]),
+    ])
+    return stages["place"], stages["weather"], stages["soil"]
 
-    lat, lon = get_location_coords(location)
-    weather = fetch_weather(lat, lon)
-    soil = fetch_soil(lat, lon)
 
+def build_prompt(location, season, lat, lon, weather, soil, shortlist):
     system = (
     "You are KrishiMitra AI — a professional Indian agriculture expert and crop advisor. "
-    "Your goal is to recommend the 3 most suitable crops for the given region and season "
-    "based on live soil and weather data. "
-    "Always include at least one major (staple) crop and one minor (rotation/cash) crop. "
-    "Explain in Hinglish (mix of Hindi + English) within 2–3 lines — "
-    "clearly describe why these crops suit the soil, climate, and season, "
-    "and give one short tip on crop rotation or income stability. "
-    "Avoid generic or repetitive suggestions and base reasoning only on provided parameters."
+    "The 3 crops below were already ranked as the best fit for this region, season and "
+    "live soil/weather data. Do not change or reorder them. "
+    "For each crop write in Hinglish (mix of Hindi + English) one line on why it suits the soil, "
+    "climate and season, and one short tip on crop rotation or income stability. "
+    "Base reasoning only on provided parameters."
 )
 
+    crops = ",\n".join(
+        "    " + json.dumps({
+            "name": c["name"], "type": c["type"],
+            "reason": "<1-line suitability>", "rotation_tip": "<short tip>",
+        }, ensure_ascii=False)
+        for c in shortlist
+    )
     user = f"""
 📍 Location: {location}
 🗓️ Season: {season}
@@ -99,61 +94,217 @@ def recommend_crop(data: dict):
 🌱 Soil Moisture (0–10 cm): {soil['soil_moisture']} %
 🌡️ Soil Temperature (0 cm): {soil['soil_temperature']} °C
 
-👉 Based on this data, suggest 3 best-fit crops (both major and minor).
-
 Return response strictly in JSON:
 {{
   "crops": [
-    {{
-      "name": "<crop1>",
-      "type": "<Major or Minor>",
-      "reason": "<1-line soil + weather suitability>",
-      "rotation_tip": "<short rotation or income tip>"
-    }},
-    {{
-      "name": "<crop2>",
-      "type": "<Major or Minor>",
-      "reason": "<1-line soil + weather suitability>",
-      "rotation_tip": "<short rotation or income tip>"
-    }},
-    {{
-      "name": "<crop3>",
-      "type": "<Major or Minor>",
-      "reason": "<1-line soil + weather suitability>",
-      "rotation_tip": "<short rotation or income tip>"
-    }}
+{crops}
   ],
-  "summary": "<2–3 line Hinglish explanation combining all insights>"
+  "summary": "<2 line Hinglish summary>"
 }}
 """
+    return system, user
+
+
+@metrics.timed("json_extract")
+def parse_response(text: str):
+    match = re.search(r"\{[\s\S]*\}", text)
+    if match:
+        try:
+            log.debug("Extracted JSON from response")
+            return json.loads(match.group(0))
+        except Exception as e:
+            log.error("JSON parse failed: %s", e)
+            raise RuntimeError("Groq AI returned invalid JSON.") from e
+
+    raise RuntimeError("No valid JSON response from Groq.")
+
+
+def quick_recommendation(season, weather, soil, shortlist):
+    """Fast mode: the ranked shortlist with templated reasons — no LLM call."""
+    names = [c["name"] for c in shortlist]
+    listed = ", ".join(names[:-1]) + f" aur {names[-1]}" if len(names) > 1 else "".join(names)
+    return {
+        "crops": [
+            {
+                "name": c["name"],
+                "type": c["type"],
+                "reason": crop_suitability.reason(c, weather, soil),
+                "rotation_tip": c["rotation_tip"],
+                "score": c["score"],
+            }
+            for c in shortlist
+        ],
+        "summary": (
+            f"{season} season me abhi ke mausam (taapmaan {weather['temperature']}°C, "
+            f"mitti ki nami {soil['soil_moisture']}%) ke hisaab se {listed} sabse upyukt fasal hain."
+        ),
+    }
+
+
+def merge_reasons(result: dict, shortlist, weather, soil):
+    """Keep the ranked crops and scores; take only the wording from the LLM."""
+    written = result.get("crops") or []
+    by_name = {str(c.get("name", "")).strip().casefold(): c for c in written if isinstance(c, dict)}
+    crops = []
+    for i, c in enumerate(shortlist):
+        llm = by_name.get(c["name"].casefold()) or (written[i] if i < len(written) and isinstance(written[i], dict) else {})
+        crops.append({
+            "name": c["name"],
+            "type": c["type"],
+            "reason": llm.get("reason") or crop_suitability.reason(c, weather, soil),
+            "rotation_tip": llm.get("rotation_tip") or c["rotation_tip"],
+            "score": c["score"],
+        })
+    return {"crops": crops, "summary": result.get("summary", "")}
+
+
+def explain(text: str, season, weather, soil, shortlist):
+    """
+    The LLM's wording on the ranked shortlist; the templated reasons, marked
+    degraded so they are not cached as the answer, when Groq failed or sent no JSON.
+    """
+    try:
+        return merge_reasons(parse_response(text), shortlist, weather, soil)
+    except RuntimeError as e:
+        log.warning("Using templated crop reasons: %s", e)
+        return dict(quick_recommendation(season, weather, soil, shortlist), degraded=True)
+
+
+def is_fast(data: dict) -> bool:
+    return str(data.get("mode") or CROP_MODE).lower() == "fast"
+
+
+def recommend_crop(data: dict):
+    """
+    Input: {"location": "Jaipur", "season": "Kharif", "mode": "fast"?}
+    Output: {"crops": [{"name", "type", "reason", "rotation_tip", "score"}, ...], "summary": "..."}
+    Served from the precomputed regional store when a fresh entry exists;
+    mode "fast" answers from the local suitability ranking without Groq.
+    """
+    location = data.get("location", "Delhi")
+    season = data.get("season", "Kharif")
+    crop_suitability.canonical_season(season)   # UnknownSeason before any network call
+
+    cached = advisory_store.lookup(location, season)
+    if cached is not None:
+        log.debug("Serving precomputed crop advisory for %s / %s", location, season)
+        return cached
+    if is_fast(data):
+        place, weather, soil = gather_inputs(location)
+        with metrics.timed("suitability"):
+            shortlist = crop_suitability.shortlist(season, weather, soil)
+        return dict(quick_recommendation(season, weather, soil, shortlist), place=place)
+    return generate_crop_recommendation(location, season)
+
 
+def generate_crop_recommendation(location: str, season: str):
+    """Live path: geocode + Open-Meteo + ranked shortlist + Groq. Also used by the precompute job."""
+    log.debug("Starting crop recommendation via Groq AI...")
+    place, weather, soil = gather_inputs(location)
+    with metrics.timed("suitability"):
+        shortlist = crop_suitability.shortlist(season, weather, soil)
+    system, user = build_prompt(location, season, place["lat"], place["lon"], weather, soil, shortlist)
 
-    print("[DEBUG] Sending prompt to Groq...")
+    log.debug("Sending prompt to Groq...")
     try:
-        response = client.chat.completions.create(
+        response = llm_gateway.chat(
+            "crop",
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system},
                 {"role": "user", "content": user}
             ],
-            temperature=0.6
+            temperature=0.6,
+            max_tokens=CROP_MAX_TOKENS
         )
         text = response.choices[0].message.content
-        print("[DEBUG] Groq response received:\n", text)
+        log.debug("Groq response received (%d chars)", len(text))
     except Exception as e:
-        print("[ERROR] Groq API call failed:", e)
+        log.error("Groq API call failed: %s", e)
         text = ""
 
-    match = re.search(r"\{[\s\S]*\}", text)
-    if match:
-        try:
-            print("[DEBUG] Extracted JSON from response")
-            return json.loads(match.group(0))
-        except Exception as e:
-            print("[ERROR] JSON parse failed:", e)
-            raise RuntimeError("Groq AI returned invalid JSON.") from e
+    return dict(explain(text, season, weather, soil, shortlist), place=place)
 
-    raise RuntimeError("No valid JSON response from Groq.")
+
+def recommend_crop_stream(data: dict):
+    """Streaming recommend_crop(): raw model tokens first, then the validated JSON payload."""
+    location = data.get("location", "Delhi")
+    season = data.get("season", "Kharif")
+    crop_suitability.canonical_season(season)   # UnknownSeason before any network call
+
+    cached = advisory_store.lookup(location, season)
+    if cached is not None:
+        yield "result", cached
+        return
+
+    place, weather, soil = gather_inputs(location)
+    with metrics.timed("suitability"):
+        shortlist = crop_suitability.shortlist(season, weather, soil)
+    if is_fast(data):
+        yield "result", dict(quick_recommendation(season, weather, soil, shortlist), place=place)
+        return
+    system, user = build_prompt(location, season, place["lat"], place["lon"], weather, soil, shortlist)
+
+    parts = []
+    try:
+        for token in llm_gateway.stream(
+            "crop",
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.6,
+            max_tokens=CROP_MAX_TOKENS
+        ):
+            parts.append(token)
+            yield "token", token
+    except Exception as e:
+        log.error("Groq API call failed: %s", e)
+
+    yield "result", dict(explain("".join(parts), season, weather, soil, shortlist), place=place)
+
+
+async def recommend_crop_async(data: dict):
+    """Non-blocking recommend_crop() for the ASGI app — same input and output."""
+    location = data.get("location", "Delhi")
+    season = data.get("season", "Kharif")
+    crop_suitability.canonical_season(season)   # UnknownSeason before any network call
+
+    cached = await advisory_store.lookup_async(location, season)
+    if cached is not None:
+        return cached
+
+    place = await geocoding.locate_async(location)
+    if place is None:
+        raise geocoding.LocationNotFound(location)
+    lat, lon = place["lat"], place["lon"]
+    forecast = await open_meteo.fetch_forecast_async(lat, lon)
+    weather = fetch_weather(lat, lon, forecast)
+    soil = fetch_soil(lat, lon, forecast)
+    with metrics.timed("suitability"):
+        shortlist = crop_suitability.shortlist(season, weather, soil)
+    if is_fast(data):
+        return dict(quick_recommendation(season, weather, soil, shortlist), place=place)
+    system, user = build_prompt(location, season, lat, lon, weather, soil, shortlist)
+
+    try:
+        response = await llm_gateway.chat_async(
+            "crop",
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.6,
+            max_tokens=CROP_MAX_TOKENS
+        )
+        text = response.choices[0].message.content
+    except Exception as e:
+        log.error("Groq API call failed: %s", e)
+        text = ""
+
+    return dict(explain(text, season, weather, soil, shortlist), place=place)
 
 if __name__ == "__main__":
     print("Running crop_chain.py debug mode...\n")
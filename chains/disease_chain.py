@@ -1,43 +1,186 @@
-import os, json, torch, re
+import os, io, json, re, time, asyncio, threading
 from PIL import Image
 from dotenv import load_dotenv
-from groq import Groq
-from transformers import AutoImageProcessor, AutoModelForImageClassification
 
-print("Loading plant disease detection model...")
-VISION_MODEL = "linkanjarad/mobilenet_v2_1.0_224-plant-disease-identification"
-vision_processor = AutoImageProcessor.from_pretrained(VISION_MODEL)
-vision_model = AutoModelForImageClassification.from_pretrained(VISION_MODEL)
-print("Vision model ready!")
+from services import llm_gateway, metrics, remedy_store, vision_backend, vision_preprocess
+from services.batcher import MicroBatcher
+from services.log import get_logger
+from services.stages import Stage, run_stages
+
+# torch / transformers and the model weights are loaded on first use
+# (or by start_warmup()), so importing this module stays cheap.
+VISION_MODEL = os.getenv("VISION_MODEL", "linkanjarad/mobilenet_v2_1.0_224-plant-disease-identification")
+vision_processor = None
+vision_model = None
+vision_infer = None     # pixel_values -> logits, see services.vision_backend
+vision_prepare = None   # images -> pixel_values, see services.vision_preprocess
+_model_lock = threading.Lock()
+_model_state = "cold"   # cold -> loading -> loaded -> warm | error
+_model_error = None
+
+# Concurrent uploads are grouped into one forward pass; window 0 disables batching.
+BATCH_WINDOW_MS = float(os.getenv("DISEASE_BATCH_WINDOW_MS", "10"))
+BATCH_MAX = int(os.getenv("DISEASE_BATCH_MAX", "16"))
+# An upload waiting longer than this for its forward pass fails instead of hanging.
+BATCH_TIMEOUT = float(os.getenv("DISEASE_BATCH_TIMEOUT", "60"))
+
+# Shortest edge the processor resizes to before its 224x224 centre crop.
+DECODE_EDGE = 256
 
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-print("Groq client initialized!")
+log = get_logger(__name__)
+
+# Groq's HTTP keep-alive connection goes cold after this many idle seconds.
+GROQ_KEEPALIVE = 30
+_last_groq_call = 0.0
+_groq_lock = threading.Lock()
+
+
+def load_model():
+    """Import torch/transformers and load the vision model once per process."""
+    global vision_processor, vision_model, vision_infer, vision_prepare, DECODE_EDGE, _model_state, _model_error
+    if vision_model is not None:
+        return vision_processor, vision_model
+
+    with _model_lock:
+        if vision_model is None:
+            _model_state = "loading"
+            try:
+                from transformers import AutoImageProcessor, AutoModelForImageClassification
+                log.info("Loading plant disease detection model...")
+                processor = AutoImageProcessor.from_pretrained(VISION_MODEL)
+                model = AutoModelForImageClassification.from_pretrained(VISION_MODEL)
+                model.eval()
+                infer = vision_backend.load_backend(model)
+                preprocess = vision_preprocess.load_preprocessor(processor)
+            except Exception as e:
+                _model_state, _model_error = "error", str(e)
+                raise
+            DECODE_EDGE = dict(getattr(processor, "size", None) or {}).get("shortest_edge", 256)
+            vision_processor, vision_model, vision_infer, vision_prepare = processor, model, infer, preprocess
+            _model_state = "loaded"
+            log.info("Vision model ready (backend: %s, preprocessing: %s)", infer.name, preprocess.name)
+    return vision_processor, vision_model
+
+
+def warmup():
+    """Load the model and run one dummy inference so the first farmer doesn't pay for it."""
+    classify_batch([Image.new("RGB", (224, 224))])
+    log.info("Vision model warmed up")
+
+
+def preload():
+    """
+    Load the weights in a preloading gunicorn master (see gunicorn.conf.py).
+    No inference runs here, so torch's intra-op thread pool is only ever
+    created inside the workers; they share the weight pages copy-on-write
+    and each warms up after the fork.
+    """
+    try:
+        load_model()
+    except Exception as e:
+        log.error("Vision model preload failed, workers will load it on demand: %s", e)
+
+
+def start_warmup():
+    def _run():
+        try:
+            warmup()
+        except Exception as e:
+            log.error("Vision model warmup failed: %s", e)
+    thread = threading.Thread(target=_run, name="vision-warmup", daemon=True)
+    thread.start()
+    return thread
 
 
-def detect_disease(image_path: str):
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image not found: {image_path}")
+def model_status() -> dict:
+    return {"state": _model_state, "ready": _model_state == "warm", "error": _model_error}
 
-    print(f"[DEBUG] Processing image: {image_path}")
-    image = Image.open(image_path).convert("RGB")
-    inputs = vision_processor(images=image, return_tensors="pt")
 
-    with torch.no_grad():
-        outputs = vision_model(**inputs)
-        probs = outputs.logits.softmax(dim=-1)
-        idx = probs.argmax().item()
+@metrics.timed("image_decode")
+def load_image(source):
+    """
+    Decode a leaf photo from a file path, raw bytes or a binary stream.
+    Large JPEGs are decoded at reduced DCT scale (draft) and box-reduced,
+    so a 12-MP phone photo never materialises at full resolution.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif isinstance(source, (str, os.PathLike)) and not os.path.exists(source):
+        raise FileNotFoundError(f"Image not found: {source}")
 
-    disease_label = vision_model.config.id2label.get(idx, "Unknown Disease")
-    confidence = round(float(probs[0][idx].item()), 2)
-    print(f"Detected disease: {disease_label} (confidence: {confidence})")
+    image = Image.open(source)
+    image.draft("RGB", (DECODE_EDGE, DECODE_EDGE))
+    image = image.convert("RGB")
+
+    factor = min(image.size) // DECODE_EDGE
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image
+
+
+def detect_disease(source):
+    """`source` may be a file path, image bytes or a file-like object."""
+    label = source if isinstance(source, (str, os.PathLike)) else type(source).__name__
+    log.debug("Processing image: %s", label)
+    image = load_image(source)
+    with metrics.timed("inference"):   # includes the micro-batch wait
+        if batcher is None:
+            disease_label, confidence = classify_batch([image])[0]
+        else:
+            disease_label, confidence = batcher.submit(image)
+    log.debug("Detected disease: %s (confidence: %s)", disease_label, confidence)
     return disease_label, confidence
 
 
-def generate_remedy_groq(disease_name: str, crop_hint: str = "General"):
-    print(f"[DEBUG] Generating remedy for {disease_name} ({crop_hint})...")
+def classify_batch(images):
+    """One forward pass over a list of PIL images -> [(label, confidence), ...]"""
+    global _model_state
+    _, vision_model = load_model()
+    # runs on the batcher thread, which serves every request — label explicitly
+    with metrics.timed("preprocess", module="disease_chain"):
+        pixel_values = vision_prepare(images)
+    with metrics.timed("forward", module="disease_chain"):
+        probs = vision_infer(pixel_values).softmax(dim=-1)
+    confs, idxs = probs.max(dim=-1)
+    _model_state = "warm"
+
+    return [
+        (vision_model.config.id2label.get(idx, "Unknown Disease"), round(float(conf), 2))
+        for conf, idx in zip(confs.tolist(), idxs.tolist())
+    ]
+
+
+batcher = (
+    MicroBatcher(classify_batch, max_batch=BATCH_MAX, max_wait_ms=BATCH_WINDOW_MS, name="disease-batcher",
+                 timeout=BATCH_TIMEOUT)
+    if BATCH_WINDOW_MS > 0 else None
+)
+
+
+def warm_groq_connection():
+    """
+    Open (or refresh) the pooled TLS connection to Groq while the
+    CPU-bound vision model runs, so the remedy call skips the handshake.
+    """
+    global _last_groq_call
+    with _groq_lock:
+        if time.monotonic() - _last_groq_call < GROQ_KEEPALIVE:
+            return False
+        # claimed before the request, so concurrent uploads send one ping between them
+        _last_groq_call = time.monotonic()
+    llm_gateway.ping()
+    return True
+
 
+def groq_called():
+    global _last_groq_call
+    with _groq_lock:
+        _last_groq_call = time.monotonic()
+
+
+def remedy_prompt(disease_name: str, crop_hint: str):
     system = (
     "You are KrishiMitra AI — an Indian agriculture expert specialized in plant health. "
     "Generate a 3-line Hinglish remedy for the detected crop disease. "
@@ -61,44 +204,130 @@ Return response strictly in JSON:
   "natural_treatment": "<Neem, garlic spray, etc.>"
 }}
 """
+    return system, user
+
 
+@metrics.timed("json_extract")
+def parse_remedy(text: str):
+    match = re.search(r"\{[\s\S]*\}", text)
+    if match:
+        return json.loads(match.group(0))
+    return {"remedy": text.strip(), "summary": "Remedy suggestion generated."}
+
+
+REMEDY_CALL = {"model": "llama-3.3-70b-versatile", "temperature": 0.6, "max_tokens": 300}
+
+
+def remedy_messages(disease_name: str, crop_hint: str):
+    system, user = remedy_prompt(disease_name, crop_hint)
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user}
+    ]
+
+
+def generate_remedy_groq(disease_name: str, crop_hint: str = "General"):
+    log.debug("Generating remedy for %s (%s)...", disease_name, crop_hint)
     try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user}
-            ],
-            temperature=0.6,
-            max_tokens=300
-        )
+        response = llm_gateway.chat("remedy", messages=remedy_messages(disease_name, crop_hint), **REMEDY_CALL)
+        groq_called()
         text = response.choices[0].message.content
-        print("[DEBUG] Groq response:\n", text)
+        log.debug("Groq remedy received (%d chars)", len(text))
+        return parse_remedy(text)
+
+    except Exception as e:
+        log.error("Groq API failed: %s", e)
+        raise RuntimeError("Groq remedy generation failed.")
+
+
+async def generate_remedy_groq_async(disease_name: str, crop_hint: str = "General"):
+    try:
+        response = await llm_gateway.chat_async("remedy", messages=remedy_messages(disease_name, crop_hint), **REMEDY_CALL)
+        groq_called()
+        return parse_remedy(response.choices[0].message.content)
+    except Exception as e:
+        log.error("Groq API failed: %s", e)
+        raise RuntimeError("Groq remedy generation failed.")
 
-        match = re.search(r"\{[\s\S]*\}", text)
-        if match:
-            return json.loads(match.group(0))
-        return {"remedy": text.strip(), "summary": "Remedy suggestion generated."}
 
+def stream_remedy_groq(disease_name: str, crop_hint: str = "General"):
+    """Yields ("token", text) while generating; returns the parsed remedy."""
+    parts = []
+    try:
+        for token in llm_gateway.stream("remedy", messages=remedy_messages(disease_name, crop_hint), **REMEDY_CALL):
+            parts.append(token)
+            yield "token", token
+        groq_called()
     except Exception as e:
-        print("[ERROR] Groq API failed:", e)
+        log.error("Groq API failed: %s", e)
         raise RuntimeError("Groq remedy generation failed.")
+    return parse_remedy("".join(parts))
+
+
+def crop_hint_for(disease: str) -> str:
+    return disease.split()[0] if " " in disease else "General"
+
+
+def get_remedy(disease: str, crop_hint: str):
+    """Serve from the precomputed remedy store; generate (and cache) only on a miss."""
+    remedy_data = remedy_store.lookup(disease, crop_hint)
+    if remedy_data is None:
+        remedy_data = generate_remedy_groq(disease, crop_hint)
+        remedy_store.remember(disease, crop_hint, remedy_data)
+    return remedy_data
+
 
+async def get_remedy_async(disease: str, crop_hint: str):
+    remedy_data = await remedy_store.lookup_async(disease, crop_hint)
+    if remedy_data is None:
+        remedy_data = await generate_remedy_groq_async(disease, crop_hint)
+        remedy_store.remember(disease, crop_hint, remedy_data)
+    return remedy_data
 
-def analyze_leaf(image_path: str):
-    disease, confidence = detect_disease(image_path)
-    crop_hint = disease.split()[0] if " " in disease else "General"
-    remedy_data = generate_remedy_groq(disease, crop_hint)
 
-    result = {
+def get_remedy_stream(disease: str, crop_hint: str):
+    """get_remedy() that forwards the tokens when the remedy is generated live."""
+    remedy_data = remedy_store.lookup(disease, crop_hint)
+    if remedy_data is None:
+        remedy_data = yield from stream_remedy_groq(disease, crop_hint)
+        remedy_store.remember(disease, crop_hint, remedy_data)
+    return remedy_data
+
+
+def leaf_result(disease: str, remedy_data: dict):
+    return {
         "disease": disease,
         "remedy": remedy_data.get("remedy", ""),
         "summary": remedy_data.get("summary", ""),
     }
 
-    print("[FINAL RESULT]")
-    print(json.dumps(result, indent=2, ensure_ascii=False))
-    return result
+
+def analyze_leaf(source):
+    graph = [Stage("disease", lambda: detect_disease(source), timeout=60)]
+    if not remedy_store.precomputed():
+        graph.append(Stage("warm_groq", warm_groq_connection, timeout=5, optional=True))
+    stages = run_stages(graph)
+    disease, confidence = stages["disease"]
+    return leaf_result(disease, get_remedy(disease, crop_hint_for(disease)))
+
+
+def analyze_leaf_stream(source):
+    """
+    Streaming analyze_leaf(): remedy tokens are forwarded only when the
+    remedy has to be generated live; store hits go straight to the result.
+    """
+    disease, confidence = detect_disease(source)
+    remedy_data = yield from get_remedy_stream(disease, crop_hint_for(disease))
+    yield "result", leaf_result(disease, remedy_data)
+
+
+async def analyze_leaf_async(source):
+    """
+    Non-blocking analyze_leaf() for the ASGI app.
+    The CPU-bound model runs in a worker thread so the event loop stays free.
+    """
+    disease, confidence = await asyncio.to_thread(detect_disease, source)
+    return leaf_result(disease, await get_remedy_async(disease, crop_hint_for(disease)))
 
 if __name__ == "__main__":
     sample = "samples/patato_leaf.jpg"
@@ -1,128 +1,189 @@
-import requests, json, re,os
-from geopy.geocoders import Nominatim
+import json, re,os, asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from groq import Groq
 
+from services import geocoding, irrigation_engine, llm_gateway, metrics, open_meteo
+from services.log import get_logger
+from services.stages import Stage, run_stages
 
-load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-print("Groq client initialized!\n")
 
+load_dotenv()
+log = get_logger(__name__)
+
+IRRIGATION_MAX_PLOTS = int(os.getenv("IRRIGATION_MAX_PLOTS", "500"))
+IRRIGATION_PLOTS_CONCURRENCY = int(os.getenv("IRRIGATION_PLOTS_CONCURRENCY", "8"))
+# Per-plot fields; set at the top level of a multi-plot payload they apply to every plot.
+PLOT_FIELDS = ("city", "crop", "soil_type", "days_after_sowing", "growth_stage")
+
+# Geocodes and Groq calls of multi-plot requests; separate from the stage pool
+# so one large request cannot starve run_stages() for every other endpoint.
+plots_executor = ThreadPoolExecutor(max_workers=IRRIGATION_PLOTS_CONCURRENCY, thread_name_prefix="plots")
+
+
+def get_place(city: str):
+    """The resolved place with its match confidence; LocationNotFound instead of a guessed default."""
+    place = geocoding.locate(city)
+    if place is None:
+        raise geocoding.LocationNotFound(city)
+    log.debug("City found: %s %s", city, place)
+    return place
+
+
+@metrics.timed("water_balance")
+def plan_for(data: dict, lat: float, res: dict):
+    """Local FAO-56 water balance — the amounts in the advice come from here, not the LLM."""
+    return irrigation_engine.plan_irrigation(
+        res, lat,
+        crop=data.get("crop", "Wheat"),
+        soil=data.get("soil_type", "Loamy"),
+        days_after_sowing=data.get("days_after_sowing"),
+        growth_stage=data.get("growth_stage"),
+    )
 
-def get_latlon_from_city(city: str):
-    try:
-        geolocator = Nominatim(user_agent="krishimitra")
-        loc = geolocator.geocode(city)
-        if loc:
-            print(f"City found: {city} ({loc.latitude}, {loc.longitude})")
-            return loc.latitude, loc.longitude
-    except Exception as e:
-        print(f"[WARN] Location fetch failed: {e}")
-    print("Using default Delhi coordinates.")
-    return 28.6, 77.2
 
+def advice_prompt(crop: str, soil: str, trend: str, city: str, plan: dict):
+    system = (
+    "You are KrishiMitra AI — an Indian agriculture and irrigation expert. "
+    "You are given a computed 7-day irrigation schedule for a farmer. "
+    "Explain it as 4–5 line Hinglish irrigation advice: (1) kitna paani dena hai, (2) kab dena hai, "
+    "(3) mausam ke hisaab se kya badlav karein, aur (4) soil moisture bachane ke tips. "
+    "Use exactly the dates and millimetre amounts from the schedule — do not invent or change numbers. "
+    "Use simple, friendly Hinglish — jaise aap kisi kisan se baat kar rahe ho. "
+    "Avoid brand names or technical chemical terms."
+)
 
-def fetch_weather(lat: float, lon: float):
-    url = (
-        f"https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&longitude={lon}&daily=temperature_2m_max,"
-        f"temperature_2m_min,precipitation_sum,relative_humidity_2m_max&forecast_days=7"
+    schedule = "\n".join(
+        f"- {d['day']}: fasal ki zarurat {d['etc_mm']} mm, barish {d['rain_mm']} mm, "
+        f"sinchai {d['irrigation_mm']} mm"
+        for d in plan["schedule"]
     )
-    res = requests.get(url).json()
-    daily = res["daily"]
-    data = []
-
-    print("\n7-Day Forecast:")
-    print("-----------------------------------------------------------")
-
-    for i in range(7):
-        day_info = {
-            "day": daily["time"][i],
-            "rainfall": daily["precipitation_sum"][i],
-            "temperature": (daily["temperature_2m_max"][i] + daily["temperature_2m_min"][i]) / 2,
-            "humidity": daily["relative_humidity_2m_max"][i]
-        }
-        data.append(day_info)
-        print(
-            f"{day_info['day']} | Rain: {day_info['rainfall']} mm | "
-            f"Temp: {day_info['temperature']:.1f}°C | Humidity: {day_info['humidity']}%"
-        )
-
-    print("-----------------------------------------------------------")
+    user = f"""
+📍 City: {city}
+🌾 Crop: {crop}
+🌱 Soil Type: {soil}
+🌦️ Weather Trend: {trend}
+💧 Irrigation schedule (mm, gross at field):
+{schedule}
+Total this week: crop needs {plan['totals']['etc_mm']} mm, effective rain {plan['totals']['effective_rain_mm']} mm, irrigation {plan['totals']['irrigation_mm']} mm.
 
-    total_rain = sum(d["rainfall"] for d in data)
-    if total_rain == 0:
-        print("☀️ Dry week detected — koi barish forecast nahi hai.\n")
-    else:
-        print(f"🌧️ Total weekly rainfall forecast: {total_rain:.1f} mm\n")
+Return response strictly in JSON format:
+{{
+  "advice": "<4–5 line Hinglish irrigation tips>"
+}}
+"""
+    return system, user
 
-    return data
 
+@metrics.timed("json_extract")
+def parse_advice(text: str):
+    match = re.search(r"\{[\s\S]*\}", text)
+    if match:
+        data = json.loads(match.group(0).replace("'", '"'))
+        if "advice" in data:
+            data["advice"] = data["advice"].replace(". ", ".\n")
+            return data["advice"]
+    return text.replace(". ", ".\n")
 
 
+def generate_irrigation_advice(crop: str, soil: str, trend: str, city: str, plan: dict):
+    """Groq's wording of the schedule, or None when Groq is unavailable (see result_for)."""
+    log.debug("Phrasing irrigation schedule via Groq...")
+    system, user = advice_prompt(crop, soil, trend, city, plan)
 
-def predict_weather_trend(forecast):
-    print("[DEBUG] Summarizing weather trend via Groq...")
+    try:
+        response = llm_gateway.chat(
+            "irrigation",
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.6,
+            max_tokens=300
+        )
+        text = response.choices[0].message.content.strip()
+        log.debug("Groq irrigation response received (%d chars)", len(text))
+        return parse_advice(text)
 
-    summary_text = " ".join(
-        [f"{f['day']} rain {f['rainfall']}mm temp {f['temperature']}°C hum {f['humidity']}%" for f in forecast]
-    )
+    except Exception as e:
+        log.error("Groq irrigation generation failed: %s", e)
+        return None
 
-    system = (
-        "You are KrishiMitra AI — an Indian agriculture assistant. "
-        "Summarize the upcoming 7-day weather pattern for farmers in 1-2 simple Hinglish lines. "
-        "Mention if it will be dry, rainy, ya mixed weather."
-    )
-    user = f"Weather data: {summary_text}"
 
+async def generate_irrigation_advice_async(crop: str, soil: str, trend: str, city: str, plan: dict):
+    """Non-blocking generate_irrigation_advice()."""
+    system, user = advice_prompt(crop, soil, trend, city, plan)
     try:
-        response = client.chat.completions.create(
+        response = await llm_gateway.chat_async(
+            "irrigation",
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system},
                 {"role": "user", "content": user}
             ],
-            temperature=0.4,
-            max_tokens=150
+            temperature=0.6,
+            max_tokens=300
         )
-        text = response.choices[0].message.content.strip()
-        print("[DEBUG] Weather trend summary received:\n", text)
-        return text
+        return parse_advice(response.choices[0].message.content.strip())
     except Exception as e:
-        print("[ERROR] Groq trend generation failed:", e)
-        return "Lagbhag dry aur thoda mixed mausam rehne wala hai."
+        log.error("Groq irrigation generation failed: %s", e)
+        return None
 
 
-def generate_irrigation_advice(crop: str, soil: str, trend: str, city: str):
-    print("[DEBUG] Generating irrigation advice via Groq...")
+def result_for(trend: str, advice, plan: dict, place: dict):
+    """Without Groq's advice the schedule is described locally and the result marked degraded."""
+    result = {
+        "weather_trend": trend,
+        "irrigation_advice": advice if advice is not None else irrigation_engine.describe_schedule(plan),
+        "irrigation_plan": plan,
+        "place": place
+    }
+    if advice is None:
+        result["degraded"] = True
+    return result
 
-    system = (
-    "You are KrishiMitra AI — an Indian agriculture and irrigation expert. "
-    "Based on the given crop, soil type, and weather trend, generate 4–5 line Hinglish irrigation advice. "
-    "Each answer should explain (1) kitna paani dena hai, (2) kab aur kitni baar dena hai, "
-    "(3) mausam ke hisaab se kya badlav karein, aur (4) soil moisture bachane ke tips. "
-    "Use simple, friendly Hinglish — jaise aap kisi kisan se baat kar rahe ho. "
-    "Avoid brand names or technical chemical terms. "
-    "Keep the tone positive, natural, and practical with easy daily-life suggestions."
-)
 
-    user = f"""
-📍 City: {city}
-🌾 Crop: {crop}
-🌱 Soil Type: {soil}
-🌦️ Weather Trend: {trend}
+def analyze_irrigation(data: dict):
+    city = data.get("city", "Delhi")
+    crop = data.get("crop", "Wheat")
+    soil = data.get("soil_type", "Loamy")
 
-👉 Based on these inputs, give 4–5 line Hinglish irrigation advice for the farmer.
+    stages = run_stages([
+        Stage("place", lambda: get_place(city), timeout=15),
+        Stage("forecast", lambda place: open_meteo.fetch_forecast(place["lat"], place["lon"]), deps=["place"], timeout=20),
+        Stage("plan", lambda place, forecast: plan_for(data, place["lat"], forecast),
+              deps=["place", "forecast"], timeout=5),
+    ])
+    plan = stages["plan"]
+    trend = irrigation_engine.describe_trend(plan)
+    advice = generate_irrigation_advice(crop, soil, trend, city, plan)
+
+    return result_for(trend, advice, plan, stages["place"])
 
-Return response strictly in JSON format:
-{{
-  "advice": "<4–5 line Hinglish irrigation tips>"
-}}
-"""
 
+def analyze_irrigation_stream(data: dict):
+    """
+    Streaming analyze_irrigation(): the computed weather trend is sent at
+    once, then the advice token by token, followed by the usual result dict.
+    """
+    city = data.get("city", "Delhi")
+    crop = data.get("crop", "Wheat")
+    soil = data.get("soil_type", "Loamy")
 
+    stages = run_stages([
+        Stage("place", lambda: get_place(city), timeout=15),
+        Stage("forecast", lambda place: open_meteo.fetch_forecast(place["lat"], place["lon"]), deps=["place"], timeout=20),
+    ])
+    plan = plan_for(data, stages["place"]["lat"], stages["forecast"])
+    trend = irrigation_engine.describe_trend(plan)
+    yield "token", trend
+    yield "token", "\n\n"
+
+    system, user = advice_prompt(crop, soil, trend, city, plan)
+    parts = []
     try:
-        response = client.chat.completions.create(
+        for token in llm_gateway.stream(
+            "irrigation",
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system},
@@ -130,42 +191,189 @@ Return response strictly in JSON format:
             ],
             temperature=0.6,
             max_tokens=300
-        )
-        text = response.choices[0].message.content.strip()
-        print("[DEBUG] Groq irrigation response:\n", text)
-
-        match = re.search(r"\{[\s\S]*\}", text)
-        if match:
-            data = json.loads(match.group(0).replace("'", '"'))
-            if "advice" in data:
-                data["advice"] = data["advice"].replace(". ", ".\n")
-                return data["advice"]
-        return text.replace(". ", ".\n")
-
+        ):
+            parts.append(token)
+            yield "token", token
+        advice = parse_advice("".join(parts).strip())
     except Exception as e:
-        print("[ERROR] Groq irrigation generation failed:", e)
-        return "Subah jaldi irrigation karein aur heavy rain ke din paani band rakhein."
+        log.error("Groq irrigation generation failed: %s", e)
+        advice = None
 
+    yield "result", result_for(trend, advice, plan, stages["place"])
 
-def analyze_irrigation(data: dict):
+
+async def analyze_irrigation_async(data: dict):
+    """Non-blocking analyze_irrigation() for the ASGI app — same input and output."""
     city = data.get("city", "Delhi")
     crop = data.get("crop", "Wheat")
     soil = data.get("soil_type", "Loamy")
 
-    lat, lon = get_latlon_from_city(city)
-    forecast = fetch_weather(lat, lon)
-    trend = predict_weather_trend(forecast)
-    advice = generate_irrigation_advice(crop, soil, trend, city)
+    place = await geocoding.locate_async(city)
+    if place is None:
+        raise geocoding.LocationNotFound(city)
+    lat, lon = place["lat"], place["lon"]
+    plan = plan_for(data, lat, await open_meteo.fetch_forecast_async(lat, lon))
+    trend = irrigation_engine.describe_trend(plan)
+    advice = await generate_irrigation_advice_async(crop, soil, trend, city, plan)
+
+    return result_for(trend, advice, plan, place)
+
+
+def plot_inputs(data: dict):
+    """The plots of a multi-plot payload with the top-level defaults filled in (None for a non-object)."""
+    plots = data.get("plots")
+    if not isinstance(plots, list) or not plots:
+        raise ValueError('Send "plots" as a list of {"city", "crop", "soil_type"} objects.')
+    if len(plots) > IRRIGATION_MAX_PLOTS:
+        raise ValueError(f"Too many plots — max {IRRIGATION_MAX_PLOTS} per request.")
+    defaults = {k: data[k] for k in PLOT_FIELDS if k in data}
+    return [dict(defaults, **plot) if isinstance(plot, dict) else None for plot in plots]
+
+
+def _plot_error(plot):
+    if plot is None:
+        return "Each plot must be a JSON object."
+    if not plot.get("city"):
+        return 'Each plot needs a "city".'
+    return None
+
+
+def _resolve(plot):
+    """-> (place, None) or (None, error message) for one plot."""
+    error = _plot_error(plot)
+    if error:
+        return None, error
+    try:
+        return get_place(plot["city"]), None
+    except Exception as e:
+        return None, str(e)
 
+
+async def _resolve_async(plot):
+    error = _plot_error(plot)
+    if error:
+        return None, error
+    try:
+        place = await geocoding.locate_async(plot["city"])
+    except Exception as e:
+        return None, str(e)
+    if place is None:
+        return None, str(geocoding.LocationNotFound(plot["city"]))
+    return place, None
+
+
+def plot_forecasts(resolved, forecasts):
+    """
+    The forecast of each plot (None when it was not located), from the
+    forecasts of the located plots. Plots whose bulk request failed get
+    an error in `resolved` instead, so the rest of the response survives.
+    """
+    per_plot, located = [], iter(forecasts)
+    for i, (place, _) in enumerate(resolved):
+        forecast = next(located) if place else None
+        if isinstance(forecast, Exception):
+            resolved[i] = (None, f"Weather forecast unavailable: {forecast}")
+            forecast = None
+        per_plot.append(forecast)
+    return per_plot
+
+
+def plot_plans(plots, resolved, forecasts):
+    """
+    One plan per plot with a forecast (None for the rest). Plots in the
+    same grid cell are planned at the cell's latitude, like their shared
+    forecast, so identical crop / soil / stage inputs are computed once.
+    """
+    plans, computed = [None] * len(plots), {}
+    for i, forecast in enumerate(forecasts):
+        if forecast is None:
+            continue
+        plot, place = plots[i], resolved[i][0]
+        cell = open_meteo.snap(place["lat"], place["lon"])
+        key = (cell,) + tuple(str(plot.get(k, "")).strip().lower() for k in PLOT_FIELDS[1:])
+        if key not in computed:
+            computed[key] = plan_for(plot, cell[0], forecast)
+        plans[i] = computed[key]
+    return plans
+
+
+def advice_groups(plots, resolved, plans):
+    """
+    Plots whose computed plans are identical share one LLM phrasing.
+    -> [(crop, soil, trend, places label, plan, [plot indices])]
+    """
+    members = {}
+    for i, plan in enumerate(plans):
+        if plan is not None:
+            members.setdefault(json.dumps(plan, sort_keys=True), []).append(i)
+    groups = []
+    for indices in members.values():
+        first, plan = plots[indices[0]], plans[indices[0]]
+        names = list(dict.fromkeys(resolved[i][0]["name"] for i in indices))
+        label = ", ".join(names[:3]) + (f" aur {len(names) - 3} jagah" if len(names) > 3 else "")
+        groups.append((
+            first.get("crop", "Wheat"), first.get("soil_type", "Loamy"),
+            irrigation_engine.describe_trend(plan), label, plan, indices,
+        ))
+    return groups
+
+
+def plots_result(plots, resolved, groups, advice):
+    results = [None] * len(plots)
+    for (_, _, trend, _, plan, indices), text in zip(groups, advice):
+        for i in indices:
+            results[i] = result_for(trend, text, plan, resolved[i][0])
+    for i, (_, error) in enumerate(resolved):
+        if error:
+            results[i] = {"error": error}
+    for i, plot in enumerate(plots):
+        results[i]["index"] = i
+        if plot and "id" in plot:
+            results[i]["id"] = plot["id"]
     return {
-        "weather_trend": trend,
-        "irrigation_advice": advice
+        "plots": results,
+        "located": sum(1 for place, _ in resolved if place),
+        "advice_calls": len(groups),
     }
 
 
+def analyze_irrigation_plots(data: dict):
+    """
+    analyze_irrigation() for many plots in one call:
+      {"plots": [{"city", "crop", "soil_type", "id"?, ...}, ...], "crop"?: default, ...}
+    Forecasts come from a few bulk Open-Meteo requests and plots with
+    identical plans share one advice. Results keep input order; a plot
+    that cannot be located only fails its own slot.
+    """
+    plots = plot_inputs(data)
+    resolved = list(plots_executor.map(_resolve, plots))
+    located = open_meteo.fetch_forecasts([(place["lat"], place["lon"]) for place, _ in resolved if place])
+    plans = plot_plans(plots, resolved, plot_forecasts(resolved, located))
+    groups = advice_groups(plots, resolved, plans)
+    advice = list(plots_executor.map(lambda g: generate_irrigation_advice(*g[:5]), groups))
+    return plots_result(plots, resolved, groups, advice)
+
+
+async def analyze_irrigation_plots_async(data: dict):
+    """Non-blocking analyze_irrigation_plots() for the ASGI app — same input and output."""
+    plots = plot_inputs(data)
+    limit = asyncio.Semaphore(IRRIGATION_PLOTS_CONCURRENCY)
+
+    async def bounded(call):
+        async with limit:
+            return await call
+
+    resolved = list(await asyncio.gather(*(bounded(_resolve_async(plot)) for plot in plots)))
+    located = await open_meteo.fetch_forecasts_async([(place["lat"], place["lon"]) for place, _ in resolved if place])
+    plans = plot_plans(plots, resolved, plot_forecasts(resolved, located))
+    groups = advice_groups(plots, resolved, plans)
+    advice = await asyncio.gather(*(bounded(generate_irrigation_advice_async(*g[:5])) for g in groups))
+    return plots_result(plots, resolved, groups, advice)
+
+
 if __name__ == "__main__":
     user_input = {"city": "Kolkata", "crop": "Wheat", "soil_type": "Black"}
     result = analyze_irrigation(user_input)
-    print(f"\nCity: {result['city']} ({result['lat']}, {result['lon']})")
     print("\nWeather Trend →", result["weather_trend"])
     print("\nIrrigation Advice →\n", result["irrigation_advice"])
+    print("\nSchedule →", json.dumps(result["irrigation_plan"]["schedule"], indent=2))
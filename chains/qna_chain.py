@@ -1,18 +1,23 @@
-import os
+import os, asyncio
 from dotenv import load_dotenv
-from groq import Groq
+
+from services import knowledge_base, llm_gateway
+from services.answer_cache import AnswerCache
+from services.log import get_logger
 
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-print("Groq client initialized successfully!\n")
+log = get_logger(__name__)
 
+# temperature=0 / top_p=0 makes answers deterministic, so they are safe to reuse.
+answer_cache = AnswerCache()
+FALLBACK_ANSWER = "Sorry, kuch technical dikkat ho gayi. Kripya fir se try karein."
+MAX_TOKENS = 400
+# Answers written around retrieved knowledge-base passages are shorter.
+CONTEXT_MAX_TOKENS = int(os.getenv("QNA_KB_MAX_TOKENS", "200"))
 
-def krishimitra_answer(query: str):
-    """
-    Takes any farmer query and gives a Hinglish helpful answer.
-    Powered by Groq API (Llama-3.3-70B).
-    """
+
+def qna_prompt(query: str):
     system = (
     "You are KrishiMitra — Bharat ka digital kheti dost aur Indian agriculture expert. "
     "Tumhara kaam hai Indian farmers ke sawalon ka 4–6 line ka detailed, friendly aur practical Hinglish me jawab dena. "
@@ -27,24 +32,143 @@ def krishimitra_answer(query: str):
 )
 
     user = f'Farmer asked: "{query}"'
+    return system, user
+
+
+def context_prompt(query: str, passages):
+    system = (
+    "You are KrishiMitra — Indian farmers ke liye kheti expert. "
+    "Sirf neeche di gayi jaankari se 3–4 line ka simple, friendly Hinglish jawab do. "
+    "Matra aur samay jaankari se hi lo; sawaal me acre ya bigha ho to hisaab laga kar batao. "
+    "Jaankari me jawab na ho to saaf bata do aur paas ke KVK se salah lene ko kaho."
+)
+
+    notes = "\n\n".join(p["answer"] for p in passages)
+    user = f'Jaankari:\n{notes}\n\nFarmer asked: "{query}"'
+    return system, user
+
+
+def answer_plan(query: str):
+    """
+    Knowledge base first: -> (answer, None) when it answers outright, else
+    (None, (system, user, max_tokens)) for the LLM — a short prompt around
+    the retrieved passages, or the full qna_prompt() when nothing matched.
+    """
+    kind, passages = knowledge_base.lookup(query)
+    if kind == "direct":
+        log.debug("Answered from knowledge base entry %s", passages[0]["id"])
+        return passages[0]["answer"], None
+    if kind == "context":
+        return None, context_prompt(query, passages) + (CONTEXT_MAX_TOKENS,)
+    return None, qna_prompt(query) + (MAX_TOKENS,)
+
+
+def krishimitra_answer(query: str):
+    """
+    Takes any farmer query and gives a Hinglish helpful answer.
+    Curated answers come from the local knowledge base; the rest from
+    Groq API (Llama-3.3-70B).
+    """
+    answer, request = answer_plan(query)
+    if answer is not None:
+        return answer
+    cached = answer_cache.get(query)
+    if cached is not None:
+        return cached
+
+    system, user, max_tokens = request
+
+    try:
+        response = llm_gateway.chat(
+            "qna",
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.0,
+            max_tokens=max_tokens,
+            top_p=0.0
+        )
+        answer = response.choices[0].message.content.strip()
+        answer_cache.put(query, answer)
+        return answer
+
+    except Exception as e:
+        log.error("Groq API failed: %s", e)
+        return FALLBACK_ANSWER
+
+
+def krishimitra_answer_stream(query: str):
+    """Streaming krishimitra_answer(): yields ("token", text) ... then ("result", answer)."""
+    answer, request = answer_plan(query)
+    if answer is None:
+        answer = answer_cache.get(query)
+    if answer is not None:
+        yield "token", answer
+        yield "result", answer
+        return
+
+    system, user, max_tokens = request
+    parts = []
+    try:
+        for token in llm_gateway.stream(
+            "qna",
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.0,
+            max_tokens=max_tokens,
+            top_p=0.0
+        ):
+            parts.append(token)
+            yield "token", token
+    except Exception as e:
+        log.error("Groq API failed: %s", e)
+        if parts:
+            # the client already has part of the answer: end with an error, never cache the fragment
+            raise RuntimeError("Groq stopped mid-answer — please ask again.") from e
+        yield "token", FALLBACK_ANSWER
+        yield "result", FALLBACK_ANSWER
+        return
+
+    answer = "".join(parts).strip()
+    answer_cache.put(query, answer)
+    yield "result", answer
+
+
+async def krishimitra_answer_async(query: str):
+    """Non-blocking krishimitra_answer() for the ASGI app."""
+    answer, request = answer_plan(query)
+    if answer is not None:
+        return answer
+    cached = answer_cache.get(query)
+    if cached is not None:
+        return cached
+
+    system, user, max_tokens = request
 
     try:
-        response = client.chat.completions.create(
+        response = await llm_gateway.chat_async(
+            "qna",
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system},
                 {"role": "user", "content": user}
             ],
             temperature=0.0,
-            max_tokens=400,
+            max_tokens=max_tokens,
             top_p=0.0
         )
         answer = response.choices[0].message.content.strip()
+        await asyncio.to_thread(answer_cache.put, query, answer)   # writes SQLite
         return answer
 
     except Exception as e:
-        print("[ERROR] Groq API failed:", e)
-        return "Sorry, kuch technical dikkat ho gayi. Kripya fir se try karein."
+        log.error("Groq API failed: %s", e)
+        return FALLBACK_ANSWER
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+import os, json, asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from services.log import get_logger
+
+# Which chain handles a JSON / form payload. Shared by the Flask and ASGI apps.
+ROUTES = [
+    ("qna_chain", ["query"]),
+    ("irrigation_plots", ["plots"]),
+    ("irrigation_chain", ["city", "crop", "soil_type"]),
+    ("soil_chain", ["crop", "location"]),
+    ("crop_chain", ["location", "season"]),
+]
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Separate from the stage pool so batch items can't starve their own stages.
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch")
+log = get_logger(__name__)
+
+
+def detect_module(data: dict):
+    """Return the chain name for a payload, or None if no route matches."""
+    for module, keys in ROUTES:
+        if all(k in data for k in keys):
+            return module
+    return None
+
+
+def _dedupe(items):
+    """-> (unique payloads, index of each original item into that list)"""
+    unique, positions, seen = [], [], {}
+    for item in items:
+        key = json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append(item)
+        positions.append(seen[key])
+    return unique, positions
+
+
+def _item_result(handle, item):
+    if not isinstance(item, dict):
+        return {"error": "Each batch item must be a JSON object."}
+    try:
+        return handle(item)
+    except Exception as e:
+        log.error("Batch item failed: %s", e)
+        return {"error": str(e)}
+
+
+def dispatch_batch(items, handle):
+    """
+    Run `handle(payload) -> response dict` over every item with bounded
+    concurrency. Identical items are computed once; results keep input
+    order and a failing item only fails its own slot.
+    """
+    unique, positions = _dedupe(items)
+    results = list(batch_executor.map(lambda item: _item_result(handle, item), unique))
+    return [dict(results[p], index=i) for i, p in enumerate(positions)]
+
+
+async def dispatch_batch_async(items, handle):
+    """Async twin of dispatch_batch() — `handle` is a coroutine function."""
+    unique, positions = _dedupe(items)
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(item):
+        if not isinstance(item, dict):
+            return {"error": "Each batch item must be a JSON object."}
+        async with limit:
+            try:
+                return await handle(item)
+            except Exception as e:
+                log.error("Batch item failed: %s", e)
+                return {"error": str(e)}
+
+    results = await asyncio.gather(*(run(item) for item in unique))
+    return [dict(results[p], index=i) for i, p in enumerate(positions)]
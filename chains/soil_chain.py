@@ -1,61 +1,48 @@
-import requests, json, re, os
+import json, re
 from dotenv import load_dotenv
-from groq import Groq
+
+from services import geocoding, llm_gateway, metrics, open_meteo
+from services.log import get_logger
+from services.stages import Stage, run_stages
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+log = get_logger(__name__)
 
 
-def get_location_coords(location):
-    print(f"[DEBUG] Fetching coordinates for: {location}")
-    try:
-        r = requests.get(f"https://geocoding-api.open-meteo.com/v1/search?name={location}&count=1")
-        data = r.json()
-        if "results" in data and len(data["results"]) > 0:
-            lat = data["results"][0]["latitude"]
-            lon = data["results"][0]["longitude"]
-            print(f"[DEBUG] Found coordinates: ({lat}, {lon})")
-            return lat, lon
-    except Exception as e:
-        print("⚠️ [ERROR] Location fetch failed:", e)
-    print("⚠️ [DEBUG] Using default coordinates (Delhi)")
-    return 28.61, 77.23
+def get_location(location):
+    """The resolved place with its match confidence; LocationNotFound instead of a guessed default."""
+    log.debug("Resolving location: %s", location)
+    place = geocoding.locate(location)
+    if place is None:
+        raise geocoding.LocationNotFound(location)
+    log.debug("Resolved %s -> %s", location, place)
+    return place
 
 
-def fetch_weather(lat, lon):
-    print(f"[DEBUG] Fetching live weather for ({lat}, {lon})")
+def fetch_weather(lat, lon, forecast=None):
+    log.debug("Fetching live weather for (%s, %s)", lat, lon)
     try:
-        r = requests.get(
-            f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
-            "&current=temperature_2m,relative_humidity_2m,soil_moisture_0_to_10cm"
-        )
-        current = r.json().get("current", {})
+        if forecast is None:
+            forecast = open_meteo.fetch_forecast(lat, lon)
+        current = forecast.get("current", {})
         result = {
             "temperature": current.get("temperature_2m", 30),
             "humidity": current.get("relative_humidity_2m", 60),
             "moisture": round(current.get("soil_moisture_0_to_10cm", 0.25) * 100, 1)
         }
-        print(f"[DEBUG] Weather data: {result}")
+        log.debug("Weather data: %s", result)
         return result
     except Exception as e:
-        print("[ERROR] Weather fetch failed:", e)
+        log.error("Weather fetch failed: %s", e)
         return {"temperature": 30, "humidity": 60, "moisture": 25}
 
 
-def fetch_soil(lat, lon):
-    print(f"[DEBUG] Fetching soil data for ({lat}, {lon})")
-    url = (
-        f"https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&longitude={lon}&"
-        f"current=soil_temperature_0cm,soil_moisture_0_to_10cm"
-    )
-    print("[DEBUG] Request URL:", url)
-    r = requests.get(url, timeout=10)
-    print("[DEBUG] HTTP Status:", r.status_code)
-    if r.status_code != 200:
-        raise RuntimeError(f"HTTP Error {r.status_code}: {r.text[:200]}")
-
-    data = r.json().get("current")
+def fetch_soil(lat, lon, forecast=None):
+    log.debug("Fetching soil data for (%s, %s)", lat, lon)
+    if forecast is None:
+        forecast = open_meteo.fetch_forecast(lat, lon)
+
+    data = forecast.get("current")
     if not data or "soil_moisture_0_to_10cm" not in data:
         raise ValueError("Essential soil data missing in Open-Meteo response.")
 
@@ -63,19 +50,24 @@ def fetch_soil(lat, lon):
         "soil_temperature": data["soil_temperature_0cm"],
         "soil_moisture": round(data["soil_moisture_0_to_10cm"] * 100, 2)  # convert to %
     }
-    print(f"[DEBUG] Soil data: {result}")
+    log.debug("Soil data: %s", result)
     return result
 
 
-def analyze_soil(data: dict):
-    print("[DEBUG] Starting soil analysis via Groq AI...\n")
-    crop = data.get("crop", "General")
-    location = data.get("location", "Delhi")
+def gather_inputs(location):
+    """place -> one Open-Meteo forecast -> weather + soil readings."""
+    stages = run_stages([
+        Stage("place", lambda: get_location(location), timeout=15),
+        Stage("forecast", lambda place: open_meteo.fetch_forecast(place["lat"], place["lon"]), deps=["place"], timeout=20),
+        Stage("weather", lambda place, forecast: fetch_weather(place["lat"], place["lon"], forecast),
+              deps=["place", "forecast"]),
+        Stage("soil", lambda place, forecast: fetch_soil(place["lat"], place["lon"], forecast),
+              deps=["place", "forecast"]),
+    ])
+    return stages["place"], stages["weather"], stages["soil"]
 
-    lat, lon = get_location_coords(location)
-    weather = fetch_weather(lat, lon)
-    soil = fetch_soil(lat, lon)
 
+def build_prompt(location, crop, lat, lon, weather, soil):
     system = (
     "You are KrishiMitra AI — Bharat ka ek expert agriculture advisor. "
     "Tumhara kaam hai farmer ko unke sheher, crop aur soil condition ke hisaab se "
@@ -105,11 +97,34 @@ Return JSON strictly in this format:
   "explanation": "<2-3 line detailed Hinglish explanation including why, how, and soil-care tips>"
 }}
 """
+    return system, user
+
+
+@metrics.timed("json_extract")
+def parse_response(text: str):
+    match = re.search(r"\{[\s\S]*\}", text)
+    if match:
+        try:
+            log.debug("Extracted JSON from response")
+            return json.loads(match.group(0))
+        except Exception as e:
+            log.error("JSON parse failed: %s", e)
 
+    raise RuntimeError("Groq AI returned invalid response.")
+
+
+def analyze_soil(data: dict):
+    log.debug("Starting soil analysis via Groq AI...")
+    crop = data.get("crop", "General")
+    location = data.get("location", "Delhi")
 
-    print("[DEBUG] Sending prompt to Groq...")
+    place, weather, soil = gather_inputs(location)
+    system, user = build_prompt(location, crop, place["lat"], place["lon"], weather, soil)
+
+    log.debug("Sending prompt to Groq...")
     try:
-        response = client.chat.completions.create(
+        response = llm_gateway.chat(
+            "soil",
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system},
@@ -118,20 +133,71 @@ Return JSON strictly in this format:
             temperature=0.5
         )
         text = response.choices[0].message.content
-        print("[DEBUG] Groq response received:\n", text)
+        log.debug("Groq response received (%d chars)", len(text))
     except Exception as e:
-        print("Groq API Error:", e)
+        log.error("Groq API call failed: %s", e)
         text = ""
 
-    match = re.search(r"\{[\s\S]*\}", text)
-    if match:
-        try:
-            print("[DEBUG] Extracted JSON from response")
-            return json.loads(match.group(0))
-        except Exception as e:
-            print("[ERROR] JSON parse failed:", e)
+    return dict(parse_response(text), place=place)
 
-    raise RuntimeError("Groq AI returned invalid response.")
+
+def analyze_soil_stream(data: dict):
+    """Streaming analyze_soil(): raw model tokens first, then the validated JSON payload."""
+    crop = data.get("crop", "General")
+    location = data.get("location", "Delhi")
+
+    place, weather, soil = gather_inputs(location)
+    system, user = build_prompt(location, crop, place["lat"], place["lon"], weather, soil)
+
+    parts = []
+    try:
+        for token in llm_gateway.stream(
+            "soil",
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.5
+        ):
+            parts.append(token)
+            yield "token", token
+    except Exception as e:
+        log.error("Groq API call failed: %s", e)
+
+    yield "result", dict(parse_response("".join(parts)), place=place)
+
+
+async def analyze_soil_async(data: dict):
+    """Non-blocking analyze_soil() for the ASGI app — same input and output."""
+    crop = data.get("crop", "General")
+    location = data.get("location", "Delhi")
+
+    place = await geocoding.locate_async(location)
+    if place is None:
+        raise geocoding.LocationNotFound(location)
+    lat, lon = place["lat"], place["lon"]
+    forecast = await open_meteo.fetch_forecast_async(lat, lon)
+    weather = fetch_weather(lat, lon, forecast)
+    soil = fetch_soil(lat, lon, forecast)
+    system, user = build_prompt(location, crop, lat, lon, weather, soil)
+
+    try:
+        response = await llm_gateway.chat_async(
+            "soil",
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.5
+        )
+        text = response.choices[0].message.content
+    except Exception as e:
+        log.error("Groq API call failed: %s", e)
+        text = ""
+
+    return dict(parse_response(text), place=place)
 
 if __name__ == "__main__":
     print("Running soil_chain.py debug mode...\n")
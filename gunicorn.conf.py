@@ -0,0 +1,41 @@
+"""
+Gunicorn settings, picked up automatically by `gunicorn app:app`.
+
+    WEB_CONCURRENCY=2       worker processes
+    GUNICORN_THREADS=4      threads per worker (gthread); 1 = sync workers
+    GUNICORN_PRELOAD=1      import the app and the vision weights once in the
+                            master, so workers share them copy-on-write
+
+torch intra-op threads per worker default to cpu_count // WEB_CONCURRENCY
+(VISION_THREADS overrides). Measure per-worker memory with
+`python -m bench.memory`.
+"""
+
+import gc, os, sys
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Read by the app at import: GROQ_RPM and VISION_THREADS are split across
+# WEB_CONCURRENCY workers, and KRISHIMITRA_PRELOAD makes the master load
+# the vision weights without warming them.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ["KRISHIMITRA_PRELOAD"] = "1" if preload_app else "0"
+
+
+def when_ready(server):
+    # Everything the master imported is moved out of the collector's reach,
+    # so GC passes in the workers don't write to (and un-share) those pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    disease_chain = sys.modules.get("chains.disease_chain")
+    if disease_chain is None or disease_chain.vision_model is None:
+        return
+    from services import vision_backend
+    vision_backend.configure_threads()
+    if os.getenv("KRISHIMITRA_WARMUP", "1") == "1":
+        disease_chain.start_warmup()
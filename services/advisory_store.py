@@ -0,0 +1,192 @@
+"""
+Precomputed crop recommendations per (location, season).
+
+recommend_crop() depends only on location, season and the current
+weather / soil snapshot, so a scheduled job can build the common ones
+ahead of time and the web workers just read the file:
+
+    python -m services.advisory_store build                  # one refresh
+    python -m services.advisory_store build --every 24       # refresh daily
+
+Regions come from data/precompute_regions.json (districts x seasons).
+Entries older than CROP_ADVISORY_MAX_AGE are ignored and the request
+falls back to live generation.
+"""
+
+import os, sys, json, time, asyncio, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.crop_suitability import canonical_season
+from services.geocoding import normalize_name
+from services.log import get_logger
+
+STORE_VERSION = 1
+ADVISORY_STORE_PATH = os.getenv(
+    "CROP_ADVISORY_STORE", os.path.join(".cache", f"crop_advisories_v{STORE_VERSION}.json")
+)
+REGIONS_PATH = os.getenv("CROP_ADVISORY_REGIONS", os.path.join("data", "precompute_regions.json"))
+MAX_AGE = float(os.getenv("CROP_ADVISORY_MAX_AGE", str(30 * 3600)))
+RELOAD_CHECK_SECONDS = 30
+log = get_logger(__name__)
+
+_entries = {}
+_mtime = None
+_checked = None
+_lock = threading.Lock()
+_counters = {"hits": 0, "stale": 0, "misses": 0}
+_counters_lock = threading.Lock()
+
+
+def _key(location: str, season: str) -> str:
+    """Seasons are canonical ("winter", "Rabi" -> "rabi"), so every alias finds the stored entry."""
+    return f"{normalize_name(location)}||{canonical_season(season)}"
+
+
+def _due() -> bool:
+    return _checked is None or time.monotonic() - _checked >= RELOAD_CHECK_SECONDS
+
+
+def _refresh():
+    """Reload the store file when the job has rewritten it (checked every 30 s)."""
+    global _entries, _mtime, _checked
+    now = time.monotonic()
+    if not _due():
+        return
+    with _lock:
+        _checked = now
+        try:
+            mtime = os.path.getmtime(ADVISORY_STORE_PATH)
+        except OSError:
+            return
+        if mtime == _mtime:
+            return
+        try:
+            with open(ADVISORY_STORE_PATH, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Crop advisory store unreadable: %s", e)
+            return
+        if payload.get("version") != STORE_VERSION:
+            log.warning("Ignoring crop advisory store with version %s", payload.get('version'))
+            return
+        _entries, _mtime = payload.get("entries", {}), mtime
+
+
+def _count(key: str):
+    with _counters_lock:
+        _counters[key] += 1
+
+
+def lookup(location: str, season: str):
+    """Fresh precomputed recommendation, or None."""
+    _refresh()
+    return _find(location, season)
+
+
+async def lookup_async(location: str, season: str):
+    """lookup() for the event loop: the file check and reload run on a worker thread when due."""
+    if _due():
+        await asyncio.to_thread(_refresh)
+    return _find(location, season)
+
+
+def _find(location: str, season: str):
+    entry = _entries.get(_key(location, season))
+    if entry is None:
+        _count("misses")
+        return None
+    if time.time() - entry["generated_at"] > MAX_AGE:
+        _count("stale")
+        return None
+    _count("hits")
+    return entry["result"]
+
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    return {**counters, "entries": len(_entries), "max_age_hours": MAX_AGE / 3600}
+
+
+def load_regions(path: str = REGIONS_PATH):
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    return [(loc, season) for loc in config["locations"] for season in config["seasons"]]
+
+
+def save(entries: dict, path: str = ADVISORY_STORE_PATH):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    payload = {
+        "version": STORE_VERSION,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "entries": entries,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def build(regions, workers: int = 4) -> dict:
+    """Generate live recommendations for every (location, season) and rewrite the store."""
+    from chains.crop_chain import generate_crop_recommendation
+
+    started = time.monotonic()
+    _refresh()
+    entries = dict(_entries)
+    failed = []
+
+    def run(region):
+        location, season = region
+        try:
+            return region, generate_crop_recommendation(location, season)
+        except Exception as e:
+            log.warning("Precompute failed for %s / %s: %s", location, season, e)
+            return region, None
+
+    refreshed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (location, season), result in pool.map(run, regions):
+            if result is None or result.get("degraded"):
+                failed.append(f"{location}/{season}")
+                continue
+            entries[_key(location, season)] = {
+                "location": location,
+                "season": season,
+                "generated_at": time.time(),
+                "result": result,
+            }
+            refreshed += 1
+
+    save(entries)
+    return {
+        "path": ADVISORY_STORE_PATH,
+        "refreshed": refreshed,
+        "failed": failed,
+        "entries": len(entries),
+        "seconds": round(time.monotonic() - started, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KrishiMitra crop advisory precompute job")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="refresh recommendations for all configured regions")
+    p_build.add_argument("--regions", default=REGIONS_PATH)
+    p_build.add_argument("--workers", type=int, default=4)
+    p_build.add_argument("--every", type=float, default=0, help="repeat every N hours (0 = run once)")
+    args = parser.parse_args(argv)
+
+    regions = load_regions(args.regions)
+    while True:
+        report = build(regions, workers=args.workers)
+        print(json.dumps(report, indent=2))
+        if not args.every:
+            return 1 if report["failed"] else 0
+        time.sleep(args.every * 3600)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
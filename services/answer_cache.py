@@ -0,0 +1,237 @@
+"""
+Answer cache for the Q&A chain.
+
+Queries are normalised (case, punctuation, whitespace and common Hinglish
+spelling variants) and looked up in three steps:
+exact normalised match -> near-duplicate match via a character 3-gram
+TF-IDF index -> miss. Entries live in a bounded LRU with TTL and can be
+persisted to SQLite so frequent questions survive restarts.
+"""
+
+import os, re, math, sqlite3, threading, time, unicodedata
+from collections import Counter, defaultdict
+
+from services.cache import TTLCache
+from services.log import get_logger
+
+QNA_CACHE_SIZE = int(os.getenv("QNA_CACHE_SIZE", "2000"))
+QNA_CACHE_TTL = float(os.getenv("QNA_CACHE_TTL", str(7 * 24 * 3600)))
+QNA_CACHE_DB = os.getenv("QNA_CACHE_DB", os.path.join(".cache", "answers.sqlite3"))
+QNA_SIMILARITY_THRESHOLD = float(os.getenv("QNA_SIMILARITY_THRESHOLD", "0.9"))
+log = get_logger(__name__)
+
+# Spellings farmers actually type, folded to one form. Keys are written
+# after vowel runs are squashed ("daalein" -> "dalein", "gehoon" -> "gehon").
+# Only spelling variants of the same word: "main" ("I") and ka/ki/ke carry
+# meaning of their own and are left as typed.
+HINGLISH_VARIANTS = {
+    "mein": "me", "mai": "me", "mei": "me", "mien": "me",
+    "kaunsa": "konsa", "kounsa": "konsa", "kaunse": "konse", "kounse": "konse", "kaun": "kon",
+    "dalen": "dale", "dalein": "dale", "dalna": "dale", "dalu": "dale", "dalo": "dale",
+    "gehun": "gehu", "gehon": "gehu", "gehn": "gehu", "gahu": "gehu", "genhu": "gehu", "wheat": "gehu",
+    "kitana": "kitna", "kitni": "kitna", "kitne": "kitna",
+    "kiya": "kya",
+    "he": "hai", "h": "hai", "hain": "hai", "hei": "hai",
+    "liya": "liye", "lie": "liye", "lye": "liye",
+    "fertilizer": "khad", "fertiliser": "khad",
+    "paddy": "dhan", "rice": "dhan",
+    "water": "pani",
+    "ekad": "acre", "ekar": "acre",
+    "kb": "kab",
+    "krna": "karna", "karana": "karna", "kare": "karna", "karen": "karna", "karein": "karna",
+}
+_FILLER = {"hai", "bhai", "ji", "sir", "please", "pls", "plz", "batao", "bataye", "bataiye", "btao"}
+
+
+def normalize_query(query: str) -> str:
+    """'Gehu mein kaunsa KHAAD daalein??' -> 'gehu me konsa khad dale'"""
+    text = unicodedata.normalize("NFKC", str(query or "")).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    text = re.sub(r"([aeiou])\1+", r"\1", text)
+    words = []
+    for word in text.split():
+        word = HINGLISH_VARIANTS.get(word, word)
+        if word not in _FILLER:
+            words.append(word)
+    return " ".join(words)
+
+
+def _grams(text: str, n: int = 3) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def _numbers(text: str) -> set:
+    return set(re.findall(r"\d+", text))
+
+
+class AnswerCache:
+    """Normalised-query LRU/TTL cache with near-duplicate lookup and optional SQLite persistence."""
+
+    def __init__(self, maxsize: int = QNA_CACHE_SIZE, ttl: float = QNA_CACHE_TTL,
+                 db_path: str = QNA_CACHE_DB, threshold: float = QNA_SIMILARITY_THRESHOLD):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.threshold = threshold
+        self.db_path = db_path
+        self._lock = threading.Lock()      # similarity index and counters
+        self._db_lock = threading.Lock()   # SQLite connection; never held with _lock
+        self._grams = {}                  # key -> Counter of 3-grams
+        self._vectors = {}                # key -> (TF-IDF weights, norm) as of indexing
+        self._postings = defaultdict(set)  # gram -> keys containing it
+        self._df = Counter()
+        self._db = None
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        if db_path:
+            self._load_disk()
+            self._close()   # reopened on first write; never carried across a fork
+
+    # --- similarity index -------------------------------------------------
+
+    def _index(self, key: str):
+        if key in self._grams:
+            return
+        grams = _grams(key)
+        self._grams[key] = grams
+        for g in grams:
+            self._postings[g].add(key)
+            self._df[g] += 1
+        vector = self._vector(grams)
+        self._vectors[key] = (vector, math.sqrt(sum(v * v for v in vector.values())))
+
+    def _unindex(self, key: str):
+        grams = self._grams.pop(key, None)
+        self._vectors.pop(key, None)
+        for g in grams or ():
+            self._postings[g].discard(key)
+            self._df[g] -= 1
+            if not self._postings[g]:
+                del self._postings[g]
+                del self._df[g]
+
+    def _vector(self, grams: Counter) -> dict:
+        n = len(self._grams) + 1
+        return {g: tf * (math.log(n / (1 + self._df.get(g, 0))) + 1) for g, tf in grams.items()}
+
+    def _nearest(self, grams: Counter):
+        """
+        Cosine similarity against the stored entry vectors; only the query's
+        vector is built here. Entry weights keep the IDF from when they were
+        indexed, which drifts little once the cache holds a few hundred answers.
+        """
+        candidates = set()
+        for g in grams:
+            candidates |= self._postings.get(g, set())
+        if not candidates:
+            return None, 0.0
+
+        q = self._vector(grams)
+        q_norm = math.sqrt(sum(v * v for v in q.values()))
+        best, best_score = None, 0.0
+        for cand in candidates:
+            d, d_norm = self._vectors[cand]
+            dot = sum(w * d.get(g, 0.0) for g, w in q.items())
+            score = dot / (q_norm * d_norm) if q_norm and d_norm else 0.0
+            if score > best_score:
+                best, best_score = cand, score
+        return best, best_score
+
+    # --- public API -------------------------------------------------------
+
+    def get(self, query: str):
+        key = normalize_query(query)
+        if not key:
+            return None
+        answer = self.cache.get(key)
+        if answer is not None:
+            with self._lock:
+                self.exact_hits += 1
+            return answer
+
+        grams = _grams(key)
+        with self._lock:
+            match, score = self._nearest(grams)
+            if match is not None and score >= self.threshold and _numbers(match) == _numbers(key):
+                answer = self.cache.get(match)
+                if answer is None:
+                    self._unindex(match)   # evicted / expired since it was indexed
+                else:
+                    self.similar_hits += 1
+                    return answer
+            self.misses += 1
+        return None
+
+    def put(self, query: str, answer: str):
+        key = normalize_query(query)
+        if not key or not answer:
+            return
+        self.cache.set(key, answer)
+        with self._lock:
+            self._index(key)
+            if len(self._grams) > 2 * self.cache.maxsize:
+                for stale in [k for k in self._grams if self.cache.get(k) is None]:
+                    self._unindex(stale)
+        self._disk_put(key, query, answer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            exact, similar, misses, indexed = self.exact_hits, self.similar_hits, self.misses, len(self._grams)
+        hits = exact + similar
+        total = hits + misses
+        return {
+            "exact_hits": exact,
+            "similar_hits": similar,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "entries": len(self.cache),
+            "indexed": indexed,
+        }
+
+    # --- persistence ------------------------------------------------------
+
+    def _connect(self):
+        if self._db is None:
+            folder = os.path.dirname(self.db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, query TEXT, answer TEXT, updated REAL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _load_disk(self):
+        try:
+            rows = self._connect().execute(
+                "SELECT key, answer, updated FROM answers WHERE updated > ? ORDER BY updated DESC LIMIT ?",
+                (time.time() - self.ttl, self.cache.maxsize),
+            ).fetchall()
+        except sqlite3.Error as e:
+            log.warning("Answer cache load failed: %s", e)
+            return
+        for key, answer, updated in reversed(rows):
+            self.cache.set(key, answer, ttl=self.ttl - (time.time() - updated))
+            self._index(key)
+
+    def _disk_put(self, key: str, query: str, answer: str):
+        if not self.db_path:
+            return
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO answers (key, query, answer, updated) VALUES (?, ?, ?, ?)",
+                    (key, query, answer, time.time()),
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            log.warning("Answer cache write failed: %s", e)
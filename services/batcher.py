@@ -0,0 +1,97 @@
+import os, queue, threading, time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submit() calls for up to `max_wait_ms` (or until
+    `max_batch` items arrive) and hands them to `run_batch` in one go.
+    `run_batch(items)` must return one result per item, in order.
+    submit() gives up after `timeout` seconds; a request that timed out
+    before its batch started is dropped from that batch.
+    """
+
+    def __init__(self, run_batch, max_batch: int = 16, max_wait_ms: float = 10, name: str = "batcher",
+                 timeout: float = 60):
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.name = name
+        self._start()
+        # A gunicorn worker forked from a preloading master inherits this
+        # object but not its thread, so each child starts its own.
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._size_counts = {}
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item, timeout: float = None):
+        future = Future()
+        self._queue.put((item, future))
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = [(item, future) for item, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = list(self.run_batch(items))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+                if len(results) != len(batch):
+                    error = RuntimeError(f"{self.name}: run_batch returned {len(results)} results for {len(batch)} items")
+                    for _, future in batch[len(results):]:
+                        future.set_exception(error)
+            self._record(len(batch))
+
+    def _record(self, size: int):
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._max_seen = max(self._max_seen, size)
+            self._size_counts[size] = self._size_counts.get(size, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "max_batch_size": self._max_seen,
+                "batch_sizes": dict(sorted(self._size_counts.items())),
+                "window_ms": self.max_wait * 1000,
+                "max_batch": self.max_batch,
+            }
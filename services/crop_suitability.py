@@ -0,0 +1,190 @@
+"""
+Agro-climatic suitability of major Indian crops.
+
+Each crop has the seasons it is sown in and trapezoidal ranges
+(absolute min, optimal min, optimal max, absolute max) for air
+temperature, humidity, 0-10 cm soil moisture and soil temperature.
+Scores for every crop are computed in one NumPy pass, so ranking the
+whole table is cheap enough to do on every request.
+"""
+
+import numpy as np
+
+SEASONS = ["kharif", "rabi", "zaid"]
+SEASON_ALIASES = {
+    "kharif": "kharif", "kharib": "kharif", "monsoon": "kharif", "rainy": "kharif", "barsat": "kharif", "खरीफ": "kharif",
+    "rabi": "rabi", "rabbi": "rabi", "winter": "rabi", "sardi": "rabi", "रबी": "rabi",
+    "zaid": "zaid", "zayad": "zaid", "zayed": "zaid", "jayad": "zaid", "summer": "zaid", "garmi": "zaid", "जायद": "zaid",
+}
+FACTORS = ["temperature", "humidity", "soil_moisture", "soil_temperature"]
+WEIGHTS = np.array([0.35, 0.15, 0.30, 0.20])
+FLOOR = 0.05   # one factor out of range lowers a crop's score but does not zero it
+
+# name: (type, seasons, ranges per factor (°C, %, vol %, °C), rotation tip)
+CROPS = {
+    "Rice":       ("Major", ("kharif",),
+                   ((15, 22, 32, 40), (40, 70, 95, 100), (15, 30, 50, 60), (12, 20, 35, 42)),
+                   "Dhan ke baad Rabi me gehu ya chana lein, mitti ki taakat bani rahegi."),
+    "Maize":      ("Major", ("kharif", "zaid"),
+                   ((10, 21, 30, 38), (30, 50, 80, 95), (10, 20, 35, 50), (10, 18, 32, 40)),
+                   "Makka ke saath moong ya urad ki intercropping se extra kamai hoti hai."),
+    "Cotton":     ("Major", ("kharif",),
+                   ((15, 21, 32, 40), (20, 40, 70, 90), (8, 15, 30, 45), (14, 18, 35, 42)),
+                   "Kapas ke baad gehu ya chana lagayein; har saal ek hi khet me kapas na lein."),
+    "Soybean":    ("Major", ("kharif",),
+                   ((13, 20, 30, 36), (35, 55, 80, 95), (12, 20, 35, 50), (12, 18, 32, 38)),
+                   "Soybean ke baad gehu ya chana — soybean mitti me nitrogen chhod jaata hai."),
+    "Bajra":      ("Major", ("kharif",),
+                   ((18, 25, 35, 42), (15, 30, 65, 90), (5, 10, 25, 40), (14, 20, 36, 45)),
+                   "Bajra ke baad sarson ya chana se kam paani me doosri fasal mil jaati hai."),
+    "Jowar":      ("Minor", ("kharif", "rabi"),
+                   ((15, 24, 32, 40), (20, 35, 70, 90), (6, 12, 28, 42), (12, 20, 34, 42)),
+                   "Jowar ko arhar ke saath lagayein, chara aur daal dono milenge."),
+    "Groundnut":  ("Minor", ("kharif", "zaid"),
+                   ((18, 24, 32, 38), (25, 45, 75, 95), (8, 15, 28, 40), (15, 20, 34, 40)),
+                   "Moongfali ke baad gehu lene se khaad ka kharcha kam lagta hai."),
+    "Arhar":      ("Minor", ("kharif",),
+                   ((18, 24, 34, 40), (25, 45, 75, 95), (8, 15, 30, 45), (14, 20, 34, 40)),
+                   "Arhar ko bajra ya jowar ke saath intercrop karein."),
+    "Moong":      ("Minor", ("kharif", "zaid"),
+                   ((20, 25, 35, 40), (25, 40, 75, 90), (8, 15, 28, 40), (16, 22, 35, 42)),
+                   "Gehu katne ke baad khali khet me moong lein — 60-65 din me taiyaar."),
+    "Sugarcane":  ("Major", ("kharif", "zaid"),
+                   ((15, 24, 34, 40), (35, 55, 85, 95), (15, 25, 40, 55), (14, 20, 35, 40)),
+                   "Ganne ki kataron ke beech pehle 3 mahine moong ya sabzi le sakte hain."),
+    "Wheat":      ("Major", ("rabi",),
+                   ((5, 15, 24, 32), (20, 40, 70, 90), (10, 20, 35, 48), (3, 10, 22, 30)),
+                   "Gehu ke baad garmi me moong lein, phir Kharif me dhan ya makka."),
+    "Mustard":    ("Major", ("rabi",),
+                   ((5, 15, 25, 32), (20, 40, 70, 90), (8, 15, 30, 42), (3, 10, 24, 30)),
+                   "Sarson ke baad Zaid me moong ya chara fasal lein."),
+    "Chana":      ("Major", ("rabi",),
+                   ((8, 18, 27, 32), (20, 35, 65, 85), (6, 12, 25, 38), (5, 12, 26, 32)),
+                   "Chana ke baad Kharif me makka ya bajra achha utpadan deta hai."),
+    "Barley":     ("Minor", ("rabi",),
+                   ((4, 12, 24, 32), (20, 35, 65, 85), (6, 12, 28, 40), (2, 8, 22, 30)),
+                   "Jau kam paani me ho jaata hai; baad me moong ya chara lein."),
+    "Masoor":     ("Minor", ("rabi",),
+                   ((6, 15, 25, 30), (20, 40, 70, 85), (8, 15, 28, 40), (4, 10, 24, 30)),
+                   "Masoor dhan ke baad bachi nami me bhi ho jaati hai."),
+    "Peas":       ("Minor", ("rabi",),
+                   ((5, 13, 22, 30), (25, 45, 75, 90), (10, 20, 32, 45), (4, 10, 20, 28)),
+                   "Matar jaldi nikal kar uske baad late gehu ya sabzi le sakte hain."),
+    "Potato":     ("Minor", ("rabi",),
+                   ((7, 15, 22, 30), (35, 55, 80, 95), (12, 22, 35, 48), (5, 12, 20, 28)),
+                   "Aloo ke baad bachi khaad par moong ya makka achha chalta hai."),
+    "Onion":      ("Minor", ("rabi", "kharif"),
+                   ((8, 15, 25, 35), (30, 50, 75, 90), (10, 20, 32, 45), (6, 12, 26, 34)),
+                   "Pyaz ke baad dalhan fasal lein taaki mitti ki jaan laute."),
+    "Watermelon": ("Minor", ("zaid",),
+                   ((18, 24, 34, 42), (20, 40, 65, 85), (8, 15, 28, 40), (16, 22, 35, 42)),
+                   "Tarbooz ke baad Kharif me dhan ya makka lein."),
+    "Cucumber":   ("Minor", ("zaid",),
+                   ((16, 22, 32, 40), (30, 50, 75, 90), (10, 20, 32, 45), (15, 20, 32, 38)),
+                   "Kheera jaldi bikne wali fasal hai; mandi ke paas ho to achhi kamai."),
+    "Sunflower":  ("Minor", ("zaid", "rabi"),
+                   ((12, 20, 30, 38), (20, 40, 70, 90), (8, 15, 30, 42), (10, 18, 30, 38)),
+                   "Surajmukhi ke baad dhan ya makka lene se keet-chakra toot-ta hai."),
+}
+
+NAMES = list(CROPS)
+TYPES = np.array([CROPS[n][0] for n in NAMES])
+SEASON_MASK = np.array([[s in CROPS[n][1] for s in SEASONS] for n in NAMES])    # (crops, seasons)
+RANGES = np.array([CROPS[n][2] for n in NAMES], dtype=float)                   # (crops, factors, 4)
+
+
+class UnknownSeason(ValueError):
+    """The season is not one of SEASONS or a known alias; callers report it instead of assuming kharif."""
+
+    def __init__(self, season):
+        super().__init__(f"Unknown season '{season}'. Use Kharif, Rabi or Zaid.")
+        self.season = season
+
+
+def canonical_season(season: str) -> str:
+    """'Rabi', 'winter', 'रबी season' -> 'rabi'"""
+    name = str(season or "").strip().casefold().removesuffix("season").strip()
+    if name not in SEASON_ALIASES:
+        raise UnknownSeason(season)
+    return SEASON_ALIASES[name]
+
+
+def season_index(season: str) -> int:
+    return SEASONS.index(canonical_season(season))
+
+
+def memberships(values):
+    """
+    Trapezoidal suitability of every crop for each factor.
+    values: (..., factors) -> (..., crops, factors) in [FLOOR, 1].
+    """
+    x = np.asarray(values, dtype=float)[..., None, :]
+    a, b, c, d = (RANGES[..., i] for i in range(4))
+    rising = (x - a) / (b - a)
+    falling = (d - x) / (d - c)
+    return np.clip(np.minimum(rising, falling), FLOOR, 1.0)
+
+
+def scores(season: str, values):
+    """Weighted geometric mean of memberships; crops not sown in `season` score 0."""
+    m = memberships(values)
+    combined = np.exp(np.log(m) @ WEIGHTS)
+    return combined * SEASON_MASK[:, season_index(season)]
+
+
+def factor_values(weather: dict, soil: dict):
+    return [weather["temperature"], weather["humidity"], soil["soil_moisture"], soil["soil_temperature"]]
+
+
+def shortlist(season: str, weather: dict, soil: dict, top: int = 3):
+    """
+    Best `top` crops for the readings, always including at least one
+    Major and one Minor crop when the season has both.
+    """
+    values = factor_values(weather, soil)
+    s = scores(season, values)
+    m = memberships(values)
+    order = [i for i in np.argsort(-s, kind="stable") if s[i] > 0]
+
+    picked = []
+    for kind in ("Major", "Minor"):
+        best = next((i for i in order if TYPES[i] == kind), None)
+        if best is not None:
+            picked.append(best)
+    picked += [i for i in order if i not in picked]
+    picked = sorted(picked[:top], key=lambda i: -s[i])
+
+    return [
+        {
+            "name": NAMES[i],
+            "type": str(TYPES[i]),
+            "score": round(float(s[i]), 3),
+            "fit": {f: round(float(m[i, j]), 2) for j, f in enumerate(FACTORS)},
+            "rotation_tip": CROPS[NAMES[i]][3],
+        }
+        for i in picked
+    ]
+
+
+FACTOR_TEXT = {
+    "temperature": "taapmaan {v}°C",
+    "humidity": "nami (humidity) {v}%",
+    "soil_moisture": "mitti ki nami {v}%",
+    "soil_temperature": "mitti ka taapmaan {v}°C",
+}
+
+
+def reason(crop: dict, weather: dict, soil: dict) -> str:
+    """One-line Hinglish reason built from the factor fits."""
+    values = dict(zip(FACTORS, factor_values(weather, soil)))
+    good = [FACTOR_TEXT[f].format(v=values[f]) for f, fit in crop["fit"].items() if fit >= 0.99]
+    weak = [FACTOR_TEXT[f].format(v=values[f]) for f, fit in crop["fit"].items() if fit < 0.5]
+    if len(good) == len(FACTORS):
+        text = f"Abhi ka mausam aur mitti ki nami dono {crop['name']} ke liye bilkul anukool hain."
+    elif good:
+        text = f"{', '.join(good)} {crop['name']} ke liye sahi range me hai."
+    else:
+        text = f"{crop['name']} in halaat me theek-thaak chal sakti hai."
+    if weak:
+        text += f" Dhyan dein: {', '.join(weak)} thoda bahar hai."
+    return text[0].upper() + text[1:]
@@ -0,0 +1,362 @@
+"""
+Bundled gazetteer of Indian places, so most locations resolve without a network geocode.
+
+    GAZETTEER_FILES=data/gazetteer_in.tsv[,more.tsv]   name, kind, state, lat, lon, aliases
+    GAZETTEER_MIN_CONFIDENCE=0.85       answer locally at or above this
+    GAZETTEER_FALLBACK_CONFIDENCE=0.6   weaker matches are used only when network geocoding fails
+
+Every name and alias is reduced to a spelling key (Devanagari
+transliterated, Hinglish variants such as ee/i, oo/u, w/v, z/j, ph/f
+merged) and a consonant skeleton: "Jaipur", "jaypur" and "जयपुर" are all
+"jpr". The skeletons sit in one sorted list searched with bisect, so an
+exact or transliterated match costs microseconds. Only an exact name or
+alias key is confident: consonants alone cannot tell "Deesa" from Dausa
+or "Shivpur" from Shivpuri, so near misses ("vishakapatnam") are scored
+with difflib below NEAR_MISS_MAX and only stand in when network
+geocoding fails. "Aurangabad, Bihar" or "Aurangabad Bihar" narrows a
+name to one state.
+
+    python -m services.gazetteer lookup "ludhiyana" "नासिक" "aurangabad, bihar"
+"""
+
+import os, re, sys, time, bisect, difflib, argparse, unicodedata
+from array import array
+
+from services.log import get_logger
+
+GAZETTEER_FILES = [
+    p.strip() for p in os.getenv("GAZETTEER_FILES", os.path.join("data", "gazetteer_in.tsv")).split(",") if p.strip()
+]
+MIN_CONFIDENCE = float(os.getenv("GAZETTEER_MIN_CONFIDENCE", "0.85"))
+FALLBACK_CONFIDENCE = float(os.getenv("GAZETTEER_FALLBACK_CONFIDENCE", "0.6"))
+AMBIGUOUS_PENALTY = 0.9
+OTHER_STATE_PENALTY = 0.8
+# Best score for anything but an exact name / alias key — below MIN_CONFIDENCE,
+# so a near miss goes to network geocoding instead of a similar-sounding district.
+NEAR_MISS_MAX = 0.8
+log = get_logger(__name__)
+
+_CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ल": "l", "ळ": "l", "व": "v",
+    "श": "sh", "ष": "sh", "स": "s", "ह": "h",
+}
+_NUKTA_FORMS = {"क": "q", "ख": "kh", "ग": "g", "ज": "z", "ड": "r", "ढ": "rh", "फ": "f", "य": "y"}
+_VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "ii", "उ": "u", "ऊ": "uu", "ऋ": "ri",
+    "ए": "e", "ऐ": "ai", "ओ": "o", "औ": "au", "ऑ": "o",
+}
+_MATRAS = {
+    "ा": "aa", "ि": "i", "ी": "ii", "ु": "u", "ू": "uu", "ृ": "ri",
+    "े": "e", "ै": "ai", "ो": "o", "ौ": "au", "ॅ": "e", "ॉ": "o",
+}
+_SIGNS = {"ं": "n", "ँ": "n", "ः": "h"}
+_VIRAMA, _NUKTA = "्", "़"
+
+_SPELLING = [
+    (re.compile(r"ck"), "k"), (re.compile(r"q"), "k"), (re.compile(r"x"), "ks"),
+    (re.compile(r"c(?!h)"), "k"), (re.compile(r"chh"), "ch"),
+    (re.compile(r"z"), "j"), (re.compile(r"w"), "v"), (re.compile(r"ph"), "f"),
+    (re.compile(r"ee|ii"), "i"), (re.compile(r"oo|uu"), "u"), (re.compile(r"aa"), "a"),
+    (re.compile(r"m(?=[pb])"), "n"),
+    (re.compile(r"(.)\1+"), r"\1"),
+]
+_ASPIRATES = re.compile(r"([kgcjtdbsr])h")
+_LATE_VOWELS = re.compile(r"(?<!^)[aeiouy]")
+_REPEATS = re.compile(r"(.)\1+")
+
+# Words people add around a place name ("Karnal district", "जिला सीकर").
+QUALIFIERS = {
+    "district", "distt", "dist", "zila", "zilla", "jila", "jilla", "jile", "tehsil", "tahsil",
+    "tahasil", "taluka", "taluk", "block", "mandal", "gaon", "gav", "ganv", "gram", "village",
+    "city", "shahar", "sahar", "india", "bharat",
+}
+
+
+def transliterate(text: str) -> str:
+    """Devanagari to rough Latin ('लखनऊ' -> 'lakhanau'); anything else passes through."""
+    out, i, n = [], 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in _CONSONANTS:
+            latin = _CONSONANTS[ch]
+            if i + 1 < n and text[i + 1] == _NUKTA:
+                latin = _NUKTA_FORMS.get(ch, latin)
+                i += 1
+            nxt = text[i + 1] if i + 1 < n else ""
+            if nxt == _VIRAMA:
+                out.append(latin)
+                i += 1
+            elif nxt in _MATRAS:
+                out.append(latin + _MATRAS[nxt])
+                i += 1
+            elif nxt and "\u0900" <= nxt <= "\u097f":
+                out.append(latin + "a")
+            else:
+                out.append(latin)   # no inherent vowel at the end of a word
+        elif ch in _VOWELS:
+            out.append(_VOWELS[ch])
+        elif ch in _SIGNS:
+            out.append(_SIGNS[ch])
+        elif ch not in (_NUKTA, _VIRAMA):
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def words(text: str):
+    """'  Jaipur,  राजस्थान ' -> [['jaipur'], ['rajasthan']] — spelling keys per word, per comma part."""
+    text = transliterate(unicodedata.normalize("NFC", str(text or "")))
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)).casefold()
+    return [[spelling(w) for w in re.findall(r"[a-z0-9]+", part)] for part in text.split(",")]
+
+
+def spelling(word: str) -> str:
+    for pattern, replacement in _SPELLING:
+        word = pattern.sub(replacement, word)
+    return word
+
+
+def skeleton(key: str) -> str:
+    """Spelling key -> consonant skeleton: 'ludhiana' -> 'ldn'."""
+    return _REPEATS.sub(r"\1", _LATE_VOWELS.sub("", _ASPIRATES.sub(r"\1", key)))
+
+
+def _key(text: str) -> str:
+    return "".join(w for part in words(text) for w in part)
+
+
+_QUALIFIER_KEYS = {"".join(spelling(w) for w in q.split()) for q in QUALIFIERS}
+
+
+def similarity(a: str, b: str) -> float:
+    """0..1 similarity of two place names after spelling normalisation."""
+    a, b = _key(str(a).split(",")[0]), _key(str(b).split(",")[0])
+    if not a or not b:
+        return 0.0
+    return 1.0 if a == b else round(difflib.SequenceMatcher(None, a, b).ratio(), 3)
+
+
+class Gazetteer:
+    """
+    Places in parallel arrays plus a sorted skeleton index over every name
+    and alias. match() returns the best place with a confidence in [0, 1].
+    """
+
+    def __init__(self, rows=()):
+        self.names, self.kinds, self.states = [], [], []
+        self.lats, self.lons = array("d"), array("d")
+        self.state_names = []
+        self.state_keys = {}
+        entries = set()
+        for name, kind, state, lat, lon, aliases in rows:
+            place = len(self.names)
+            if state not in self.state_names:
+                self.state_names.append(state)
+            self.names.append(name)
+            self.kinds.append(sys.intern(kind))
+            self.states.append(self.state_names.index(state))
+            self.lats.append(lat)
+            self.lons.append(lon)
+            for i, label in enumerate([name] + list(aliases)):
+                key = _key(label)
+                if not key:
+                    continue
+                entries.add((skeleton(key), key, i > 0, place))
+                if kind == "state":
+                    self.state_keys.setdefault(key, state)
+
+        # sorted by skeleton, canonical names before aliases, then file order
+        entries = sorted(entries)
+        self.skeletons = [e[0] for e in entries]
+        self.keys = [e[1] for e in entries]
+        self.aliased = bytearray(e[2] for e in entries)
+        self.places = array("I", (e[3] for e in entries))
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, paths=GAZETTEER_FILES):
+        rows = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                for n, line in enumerate(f, 1):
+                    if not line.strip() or line.startswith("#"):
+                        continue
+                    fields = line.rstrip("\n").split("\t")
+                    try:
+                        name, kind, state, lat, lon = fields[:5]
+                        aliases = [a.strip() for a in fields[5].split("|") if a.strip()] if len(fields) > 5 else []
+                        rows.append((name.strip(), kind.strip(), state.strip(), float(lat), float(lon), aliases))
+                    except ValueError:
+                        log.warning("Skipping bad gazetteer row %s:%d", path, n)
+        return cls(rows)
+
+    def _readings(self, parts):
+        """
+        -> [(name words, state or None)] to try, from 'name, state', 'name, district'
+        or 'name state'. The whole name is tried as well, so 'New Delhi' is not 'New' in Delhi.
+        """
+        name, state = parts[0], None
+        for part in parts[1:]:
+            state = state or self.state_keys.get("".join(part))
+            if state is None:
+                hinted = self._best("".join(part), None)
+                if hinted and hinted[0] >= MIN_CONFIDENCE:
+                    state = self.state_names[self.states[hinted[1]]]
+        readings = [(name, state)]
+        if state is None:
+            for n in (3, 2, 1):
+                if len(name) > n and "".join(name[-n:]) in self.state_keys:
+                    readings.append((name[:-n], self.state_keys["".join(name[-n:])]))
+                    break
+        return readings
+
+    def _range(self, prefix: str, exact: bool = False):
+        lo = bisect.bisect_left(self.skeletons, prefix)
+        hi = bisect.bisect_right(self.skeletons, prefix) if exact else bisect.bisect_left(self.skeletons, prefix + "\uffff")
+        return range(lo, hi)
+
+    def _scored(self, key: str, shape: str, candidates):
+        matcher = difflib.SequenceMatcher(None, b=key)
+        for i in candidates:
+            if self.keys[i] == key:
+                yield 1.0, i
+                continue
+            matcher.set_seq1(self.keys[i])
+            if self.skeletons[i] == shape or (matcher.real_quick_ratio() >= 0.7 and matcher.quick_ratio() >= 0.7):
+                yield NEAR_MISS_MAX * matcher.ratio(), i
+
+    def _best(self, key: str, state, alternatives=None, fuzzy: bool = True):
+        """-> (score, place) of the best entry for a spelling key, or None."""
+        shape = skeleton(key)
+        if not shape:
+            return None
+        same = self._range(shape, exact=True)
+        scored = [(1.0, i) for i in same if self.keys[i] == key]
+        if not scored and fuzzy:
+            scored = list(self._scored(key, shape, same))
+        if fuzzy and not any(s >= MIN_CONFIDENCE for s, _ in scored):
+            scored += self._scored(key, shape, (i for i in self._range(shape[:2]) if self.skeletons[i] != shape))
+        if fuzzy and not any(s >= MIN_CONFIDENCE for s, _ in scored) and len(shape) > 1:
+            scored += self._scored(key, shape, (i for i in self._range(shape[:1]) if self.skeletons[i][:2] != shape[:2]))
+
+        best = {}
+        for score, i in scored:
+            place = self.places[i]
+            if state is not None and self.state_names[self.states[place]] != state:
+                score *= OTHER_STATE_PENALTY
+            rank = (score, not self.aliased[i], -place)
+            if place not in best or rank > best[place]:
+                best[place] = rank
+        if not best:
+            return None
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        (place, (score, _, _)), tied = ranked[0], [p for p, r in ranked[1:] if r[0] >= ranked[0][1][0] - 1e-9]
+        tied = [p for p in tied if (self.lats[p], self.lons[p]) != (self.lats[place], self.lons[place])]
+        if tied:
+            score *= AMBIGUOUS_PENALTY
+            if alternatives is not None:
+                alternatives.extend(tied)
+        return score, place
+
+    def match(self, query: str):
+        """
+        'ludhiyana' -> {"name": "Ludhiana", "state": "Punjab", "kind": "district",
+                        "lat": ..., "lon": ..., "confidence": 0.99, "source": "gazetteer"}
+        None when nothing shares even the first consonant of the name.
+        """
+        parts = [p for p in words(query) if p]
+        if not parts or not self.skeletons:
+            return None
+        found = None
+        readings = self._readings(parts)
+        for fuzzy in (False, True):   # exact spellings of every reading before any fuzzy search
+            for name, state in readings:
+                kept = [w for w in name if w not in _QUALIFIER_KEYS]
+                alternatives = []
+                best = self._best("".join(kept or name), state, alternatives, fuzzy)
+                if best and (found is None or best[0] > found[0]):
+                    found = best + (alternatives,)
+            if found and found[0] >= MIN_CONFIDENCE:
+                break
+        if found is None:
+            return None
+        score, place, alternatives = found
+        result = self.place(place)
+        result["confidence"] = round(score, 3)
+        if alternatives:
+            result["alternatives"] = [f"{self.names[p]}, {self.state_names[self.states[p]]}" for p in alternatives[:3]]
+        return result
+
+    def place(self, i: int) -> dict:
+        return {
+            "name": self.names[i],
+            "state": self.state_names[self.states[i]],
+            "kind": self.kinds[i],
+            "lat": self.lats[i],
+            "lon": self.lons[i],
+            "source": "gazetteer",
+        }
+
+    def stats(self) -> dict:
+        size = sum(sys.getsizeof(s) for s in self.keys) + sum(sys.getsizeof(s) for s in self.skeletons)
+        size += sum(sys.getsizeof(s) for s in self.names) + self.lats.itemsize * len(self.lats) * 2
+        size += sys.getsizeof(self.places) + sys.getsizeof(self.aliased)
+        return {"places": len(self.names), "keys": len(self.keys), "kib": round(size / 1024, 1)}
+
+
+def _load():
+    try:
+        started = time.perf_counter()
+        index = Gazetteer.load()
+        log.debug("Gazetteer: %d places, %d keys in %.1f ms",
+                  len(index), len(index.keys), (time.perf_counter() - started) * 1000)
+        return index
+    except OSError as e:
+        log.warning("Gazetteer unavailable, every location goes to network geocoding: %s", e)
+        return Gazetteer()
+
+
+# Built once at import, so a preloading gunicorn master shares it with the workers.
+index = _load()
+
+
+def match(query: str):
+    return index.match(query)
+
+
+def stats() -> dict:
+    return index.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up places in the bundled gazetteer")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_lookup = sub.add_parser("lookup", help="resolve names and time the lookups")
+    p_lookup.add_argument("names", nargs="+")
+    p_lookup.add_argument("--rounds", type=int, default=1000)
+    sub.add_parser("stats", help="index size")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print(stats())
+        return 0
+    missing = 0
+    for name in args.names:
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            result = match(name)
+        micros = (time.perf_counter() - started) * 1e6 / args.rounds
+        print(f"{name!r}: {result} ({micros:.1f} µs)")
+        missing += result is None or result["confidence"] < MIN_CONFIDENCE
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+import os, re, sqlite3, asyncio, threading, time, unicodedata
+from urllib.parse import urlsplit
+import requests
+from dotenv import load_dotenv
+
+from services import gazetteer, metrics
+from services.cache import TTLCache
+from services.log import get_logger
+
+load_dotenv()
+log = get_logger(__name__)
+
+GEOCODE_DB = os.getenv("GEOCODE_CACHE_DB", os.path.join(".cache", "geocode.sqlite3"))
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "5000"))
+GEOCODE_MEMORY_TTL = float(os.getenv("GEOCODE_MEMORY_TTL", str(24 * 3600)))
+GEOCODE_DISK_TTL = float(os.getenv("GEOCODE_DISK_TTL", str(90 * 24 * 3600)))
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "5"))
+
+OPEN_METEO_GEOCODING_URL = os.getenv("OPEN_METEO_GEOCODING_URL", "https://geocoding-api.open-meteo.com/v1/search")
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+
+_memory = TTLCache(maxsize=GEOCODE_CACHE_SIZE, ttl=GEOCODE_MEMORY_TTL)
+_session = requests.Session()
+_nominatim = None
+_db = None
+_db_lock = threading.Lock()
+
+_counters = {"gazetteer_hits": 0, "memory_hits": 0, "disk_hits": 0, "lookups": 0, "fallbacks": 0, "failures": 0}
+_counters_lock = threading.Lock()
+
+
+class LocationNotFound(ValueError):
+    """No gazetteer entry or geocoder knows the place; callers report it instead of guessing."""
+
+    def __init__(self, name: str):
+        super().__init__(f"Could not find the location '{name}'. Try the district or a nearby town, e.g. 'Nashik, Maharashtra'.")
+        self.name = name
+
+
+def normalize_name(name: str) -> str:
+    """'  Jaipur,  RAJASTHAN ' -> 'jaipur, rajasthan'"""
+    text = unicodedata.normalize("NFKC", str(name or "")).casefold()
+    text = re.sub(r"[^\w,\s]", " ", text)
+    text = re.sub(r"\s*,\s*", ", ", text)
+    return re.sub(r"\s+", " ", text).strip(" ,")
+
+
+def _count(key: str):
+    with _counters_lock:
+        _counters[key] += 1
+
+
+def _get_db():
+    global _db
+    if _db is None:
+        folder = os.path.dirname(GEOCODE_DB)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        _db = sqlite3.connect(GEOCODE_DB, check_same_thread=False)
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "name TEXT PRIMARY KEY, lat REAL, lon REAL, provider TEXT, updated REAL, label TEXT, confidence REAL)"
+        )
+        columns = {row[1] for row in _db.execute("PRAGMA table_info(geocode)")}
+        for column, kind in (("label", "TEXT"), ("confidence", "REAL")):
+            if column not in columns:
+                _db.execute(f"ALTER TABLE geocode ADD COLUMN {column} {kind}")
+        _db.commit()
+    return _db
+
+
+def _disk_get(key: str):
+    try:
+        with _db_lock:
+            row = _get_db().execute(
+                "SELECT lat, lon, updated, provider, label, confidence FROM geocode WHERE name = ?", (key,)
+            ).fetchone()
+    except sqlite3.Error as e:
+        log.warning("Geocode cache read failed: %s", e)
+        return None
+    if row and time.time() - row[2] < GEOCODE_DISK_TTL:
+        return _place(row[4] or key, row[0], row[1], row[3], row[5])
+    return None
+
+
+def _disk_put(key: str, place: dict):
+    try:
+        with _db_lock:
+            db = _get_db()
+            db.execute(
+                "INSERT OR REPLACE INTO geocode (name, lat, lon, provider, updated, label, confidence) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, place["lat"], place["lon"], place["source"], time.time(), place["name"], place["confidence"]),
+            )
+            db.commit()
+    except sqlite3.Error as e:
+        log.warning("Geocode cache write failed: %s", e)
+
+
+def _lookup_open_meteo(name: str):
+    r = _session.get(
+        OPEN_METEO_GEOCODING_URL,
+        params={"name": name, "count": 1},
+        timeout=GEOCODE_TIMEOUT,
+    )
+    data = r.json()
+    if data.get("results"):
+        top = data["results"][0]
+        return top["latitude"], top["longitude"], top.get("name") or name
+    return None
+
+
+def _lookup_nominatim(name: str):
+    global _nominatim
+    if _nominatim is None:
+        from geopy.geocoders import Nominatim
+        url = urlsplit(NOMINATIM_URL)
+        _nominatim = Nominatim(
+            user_agent="krishimitra", timeout=GEOCODE_TIMEOUT,
+            scheme=url.scheme, domain=url.netloc + url.path.rsplit("/search", 1)[0],
+        )
+    loc = _nominatim.geocode(name)
+    if loc:
+        return loc.latitude, loc.longitude, loc.address or name
+    return None
+
+
+async def _lookup_open_meteo_async(name: str):
+    from services.open_meteo import get_async_client
+    r = await get_async_client().get(
+        OPEN_METEO_GEOCODING_URL, params={"name": name, "count": 1}, timeout=GEOCODE_TIMEOUT
+    )
+    data = r.json()
+    if data.get("results"):
+        top = data["results"][0]
+        return top["latitude"], top["longitude"], top.get("name") or name
+    return None
+
+
+async def _lookup_nominatim_async(name: str):
+    from services.open_meteo import get_async_client
+    r = await get_async_client().get(
+        NOMINATIM_URL,
+        params={"q": name, "format": "json", "limit": 1},
+        headers={"User-Agent": "krishimitra"},
+        timeout=GEOCODE_TIMEOUT,
+    )
+    data = r.json()
+    if data:
+        return float(data[0]["lat"]), float(data[0]["lon"]), data[0].get("display_name") or name
+    return None
+
+
+PROVIDERS = [("open-meteo", _lookup_open_meteo), ("nominatim", _lookup_nominatim)]
+ASYNC_PROVIDERS = [("open-meteo", _lookup_open_meteo_async), ("nominatim", _lookup_nominatim_async)]
+
+
+def _place(label: str, lat, lon, source: str, confidence) -> dict:
+    return {
+        "name": label.split(",")[0].strip(),
+        "lat": float(lat),
+        "lon": float(lon),
+        "source": source,
+        "confidence": confidence,
+    }
+
+
+def _local(name: str):
+    """-> (confident gazetteer match or None, weaker match kept for when the network fails)"""
+    found = gazetteer.match(name)
+    if found and found["confidence"] >= gazetteer.MIN_CONFIDENCE:
+        _count("gazetteer_hits")
+        return found, None
+    if found and found["confidence"] >= gazetteer.FALLBACK_CONFIDENCE:
+        return None, found
+    return None, None
+
+
+def _from_memory(key: str):
+    place = _memory.get(key)
+    if place is not None:
+        _count("memory_hits")
+    return place
+
+
+def _from_disk(key: str):
+    place = _disk_get(key)
+    if place is not None:
+        _count("disk_hits")
+        _memory.set(key, place)
+    return place
+
+
+def _cached(key: str):
+    return _from_memory(key) or _from_disk(key)
+
+
+def _store(key: str, found, provider: str):
+    lat, lon, label = found
+    place = _place(label, lat, lon, provider, gazetteer.similarity(key, label))
+    _memory.set(key, place)
+    _disk_put(key, place)
+    return place
+
+
+def _fallback(key: str, weak):
+    if weak is not None:
+        _count("fallbacks")
+        log.info("Network geocoding failed for '%s'; using gazetteer match %s (%.2f)", key, weak["name"], weak["confidence"])
+        return weak
+    _count("failures")
+    return None
+
+
+def locate(name: str):
+    """
+    Resolve a place name to {"name", "lat", "lon", "source", "confidence", ...}.
+    Order: bundled gazetteer -> in-memory LRU -> SQLite store -> Open-Meteo -> Nominatim,
+    then a weaker gazetteer match. `confidence` (0..1) says how closely the
+    matched name fits the query. Returns None when nothing matches.
+    """
+    key = normalize_name(name)
+    if not key:
+        return None
+    place, weak = _local(name)
+    if place is not None:
+        return place
+    place = _cached(key)
+    if place is not None:
+        return place
+
+    _count("lookups")
+    for provider, lookup in PROVIDERS:
+        try:
+            with metrics.timed(f"geocode_{provider}"):
+                found = lookup(key)
+        except Exception as e:
+            log.warning("Geocoding via %s failed for '%s': %s", provider, key, e)
+            continue
+        if found:
+            return _store(key, found, provider)
+    return _fallback(key, weak)
+
+
+async def locate_async(name: str):
+    """Same lookup order as locate(), with non-blocking network providers."""
+    key = normalize_name(name)
+    if not key:
+        return None
+    place, weak = _local(name)
+    if place is not None:
+        return place
+    # SQLite reads and writes run on a worker thread, never on the event loop
+    place = _from_memory(key) or await asyncio.to_thread(_from_disk, key)
+    if place is not None:
+        return place
+
+    _count("lookups")
+    for provider, lookup in ASYNC_PROVIDERS:
+        try:
+            with metrics.timed(f"geocode_{provider}"):
+                found = await lookup(key)
+        except Exception as e:
+            log.warning("Geocoding via %s failed for '%s': %s", provider, key, e)
+            continue
+        if found:
+            return await asyncio.to_thread(_store, key, found, provider)
+    return _fallback(key, weak)
+
+
+def geocode(name: str):
+    """(lat, lon) for a place name, or None — see locate()."""
+    place = locate(name)
+    return (place["lat"], place["lon"]) if place else None
+
+
+async def geocode_async(name: str):
+    place = await locate_async(name)
+    return (place["lat"], place["lon"]) if place else None
+
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    served = counters["gazetteer_hits"] + counters["memory_hits"] + counters["disk_hits"]
+    total = served + counters["lookups"]
+    counters["hit_rate"] = round(served / total, 3) if total else 0.0
+    counters["memory"] = _memory.stats()
+    counters["gazetteer"] = gazetteer.stats()
+    return counters
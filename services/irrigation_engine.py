@@ -0,0 +1,263 @@
+"""
+FAO-56 irrigation scheduling from the Open-Meteo daily forecast.
+
+    ET0   Hargreaves-Samani (FAO-56 eq. 52) from Tmax / Tmin and latitude
+    ETc   Kc x ET0 with the FAO-56 piecewise-linear Kc curve per crop
+    Dr    daily root-zone depletion; irrigate back to field capacity once
+          Dr passes the readily available water (p x TAW)
+
+The building blocks (ET0, Kc, effective rain, water balance) take NumPy
+arrays shaped (..., days); plan_irrigation() schedules one plot.
+"""
+
+import numpy as np
+
+# FAO-56 Tables 11, 12 and 22: (Kc ini, Kc mid, Kc end),
+# stage lengths in days (initial, development, mid, late),
+# max effective root depth in m, depletion fraction p.
+CROPS = {
+    "wheat":     ((0.30, 1.15, 0.40), (20, 25, 60, 30), 1.25, 0.55),
+    "rice":      ((1.05, 1.20, 0.90), (30, 30, 60, 30), 0.50, 0.20),
+    "maize":     ((0.30, 1.20, 0.60), (20, 35, 40, 30), 1.20, 0.55),
+    "cotton":    ((0.35, 1.18, 0.60), (30, 50, 60, 55), 1.30, 0.65),
+    "sugarcane": ((0.40, 1.25, 0.75), (35, 60, 190, 120), 1.50, 0.65),
+    "soybean":   ((0.40, 1.15, 0.50), (20, 30, 60, 25), 0.80, 0.50),
+    "mustard":   ((0.35, 1.10, 0.35), (25, 35, 55, 30), 1.20, 0.60),
+    "potato":    ((0.50, 1.15, 0.75), (25, 30, 45, 30), 0.50, 0.35),
+    "tomato":    ((0.60, 1.15, 0.80), (30, 40, 40, 25), 1.00, 0.40),
+    "onion":     ((0.70, 1.05, 0.75), (15, 25, 70, 40), 0.40, 0.30),
+    "groundnut": ((0.40, 1.15, 0.60), (25, 35, 45, 25), 0.75, 0.50),
+    "chickpea":  ((0.40, 1.00, 0.35), (20, 30, 40, 20), 0.80, 0.50),
+    "millet":    ((0.30, 1.00, 0.30), (15, 25, 40, 25), 1.50, 0.55),
+}
+DEFAULT_CROP = ((0.50, 1.05, 0.70), (25, 35, 50, 30), 1.00, 0.50)
+CROP_ALIASES = {
+    "gehu": "wheat", "gehun": "wheat", "dhan": "rice", "paddy": "rice", "chawal": "rice",
+    "makka": "maize", "corn": "maize", "kapas": "cotton", "ganna": "sugarcane",
+    "soya": "soybean", "soyabean": "soybean", "sarson": "mustard", "rapeseed": "mustard",
+    "aloo": "potato", "tamatar": "tomato", "pyaz": "onion", "pyaaz": "onion",
+    "moongfali": "groundnut", "peanut": "groundnut", "chana": "chickpea", "gram": "chickpea",
+    "bajra": "millet", "jowar": "millet", "ragi": "millet", "sorghum": "millet",
+}
+
+# Volumetric water content at field capacity / wilting point (FAO-56 Table 19),
+# with the common Indian soil names mapped to their texture class.
+SOILS = {
+    "sandy":      (0.12, 0.04),
+    "loamy sand": (0.14, 0.06),
+    "sandy loam": (0.23, 0.10),
+    "loamy":      (0.25, 0.12),
+    "silt loam":  (0.29, 0.13),
+    "clay loam":  (0.32, 0.18),
+    "clay":       (0.40, 0.25),
+    "black":      (0.42, 0.25),
+    "alluvial":   (0.26, 0.12),
+    "red":        (0.22, 0.10),
+    "laterite":   (0.20, 0.10),
+}
+DEFAULT_SOIL = SOILS["loamy"]
+SOIL_ALIASES = {"sand": "sandy", "loam": "loamy", "regur": "black", "black cotton": "black", "kali": "black"}
+
+STAGES = ["initial", "development", "mid", "late"]
+RAINY_DAY_MM = 2.5            # IMD rainy-day threshold
+IRRIGATION_EFFICIENCY = 0.7   # surface / furrow application
+MAX_APPLICATION_MM = 60.0     # net depth one flood / furrow irrigation can put in
+
+
+def crop_profile(crop: str):
+    name = str(crop or "").strip().lower()
+    name = CROP_ALIASES.get(name, name)
+    return name if name in CROPS else "default", CROPS.get(name, DEFAULT_CROP)
+
+
+def soil_profile(soil: str):
+    name = str(soil or "").strip().lower().replace(" soil", "")
+    name = SOIL_ALIASES.get(name, name)
+    return name if name in SOILS else "default", SOILS.get(name, DEFAULT_SOIL)
+
+
+def extraterrestrial_radiation(lat, doy):
+    """Ra in MJ m-2 day-1 (FAO-56 eq. 21-25). lat in degrees, doy day of year."""
+    phi = np.radians(lat)
+    angle = 2 * np.pi * np.asarray(doy) / 365
+    dr = 1 + 0.033 * np.cos(angle)
+    delta = 0.409 * np.sin(angle - 1.39)
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1.0, 1.0))
+    return (24 * 60 / np.pi) * 0.0820 * dr * (
+        ws * np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.sin(ws)
+    )
+
+
+def hargreaves_et0(tmax, tmin, lat, doy):
+    """Reference evapotranspiration in mm/day (FAO-56 eq. 52)."""
+    tmax, tmin = np.asarray(tmax, dtype=float), np.asarray(tmin, dtype=float)
+    ra = extraterrestrial_radiation(lat, doy)
+    et0 = 0.0023 * ((tmax + tmin) / 2 + 17.8) * np.sqrt(np.clip(tmax - tmin, 0, None)) * 0.408 * ra
+    return np.clip(np.nan_to_num(et0), 0, None)
+
+
+def crop_coefficients(profile, days_after_sowing):
+    """FAO-56 Kc curve: flat initial, linear development, flat mid, linear late."""
+    (kc_ini, kc_mid, kc_end), lengths, _, _ = profile
+    edges = np.concatenate([[0], np.cumsum(lengths)])
+    return np.interp(days_after_sowing, edges, [kc_ini, kc_ini, kc_mid, kc_mid, kc_end])
+
+
+def start_day(profile, days_after_sowing=None, growth_stage=None) -> float:
+    """Day after sowing for the first forecast day; defaults to the middle of the mid-season stage."""
+    if days_after_sowing is not None:
+        return max(0.0, float(days_after_sowing))
+    lengths = profile[1]
+    stage = str(growth_stage or "mid").strip().lower()
+    i = STAGES.index(stage) if stage in STAGES else 2
+    return float(sum(lengths[:i]) + lengths[i] / 2)
+
+
+def effective_rain(precip):
+    """Light showers mostly evaporate; 80 % of the rest reaches the root zone."""
+    precip = np.nan_to_num(np.asarray(precip, dtype=float))
+    return np.where(precip > 2.0, 0.8 * precip, 0.0)
+
+
+def water_balance(etc, peff, taw, raw, depletion0, efficiency: float = IRRIGATION_EFFICIENCY,
+                  max_application: float = MAX_APPLICATION_MM):
+    """
+    Daily root-zone depletion; once it passes RAW the plot is refilled
+    towards field capacity, at most `max_application` mm net per event.
+    Watering is deferred a day when tomorrow's rain covers at least half of the deficit.
+    Returns (depletion_mm, gross_irrigation_mm), both shaped like etc.
+    """
+    etc, peff = np.asarray(etc, dtype=float), np.asarray(peff, dtype=float)
+    taw = np.asarray(taw, dtype=float)
+    dr = np.broadcast_to(np.asarray(depletion0, dtype=float), etc.shape[:-1]).copy()
+    depletion = np.empty_like(etc)
+    irrigation = np.zeros_like(etc)
+    days = etc.shape[-1]
+    for d in range(days):
+        dr = np.clip(dr - peff[..., d] + etc[..., d], 0, taw)
+        tomorrow = peff[..., d + 1] if d + 1 < days else 0.0
+        water = (dr > raw) & (tomorrow < dr / 2)
+        net = np.where(water, np.minimum(dr, max_application), 0.0)
+        irrigation[..., d] = net / efficiency
+        dr = dr - net
+        depletion[..., d] = dr
+    return depletion, irrigation
+
+
+def weather_trend(precip, etc) -> str:
+    """'dry' | 'rainy' | 'mixed' from forecast rainfall against crop demand."""
+    precip = np.nan_to_num(np.asarray(precip, dtype=float))
+    rain, demand = float(precip.sum()), float(np.sum(etc))
+    rainy_days = int((precip >= RAINY_DAY_MM).sum())
+    if rainy_days <= 1 and rain < 0.2 * demand:
+        return "dry"
+    if rainy_days >= 4 or rain >= demand:
+        return "rainy"
+    return "mixed"
+
+
+TREND_TEXT = {
+    "dry": "Agle {days} din zyada tar sookha mausam rahega",
+    "rainy": "Agle {days} din barish wala mausam rahega",
+    "mixed": "Agle {days} din mila-jula mausam rahega — kuch din barish, kuch din dhoop",
+}
+
+
+def describe_trend(plan: dict) -> str:
+    w = plan["weather"]
+    text = TREND_TEXT[plan["trend"]].format(days=len(plan["schedule"]))
+    return (
+        f"{text}. Kul barish lagbhag {w['total_rain_mm']} mm ({w['rainy_days']} barish wale din), "
+        f"taapmaan {w['tmin_c']}–{w['tmax_c']}°C."
+    )
+
+
+def describe_schedule(plan: dict) -> str:
+    """Plain Hinglish advice straight from the numbers — used when the LLM is unavailable."""
+    events = [d for d in plan["schedule"] if d["irrigation_mm"] > 0]
+    lines = []
+    if events:
+        days = ", ".join(f"{d['day']} ko ~{d['irrigation_mm']:.0f} mm" for d in events)
+        lines.append(f"Paani dene ka schedule: {days}.")
+    else:
+        lines.append("Is hafte alag se sinchai ki zarurat nahi dikh rahi — mitti me kaafi nami rahegi.")
+    lines.append(
+        f"Fasal ko is hafte lagbhag {plan['totals']['etc_mm']:.0f} mm paani chahiye, "
+        f"jisme se ~{plan['totals']['effective_rain_mm']:.0f} mm barish se milega."
+    )
+    if plan["trend"] != "dry":
+        lines.append("Jis din achhi barish ho us din paani band rakhein.")
+    lines.append("Subah jaldi ya shaam ko paani dein aur mitti par mulching karke nami bachayein.")
+    return "\n".join(lines)
+
+
+def plan_irrigation(forecast: dict, lat: float, crop: str, soil: str,
+                    days_after_sowing=None, growth_stage=None) -> dict:
+    """
+    Day-by-day irrigation plan for one plot from an Open-Meteo forecast
+    response (the merged current + daily block from services.open_meteo).
+    """
+    daily = forecast["daily"]
+    dates = np.asarray(daily["time"], dtype="datetime64[D]")
+    doy = (dates - dates.astype("datetime64[Y]")).astype(int) + 1
+    tmax = np.asarray(daily["temperature_2m_max"], dtype=float)
+    tmin = np.asarray(daily["temperature_2m_min"], dtype=float)
+    precip = np.asarray(daily["precipitation_sum"], dtype=float)
+
+    crop_name, profile = crop_profile(crop)
+    soil_name, (fc, wp) = soil_profile(soil)
+    root_depth, p = profile[2], profile[3]
+    taw = 1000 * (fc - wp) * root_depth
+    raw = p * taw
+
+    # The 0-10 cm reading dries out much faster than the whole root zone,
+    # so it can only say "somewhere between wet and due for watering".
+    theta = (forecast.get("current") or {}).get("soil_moisture_0_to_10cm")
+    if theta is None:
+        depletion0 = 0.5 * raw
+    else:
+        depletion0 = raw * float(np.clip((fc - theta) / (fc - wp), 0, 1))
+
+    das = start_day(profile, days_after_sowing, growth_stage) + np.arange(len(dates))
+    kc = crop_coefficients(profile, das)
+    et0 = hargreaves_et0(tmax, tmin, lat, doy)
+    etc = kc * et0
+    peff = effective_rain(precip)
+    depletion, irrigation = water_balance(etc, peff, taw, raw, depletion0)
+
+    schedule = [
+        {
+            "day": str(dates[i]),
+            "et0_mm": round(float(et0[i]), 1),
+            "kc": round(float(kc[i]), 2),
+            "etc_mm": round(float(etc[i]), 1),
+            "rain_mm": round(float(np.nan_to_num(precip[i])), 1),
+            "effective_rain_mm": round(float(peff[i]), 1),
+            "depletion_mm": round(float(depletion[i]), 1),
+            "irrigation_mm": round(float(irrigation[i]), 1),
+        }
+        for i in range(len(dates))
+    ]
+    return {
+        "crop": crop_name,
+        "soil": soil_name,
+        "trend": weather_trend(precip, etc),
+        "weather": {
+            "total_rain_mm": round(float(np.nansum(precip)), 1),
+            "rainy_days": int((np.nan_to_num(precip) >= RAINY_DAY_MM).sum()),
+            "tmin_c": round(float(np.nanmin(tmin)), 1),
+            "tmax_c": round(float(np.nanmax(tmax)), 1),
+        },
+        "soil_water": {
+            "taw_mm": round(taw, 1),
+            "raw_mm": round(raw, 1),
+            "initial_depletion_mm": round(depletion0, 1),
+        },
+        "totals": {
+            "et0_mm": round(float(et0.sum()), 1),
+            "etc_mm": round(float(etc.sum()), 1),
+            "effective_rain_mm": round(float(peff.sum()), 1),
+            "irrigation_mm": round(float(irrigation.sum()), 1),
+        },
+        "schedule": schedule,
+    }
@@ -0,0 +1,240 @@
+"""
+Curated agronomy answers for the Q&A chain, searched with BM25 in process.
+
+    KNOWLEDGE_BASE_FILES=data/knowledge_base.json[,more.json]   id, questions, keywords, answer
+    QNA_KB_DIRECT=0.85   answer straight from the knowledge base at or above this confidence
+    QNA_KB_CONTEXT=0.4   at or above this, send only the retrieved passages to the LLM
+    QNA_KB_PASSAGES=2    passages in that shorter prompt
+
+Entries and queries go through the same tokenizer: Devanagari is
+transliterated, Hinglish spellings are folded as in the answer cache,
+crop names become one English name ("gehu", "gehun", "गेहूं" -> wheat)
+and function words are dropped. Entries are ranked with BM25 (questions
+and keywords count twice, the answer once). Confidence is the share of
+the query's IDF weight found in the best entry's questions and keywords:
+"5 acre gehu me kitna urea" loses the weight of the unknown "5", so the
+per-acre entry goes to the LLM as context instead of being returned as is.
+
+    python -m services.knowledge_base search "gehu me urea kitna dale"
+"""
+
+import os, re, sys, json, math, time, argparse, threading
+from collections import Counter, defaultdict
+
+from services.answer_cache import normalize_query
+from services.gazetteer import transliterate
+from services.log import get_logger
+
+KNOWLEDGE_BASE_FILES = [
+    p.strip() for p in os.getenv("KNOWLEDGE_BASE_FILES", os.path.join("data", "knowledge_base.json")).split(",")
+    if p.strip()
+]
+DIRECT_CONFIDENCE = float(os.getenv("QNA_KB_DIRECT", "0.85"))
+CONTEXT_CONFIDENCE = float(os.getenv("QNA_KB_CONTEXT", "0.4"))
+PASSAGES = int(os.getenv("QNA_KB_PASSAGES", "2"))
+K1, B = 1.2, 0.75
+TOPIC_WEIGHT = 2
+log = get_logger(__name__)
+
+# Keys are written after normalize_query() (vowel runs squashed: "beej" -> "bej").
+SYNONYMS = {
+    "gehu": "wheat", "gahun": "wheat", "dhan": "rice", "chawal": "rice",
+    "chana": "chickpea", "chane": "chickpea", "gram": "chickpea",
+    "maka": "maize", "makka": "maize", "make": "maize", "makke": "maize", "makai": "maize", "corn": "maize",
+    "kapas": "cotton", "narma": "cotton",
+    "gana": "sugarcane", "ganna": "sugarcane", "gane": "sugarcane", "ganne": "sugarcane",
+    "soya": "soybean", "soyabean": "soybean", "soyabin": "soybean",
+    "sarson": "mustard", "sarso": "mustard", "sarason": "mustard", "rai": "mustard",
+    "alu": "potato", "alo": "potato", "tamatar": "tomato", "tamater": "tomato",
+    "pyaz": "onion", "pyaj": "onion", "piyaz": "onion", "piyaj": "onion", "kanda": "onion",
+    "mungfali": "groundnut", "moongfali": "groundnut", "mongfali": "groundnut", "peanut": "groundnut",
+    "bajra": "millet", "bajre": "millet", "mung": "moong", "mong": "moong",
+    "buvai": "buwai", "bowai": "buwai", "buai": "buwai", "bijai": "buwai", "sowing": "buwai",
+    "boye": "buwai", "boyein": "buwai", "bone": "buwai", "boe": "buwai", "bui": "buwai",
+    "sichai": "sinchai", "irigation": "sinchai", "irrigation": "sinchai",
+    "urvarak": "khad", "manure": "khad",
+    "bij": "bej", "bija": "bej", "sed": "bej",
+    "yuriya": "urea", "uriya": "urea", "diep": "dap",
+    "nim": "nem", "neemoil": "nem",
+    "jevamrit": "jevamrut", "jivamrut": "jevamrut", "jivamrit": "jevamrut", "jivamrt": "jevamrut",
+    "dimak": "demak", "termite": "demak",
+    "rog": "bimari", "disease": "bimari",
+    "men": "me", "mem": "me",
+    "kaunsi": "konsa", "konsi": "konsa", "konse": "konsa", "which": "konsa",
+    "kitni": "kitna", "how": "kaise", "kese": "kaise", "kaisi": "kaise",
+    "when": "kab", "kyu": "kyon", "kyun": "kyon", "kyo": "kyon", "why": "kyon",
+    "ekar": "acre",
+}
+STOPWORDS = {
+    "me", "main", "ke", "ka", "ki", "k", "kya", "se", "ko", "par", "pe", "aur", "ya", "to", "bhi", "ye", "yeh", "is", "us", "ek",
+    "mera", "meri", "mere", "hum", "ham", "hamare", "apne", "apni", "karna", "chahiye", "ho", "hota", "hoti",
+    "raha", "rahe", "rahi", "gaya", "gayi", "gaye", "liye", "kuch", "koi", "sahi", "jankari", "about",
+    "the", "a", "an", "of", "in", "for", "is", "are", "what", "do", "i", "my", "per", "sakte", "sakta",
+    "dena", "de", "lagta", "lagti", "jata", "jati", "wala", "wali", "wale", "kisan",
+}
+_WORD = re.compile(r"\w+")
+
+
+def tokens(text: str):
+    """'गेहूं में यूरिया कितना डालें' -> ['wheat', 'urea', 'kitna', 'dale']"""
+    words = []
+    for word in normalize_query(transliterate(str(text or ""))).split():
+        word = SYNONYMS.get(word, word)
+        if word not in STOPWORDS and _WORD.fullmatch(word):
+            words.append(word)
+    return words
+
+
+class KnowledgeBase:
+    """Entries with an inverted index: term -> [(entry, weighted term frequency)]."""
+
+    def __init__(self, entries=None):
+        self.entries = []
+        self.topics = []                    # entry -> set of question / keyword terms
+        self.lengths = []
+        self.postings = defaultdict(list)
+        self.idf = {}
+        self._counters = {"direct": 0, "context": 0, "misses": 0}
+        self._lock = threading.Lock()
+        for entry in entries or ():
+            self.add(entry)
+        self.finish()
+
+    @classmethod
+    def load(cls, paths=KNOWLEDGE_BASE_FILES):
+        entries = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                entries.extend(json.load(f))
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry: dict):
+        topic = tokens(" ".join(entry.get("questions", []) + entry.get("keywords", [])))
+        counts = Counter(topic * TOPIC_WEIGHT + tokens(entry["answer"]))
+        doc = len(self.entries)
+        self.entries.append(entry)
+        self.topics.append(set(topic))
+        self.lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            self.postings[term].append((doc, tf))
+
+    def finish(self):
+        """BM25 IDF for every term, once all entries are added."""
+        n = len(self.entries)
+        self.idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self.postings.items()}
+        self.unknown_idf = math.log(1 + (n + 0.5) / 0.5) if n else 0.0
+        self.average_length = sum(self.lengths) / n if n else 0.0
+
+    def scores(self, terms) -> dict:
+        scores = defaultdict(float)
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc, tf in self.postings[term]:
+                norm = K1 * (1 - B + B * self.lengths[doc] / self.average_length)
+                scores[doc] += idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def confidence(self, terms, doc: int) -> float:
+        """Share of the query's IDF weight present in the entry's questions / keywords."""
+        total = sum(self.idf.get(t, self.unknown_idf) for t in terms)
+        found = sum(self.idf[t] for t in terms if t in self.topics[doc])
+        return found / total if total else 0.0
+
+    def search(self, query: str, limit: int = PASSAGES):
+        """-> best entries first: [{"id", "answer", "score", "confidence"}]"""
+        terms = list(dict.fromkeys(tokens(query)))
+        scores = self.scores(terms)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:max(limit, 2)]
+        return [
+            {
+                "id": self.entries[doc].get("id", str(doc)),
+                "answer": self.entries[doc]["answer"],
+                "score": round(score, 3),
+                "confidence": round(self.confidence(terms, doc), 3),
+            }
+            for doc, score in ranked
+        ]
+
+    def lookup(self, query: str):
+        """
+        -> ("direct", [best]) | ("context", passages) | ("miss", []).
+        A direct answer also needs a clear winner: when the runner-up is as
+        confident, both go to the LLM as context instead.
+        """
+        hits = self.search(query)
+        best = hits[0]["confidence"] if hits else 0.0
+        if best >= DIRECT_CONFIDENCE and (len(hits) < 2 or hits[1]["confidence"] < best):
+            kind, found = "direct", hits[:1]
+        elif best >= CONTEXT_CONFIDENCE:
+            kind, found = "context", [h for h in hits[:PASSAGES] if h["confidence"] >= CONTEXT_CONFIDENCE / 2]
+        else:
+            kind, found = "miss", []
+        with self._lock:
+            self._counters["misses" if kind == "miss" else kind] += 1
+        return kind, found
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        total = sum(counters.values())
+        counters["answered_locally"] = round(counters["direct"] / total, 3) if total else 0.0
+        counters["entries"] = len(self.entries)
+        counters["terms"] = len(self.postings)
+        return counters
+
+
+def _load():
+    try:
+        started = time.perf_counter()
+        index = KnowledgeBase.load()
+        log.debug("Knowledge base: %d entries, %d terms in %.1f ms",
+                  len(index), len(index.postings), (time.perf_counter() - started) * 1000)
+        return index
+    except (OSError, ValueError, KeyError) as e:
+        log.warning("Knowledge base unavailable, every question goes to the LLM: %s", e)
+        return KnowledgeBase()
+
+
+# Built once at import, so a preloading gunicorn master shares it with the workers.
+index = _load()
+
+
+def lookup(query: str):
+    return index.lookup(query)
+
+
+def stats() -> dict:
+    return index.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the bundled agronomy knowledge base")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_search = sub.add_parser("search", help="rank entries for questions and time the lookups")
+    p_search.add_argument("queries", nargs="+")
+    p_search.add_argument("--rounds", type=int, default=1000)
+    sub.add_parser("stats", help="index size")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print(stats())
+        return 0
+    for query in args.queries:
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            hits = index.search(query)
+        micros = (time.perf_counter() - started) * 1e6 / args.rounds
+        kind, _ = index.lookup(query)
+        print(f"{query!r} -> {kind} ({micros:.1f} µs) tokens={tokens(query)}")
+        for hit in hits:
+            print(f"    {hit['id']:<24} score={hit['score']:<8} confidence={hit['confidence']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+Shared Groq gateway for every chain.
+
+    chat(tag, **kwargs)          -> completion (blocking)
+    await chat_async(tag, ...)   -> completion (ASGI app)
+    stream(tag, **kwargs)        -> yields text deltas
+
+All calls go through one client per process and share:
+  * a token bucket sized to the Groq quota (GROQ_RPM requests/minute,
+    split across WEB_CONCURRENCY workers),
+  * jittered exponential retry on 429 / 5xx / connection errors,
+  * singleflight — identical in-flight requests share one completion,
+  * per-tag latency and token-usage counters (see stats()).
+"""
+
+import os, json, time, random, asyncio, threading
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from dotenv import load_dotenv
+import groq
+
+from services import metrics
+from services.log import get_logger
+
+load_dotenv()
+log = get_logger(__name__)
+
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_BURST = float(os.getenv("GROQ_BURST", "5"))
+GROQ_QUEUE_TIMEOUT = float(os.getenv("GROQ_QUEUE_TIMEOUT", "20"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+GROQ_BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "8"))
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None   # e.g. the fake server in bench/
+
+# Retries live here, so the SDK's own retry loop is switched off.
+client = groq.Groq(api_key=os.getenv("GROQ_API_KEY"), base_url=GROQ_BASE_URL, max_retries=0)
+async_client = groq.AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), base_url=GROQ_BASE_URL, max_retries=0)
+
+
+class RateLimited(RuntimeError):
+    """The local token bucket could not admit the call within GROQ_QUEUE_TIMEOUT."""
+
+
+class TokenBucket:
+    """
+    Reservation-style token bucket: every caller takes a token immediately
+    (the balance may go negative) and sleeps until its token has accrued,
+    so waiting callers are admitted in arrival order.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.waited = 0.0
+
+    def _reserve(self, timeout: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > timeout:
+                raise RateLimited(f"Groq rate limit: would wait {wait:.1f}s")
+            self.tokens -= 1
+            if wait:
+                self.throttled += 1
+                self.waited += wait
+            return wait
+
+    def acquire(self, timeout: float = GROQ_QUEUE_TIMEOUT):
+        wait = self._reserve(timeout)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: float = GROQ_QUEUE_TIMEOUT):
+        wait = self._reserve(timeout)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+bucket = TokenBucket(GROQ_RPM / WORKERS / 60.0, GROQ_BURST)
+
+_inflight = {}
+_inflight_async = {}
+_flight_lock = threading.Lock()
+
+_metrics_lock = threading.Lock()
+_metrics = defaultdict(lambda: {
+    "calls": 0, "errors": 0, "retries": 0, "coalesced": 0,
+    "prompt_tokens": 0, "completion_tokens": 0,
+    "latency_ms": deque(maxlen=500),
+})
+
+
+# --- retry / metrics helpers ----------------------------------------------
+
+def _retryable(error) -> bool:
+    if isinstance(error, groq.APIConnectionError):   # includes timeouts
+        return True
+    status = getattr(error, "status_code", None) or 0
+    return status == 429 or status >= 500
+
+
+def _backoff(attempt: int, error) -> float:
+    """Server's Retry-After when given, else full-jitter exponential backoff."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), GROQ_BACKOFF_MAX)
+    except ValueError:
+        pass
+    return random.uniform(0, min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * 2 ** attempt))
+
+
+def _record(tag: str, started: float, usage=None, error: bool = False, retries: int = 0):
+    with _metrics_lock:
+        m = _metrics[tag]
+        m["calls"] += 1
+        m["retries"] += retries
+        if error:
+            m["errors"] += 1
+        m["latency_ms"].append((time.monotonic() - started) * 1000)
+        if usage is not None:
+            m["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            m["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+    metrics.count_tokens(usage)
+
+
+def _coalesced(tag: str):
+    with _metrics_lock:
+        _metrics[tag]["coalesced"] += 1
+
+
+def _flight_key(kwargs: dict) -> str:
+    return json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+
+
+# --- blocking -------------------------------------------------------------
+
+def _call(tag: str, kwargs: dict):
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            bucket.acquire()
+            with metrics.timed("groq"):
+                response = client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt >= GROQ_MAX_RETRIES or not _retryable(e):
+                _record(tag, started, error=True, retries=attempt)
+                raise
+            delay = _backoff(attempt, e)
+            log.warning("Groq %s call failed (%s), retry in %.1fs", tag, e.__class__.__name__, delay)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        _record(tag, started, getattr(response, "usage", None), retries=attempt)
+        return response
+
+
+def chat(tag: str, **kwargs):
+    """chat.completions.create() with rate limiting, retries and singleflight."""
+    key = _flight_key(kwargs)
+    with _flight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        _coalesced(tag)
+        return future.result()
+
+    try:
+        response = _call(tag, kwargs)
+        future.set_result(response)
+        return response
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _flight_lock:
+            _inflight.pop(key, None)
+
+
+def stream(tag: str, **kwargs):
+    """
+    Yield text deltas of a streamed completion. Opening the stream is
+    rate limited and retried; once tokens flow, errors propagate.
+    """
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            bucket.acquire()
+            chunks = client.chat.completions.create(stream=True, **kwargs)
+            break
+        except Exception as e:
+            if attempt >= GROQ_MAX_RETRIES or not _retryable(e):
+                _record(tag, started, error=True, retries=attempt)
+                raise
+            time.sleep(_backoff(attempt, e))
+            attempt += 1
+
+    usage = None
+    try:
+        with metrics.timed("groq_stream"):
+            for chunk in chunks:
+                x_groq = getattr(chunk, "x_groq", None)
+                if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                    usage = x_groq.usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+    except Exception:
+        _record(tag, started, usage, error=True, retries=attempt)
+        raise
+    _record(tag, started, usage, retries=attempt)
+
+
+def ping():
+    """
+    Cheap authenticated request that opens / refreshes the pooled connection.
+    Not a chat completion, so it bypasses the token bucket and never delays one.
+    """
+    return client.models.list()
+
+
+# --- async ----------------------------------------------------------------
+
+async def _call_async(tag: str, kwargs: dict):
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            await bucket.acquire_async()
+            with metrics.timed("groq"):
+                response = await async_client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt >= GROQ_MAX_RETRIES or not _retryable(e):
+                _record(tag, started, error=True, retries=attempt)
+                raise
+            delay = _backoff(attempt, e)
+            log.warning("Groq %s call failed (%s), retry in %.1fs", tag, e.__class__.__name__, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        _record(tag, started, getattr(response, "usage", None), retries=attempt)
+        return response
+
+
+async def chat_async(tag: str, **kwargs):
+    """Async twin of chat() — coalesces identical calls on the running event loop."""
+    key = _flight_key(kwargs)
+    future = _inflight_async.get(key)
+    if future is not None:
+        _coalesced(tag)
+        return await asyncio.shield(future)
+
+    future = _inflight_async[key] = asyncio.get_running_loop().create_future()
+    try:
+        response = await _call_async(tag, kwargs)
+        future.set_result(response)
+        return response
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()   # followers re-raise it; don't warn when there are none
+        raise
+    finally:
+        _inflight_async.pop(key, None)
+
+
+# --- metrics --------------------------------------------------------------
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+def stats() -> dict:
+    with _metrics_lock:
+        per_tag = {}
+        for tag, m in _metrics.items():
+            latencies = list(m["latency_ms"])
+            per_tag[tag] = {
+                **{k: v for k, v in m.items() if k != "latency_ms"},
+                "p50_ms": _percentile(latencies, 0.5),
+                "p95_ms": _percentile(latencies, 0.95),
+            }
+    return {
+        "rpm_per_worker": round(GROQ_RPM / WORKERS, 2),
+        "burst": GROQ_BURST,
+        "throttled": bucket.throttled,
+        "throttled_seconds": round(bucket.waited, 1),
+        "in_flight": len(_inflight) + len(_inflight_async),
+        "calls": per_tag,
+    }
@@ -0,0 +1,85 @@
+"""
+Leveled, sampled JSON logging.
+
+    log = get_logger(__name__)
+    log.info("forecast cached", extra={"cell": cell})
+
+    LOG_LEVEL=INFO          minimum level (DEBUG to see per-request detail)
+    LOG_SAMPLE_RATE=1.0     fraction of DEBUG / INFO records kept; warnings
+                            and errors are always kept
+
+Records are handed to a queue and written by a background thread, so
+request threads never block on stdout.
+"""
+
+import os, sys, json, time, random, logging, atexit
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+from services.metrics import current_module
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "module": getattr(record, "chain", None) or "none",
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD and key != "chain":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        record.chain = current_module.get()   # captured on the request thread
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+def _configure():
+    root = logging.getLogger("krishimitra")
+    if root.handlers:
+        return root
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+
+    handler = QueueHandler(SimpleQueue())
+    handler.addFilter(SampleFilter(LOG_SAMPLE_RATE))
+    root.addHandler(handler)
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listen(handler, stream)
+    # Forked workers (gunicorn --preload) need their own queue and writer thread.
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: _listen(handler, stream))
+    return root
+
+
+def _listen(handler: QueueHandler, stream: logging.Handler):
+    handler.queue = SimpleQueue()
+    listener = QueueListener(handler.queue, stream)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+_root = _configure()
+
+
+def get_logger(name: str) -> logging.Logger:
+    return _root.getChild(name.rsplit(".", 1)[-1])
@@ -0,0 +1,159 @@
+"""
+Per-stage latency histograms and counters in Prometheus text format.
+
+    with metrics.track("crop_chain"):        # one request: total latency + outcome
+        with metrics.timed("geocode"):       # one stage inside it
+            ...
+
+The chain label comes from a context variable set by track(), so shared
+helpers (geocoding, Open-Meteo, the Groq gateway) are attributed to the
+chain that called them. run_stages() and asyncio carry the context into
+worker threads / tasks; threads that serve several chains (the disease
+micro-batcher) pass `module=` explicitly.
+
+Metrics are per process — scrape every worker, or run one worker per
+container.
+"""
+
+import time, threading, contextvars
+from contextlib import ContextDecorator, contextmanager
+
+current_module = contextvars.ContextVar("krishimitra_module", default="none")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _label_text(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"'.replace("\n", " ") for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, total in items:
+            yield f"{self.name}{_label_text(self.labels, values)} {total}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for values, series in items:
+            for bound, count in zip(self.buckets, series):
+                labels = _label_text(self.labels + ("le",), values + (bound,))
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _label_text(self.labels + ("le",), values + ("+Inf",))
+            yield f"{self.name}_bucket{labels} {series[-2]}"
+            yield f"{self.name}_count{_label_text(self.labels, values)} {series[-2]}"
+            yield f"{self.name}_sum{_label_text(self.labels, values)} {series[-1]}"
+
+
+REQUEST_SECONDS = Histogram(
+    "krishimitra_request_seconds", "End-to-end latency per chain.", ["module"])
+REQUESTS = Counter(
+    "krishimitra_requests_total", "Requests per chain and outcome.", ["module", "outcome"])
+STAGE_SECONDS = Histogram(
+    "krishimitra_stage_seconds", "Latency of one stage inside a chain.", ["module", "stage"])
+STAGE_ERRORS = Counter(
+    "krishimitra_stage_errors_total", "Stages that raised.", ["module", "stage"])
+LLM_TOKENS = Counter(
+    "krishimitra_llm_tokens_total", "Groq token usage.", ["module", "kind"])
+
+
+class timed(ContextDecorator):
+    """Time a block (or decorated function) as `stage` of the current chain."""
+
+    def __init__(self, stage: str, module: str = None):
+        self.stage = stage
+        self.module = module
+
+    def _recreate_cm(self):
+        return timed(self.stage, self.module)   # fresh timer per decorated call
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        module = self.module or current_module.get()
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, module, self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(module, self.stage)
+        return False
+
+
+@contextmanager
+def track(module: str):
+    """Attribute everything inside to `module` and record the request latency and outcome."""
+    token = current_module.set(module)
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        observe_request(module, started, outcome)
+        current_module.reset(token)
+
+
+def observe_request(module: str, started: float, outcome: str):
+    REQUEST_SECONDS.observe(time.perf_counter() - started, module)
+    REQUESTS.inc(module, outcome)
+
+
+def count_tokens(usage):
+    if usage is None:
+        return
+    module = current_module.get()
+    LLM_TOKENS.inc(module, "prompt", amount=getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.inc(module, "completion", amount=getattr(usage, "completion_tokens", 0) or 0)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
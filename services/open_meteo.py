@@ -0,0 +1,297 @@
+import os, asyncio, threading, time
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from services import metrics
+from services.cache import TTLCache
+from services.log import get_logger
+
+load_dotenv()
+log = get_logger(__name__)
+
+FORECAST_URL = os.getenv("OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+CONNECT_TIMEOUT = float(os.getenv("OPEN_METEO_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("OPEN_METEO_READ_TIMEOUT", "10"))
+POOL_SIZE = int(os.getenv("OPEN_METEO_POOL_SIZE", "20"))
+# Grid cells per multi-location request (comma-separated latitude / longitude lists).
+BULK_SIZE = max(1, int(os.getenv("OPEN_METEO_BULK_SIZE", "50")))
+
+# Every variable any chain reads, so one request per coordinate serves all of them.
+CURRENT_VARS = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "soil_moisture_0_to_10cm",
+    "soil_temperature_0cm",
+]
+DAILY_VARS = [
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "precipitation_sum",
+    "relative_humidity_2m_max",
+]
+FORECAST_DAYS = 7
+
+# Open-Meteo's model grid is coarser than the distance between neighbouring
+# villages, so requests are snapped to a grid cell and cached per time bucket.
+# One merged call carries both "current" and "daily", so both refresh with the
+# current-conditions bucket.
+GRID_DEG = float(os.getenv("OPEN_METEO_GRID_DEG", "0.1"))
+BUCKET_SECONDS = int(os.getenv("OPEN_METEO_BUCKET_SECONDS", "3600"))
+STALE_SECONDS = float(os.getenv("OPEN_METEO_STALE_SECONDS", "1800"))
+HOT_HITS = int(os.getenv("OPEN_METEO_HOT_HITS", "3"))
+CACHE_CELLS = int(os.getenv("OPEN_METEO_CACHE_CELLS", "5000"))
+
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=1)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+_async_client = None
+
+_cells = TTLCache(maxsize=CACHE_CELLS, ttl=BUCKET_SECONDS + STALE_SECONDS)
+_refreshing = set()
+_refresh_lock = threading.Lock()
+_counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+
+def forecast_params(lat, lon) -> dict:
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "current": ",".join(CURRENT_VARS),
+        "daily": ",".join(DAILY_VARS),
+        "forecast_days": FORECAST_DAYS,
+    }
+
+
+def bulk_params(cells) -> dict:
+    return forecast_params(
+        ",".join(str(lat) for lat, _ in cells),
+        ",".join(str(lon) for _, lon in cells),
+    )
+
+
+def snap(lat, lon):
+    """Centre of the grid cell containing (lat, lon)."""
+    if GRID_DEG <= 0:
+        return float(lat), float(lon)
+    return (
+        round(round(float(lat) / GRID_DEG) * GRID_DEG, 4),
+        round(round(float(lon) / GRID_DEG) * GRID_DEG, 4),
+    )
+
+
+def bucket() -> int:
+    """Index of the current forecast time bucket (changes every BUCKET_SECONDS)."""
+    return int(time.time() // BUCKET_SECONDS)
+
+
+def _count(key: str):
+    with _refresh_lock:
+        _counters[key] += 1
+
+
+def _cached(cell):
+    """-> (data, needs_refresh). Stale data is only served for hot cells."""
+    entry = _cells.get(cell)
+    if entry is None:
+        return None, False
+    with _refresh_lock:
+        entry["hits"] += 1
+        hits = entry["hits"]
+    if entry["bucket"] == bucket():
+        _count("hits")
+        return entry["data"], False
+    if hits >= HOT_HITS:
+        _count("stale_hits")
+        return entry["data"], True
+    return None, False
+
+
+def _store(cell, data: dict):
+    _cells.set(cell, {"data": data, "bucket": bucket(), "hits": 0})
+
+
+def _refresh_in_background(cell):
+    from services.stages import executor
+    with _refresh_lock:
+        if cell in _refreshing:
+            return
+        _refreshing.add(cell)
+
+    def run():
+        try:
+            _store(cell, _request(*cell))
+            _count("refreshes")
+        except Exception as e:
+            log.warning("Background forecast refresh failed for %s: %s", cell, e)
+            _count("refresh_errors")
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(cell)
+
+    executor.submit(run)
+
+
+def fetch_forecast(lat, lon) -> dict:
+    """
+    Single pooled call returning both the "current" block (air + soil)
+    and the 7-day "daily" block for the grid cell containing (lat, lon).
+    Served from the cell cache when fresh; hot cells are served stale
+    while a background refresh runs.
+    """
+    cell = snap(lat, lon)
+    data, needs_refresh = _cached(cell)
+    if data is not None:
+        if needs_refresh:
+            _refresh_in_background(cell)
+        return data
+
+    _count("misses")
+    data = _request(*cell)
+    _store(cell, data)
+    return data
+
+
+def _lookup(cells):
+    """-> ({cell: data} served from the cache, cells still to fetch), each cell counted once."""
+    found, missing = {}, []
+    for cell in dict.fromkeys(cells):
+        data, needs_refresh = _cached(cell)
+        if data is None:
+            _count("misses")
+            missing.append(cell)
+            continue
+        if needs_refresh:
+            _refresh_in_background(cell)
+        found[cell] = data
+    return found, missing
+
+
+def _chunks(cells):
+    return [cells[i:i + BULK_SIZE] for i in range(0, len(cells), BULK_SIZE)]
+
+
+def _split(cells, data) -> list:
+    """One response per cell — Open-Meteo answers a single location with an object, several with a list."""
+    results = data if isinstance(data, list) else [data]
+    if len(results) != len(cells):
+        raise RuntimeError(f"Open-Meteo returned {len(results)} forecasts for {len(cells)} locations")
+    return results
+
+
+def _keep(found: dict, chunk, results):
+    """Store one bulk response; a failed request leaves its exception in each of its cells."""
+    if isinstance(results, Exception):
+        log.warning("Open-Meteo bulk request for %d cells failed: %s", len(chunk), results)
+        found.update((cell, results) for cell in chunk)
+        return
+    for cell, data in zip(chunk, results):
+        _store(cell, data)
+        found[cell] = data
+
+
+def fetch_forecasts(coords) -> list:
+    """
+    fetch_forecast() for many (lat, lon) pairs, in input order. Cached
+    cells are reused and the rest are fetched BULK_SIZE cells per request.
+    A failed request does not fail the others: its cells get the
+    exception instead of a forecast.
+    """
+    cells = [snap(lat, lon) for lat, lon in coords]
+    found, missing = _lookup(cells)
+    for chunk in _chunks(missing):
+        try:
+            results = _request_many(chunk)
+        except Exception as e:
+            results = e
+        _keep(found, chunk, results)
+    return [found[cell] for cell in cells]
+
+
+@metrics.timed("open_meteo")
+def _request_many(cells) -> list:
+    log.debug("Fetching Open-Meteo forecasts for %d cells", len(cells))
+    r = session.get(
+        FORECAST_URL,
+        params=bulk_params(cells),
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    )
+    if r.status_code != 200:
+        raise RuntimeError(f"HTTP Error {r.status_code}: {r.text[:200]}")
+    return _split(cells, r.json())
+
+
+@metrics.timed("open_meteo")
+def _request(lat, lon) -> dict:
+    log.debug("Fetching Open-Meteo forecast for (%s, %s)", lat, lon)
+    r = session.get(
+        FORECAST_URL,
+        params=forecast_params(lat, lon),
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    )
+    if r.status_code != 200:
+        raise RuntimeError(f"HTTP Error {r.status_code}: {r.text[:200]}")
+    return r.json()
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        import httpx
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=POOL_SIZE * 5, max_keepalive_connections=POOL_SIZE),
+        )
+    return _async_client
+
+
+async def fetch_forecast_async(lat, lon) -> dict:
+    """Async twin of fetch_forecast() for the ASGI app — shares the same cell cache."""
+    cell = snap(lat, lon)
+    data, needs_refresh = _cached(cell)
+    if data is not None:
+        if needs_refresh:
+            _refresh_in_background(cell)
+        return data
+
+    _count("misses")
+    log.debug("Fetching Open-Meteo forecast for %s", cell)
+    with metrics.timed("open_meteo"):
+        r = await get_async_client().get(FORECAST_URL, params=forecast_params(*cell))
+    if r.status_code != 200:
+        raise RuntimeError(f"HTTP Error {r.status_code}: {r.text[:200]}")
+    data = r.json()
+    _store(cell, data)
+    return data
+
+
+async def fetch_forecasts_async(coords) -> list:
+    """Async twin of fetch_forecasts() — the bulk requests run concurrently."""
+    cells = [snap(lat, lon) for lat, lon in coords]
+    found, missing = _lookup(cells)
+
+    async def request(chunk):
+        log.debug("Fetching Open-Meteo forecasts for %d cells", len(chunk))
+        with metrics.timed("open_meteo"):
+            r = await get_async_client().get(FORECAST_URL, params=bulk_params(chunk))
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP Error {r.status_code}: {r.text[:200]}")
+        return _split(chunk, r.json())
+
+    chunks = _chunks(missing)
+    for chunk, results in zip(chunks, await asyncio.gather(*(request(c) for c in chunks), return_exceptions=True)):
+        _keep(found, chunk, results)
+    return [found[cell] for cell in cells]
+
+
+def stats() -> dict:
+    with _refresh_lock:
+        counters = dict(_counters)
+    total = counters["hits"] + counters["stale_hits"] + counters["misses"]
+    counters["hit_rate"] = round((total - counters["misses"]) / total, 3) if total else 0.0
+    counters["cells"] = len(_cells)
+    counters["grid_deg"] = GRID_DEG
+    counters["bulk_size"] = BULK_SIZE
+    return counters
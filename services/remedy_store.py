@@ -0,0 +1,159 @@
+"""
+Remedy store for the leaf-disease chain, keyed by (disease_label, crop_hint).
+
+The classifier has a fixed id2label set, so every remedy can be generated
+once offline and shipped as a versioned JSON file:
+
+    python -m services.remedy_store build            # fill missing classes
+    python -m services.remedy_store build --force    # regenerate everything
+
+Anything not in the file is generated live and kept in a bounded LRU/TTL.
+"""
+
+import os, sys, json, time, asyncio, argparse, threading
+
+from services.cache import TTLCache
+from services.log import get_logger
+
+STORE_VERSION = 1
+REMEDY_STORE_PATH = os.getenv("REMEDY_STORE_PATH", os.path.join("data", f"remedies_v{STORE_VERSION}.json"))
+LIVE_CACHE_SIZE = int(os.getenv("REMEDY_CACHE_SIZE", "512"))
+LIVE_CACHE_TTL = float(os.getenv("REMEDY_CACHE_TTL", str(7 * 24 * 3600)))
+log = get_logger(__name__)
+
+_entries = None
+_load_lock = threading.Lock()
+live_cache = TTLCache(maxsize=LIVE_CACHE_SIZE, ttl=LIVE_CACHE_TTL)
+_counters = {"store_hits": 0, "live_hits": 0, "misses": 0}
+_counters_lock = threading.Lock()
+
+
+def _key(disease_label: str, crop_hint: str) -> str:
+    return f"{disease_label}||{crop_hint}"
+
+
+def _load() -> dict:
+    global _entries
+    if _entries is None:
+        with _load_lock:
+            if _entries is None:
+                entries = {}
+                if os.path.exists(REMEDY_STORE_PATH):
+                    try:
+                        with open(REMEDY_STORE_PATH, encoding="utf-8") as f:
+                            payload = json.load(f)
+                        if payload.get("version") == STORE_VERSION:
+                            entries = payload.get("entries", {})
+                        else:
+                            log.warning("Ignoring remedy store with version %s", payload.get('version'))
+                    except (OSError, ValueError) as e:
+                        log.warning("Remedy store unreadable: %s", e)
+                _entries = entries
+    return _entries
+
+
+def precomputed() -> int:
+    """Number of remedies shipped in the offline file."""
+    return len(_load())
+
+
+def _count(key: str):
+    with _counters_lock:
+        _counters[key] += 1
+
+
+def lookup(disease_label: str, crop_hint: str):
+    key = _key(disease_label, crop_hint)
+    remedy = _load().get(key)
+    if remedy is not None:
+        _count("store_hits")
+        return remedy
+    remedy = live_cache.get(key)
+    if remedy is not None:
+        _count("live_hits")
+        return remedy
+    _count("misses")
+    return None
+
+
+async def lookup_async(disease_label: str, crop_hint: str):
+    """lookup() for the event loop: the first call reads the store file on a worker thread."""
+    if _entries is None:
+        await asyncio.to_thread(_load)
+    return lookup(disease_label, crop_hint)
+
+
+def remember(disease_label: str, crop_hint: str, remedy: dict):
+    live_cache.set(_key(disease_label, crop_hint), remedy)
+
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    return {**counters, "precomputed": precomputed(), "live": live_cache.stats()}
+
+
+def save(entries: dict, model: str, path: str = REMEDY_STORE_PATH):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    payload = {
+        "version": STORE_VERSION,
+        "model": model,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "entries": dict(sorted(entries.items())),
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def build(force: bool = False) -> dict:
+    """Generate a remedy for every classifier label and write the store file."""
+    global _entries
+    from transformers import AutoConfig
+    from chains.disease_chain import VISION_MODEL, crop_hint_for, generate_remedy_groq
+
+    labels = AutoConfig.from_pretrained(VISION_MODEL).id2label.values()
+    entries = {} if force else dict(_load())
+    generated, failed = 0, []
+    started = time.monotonic()
+
+    for label in sorted(labels):
+        crop_hint = crop_hint_for(label)
+        key = _key(label, crop_hint)
+        if key in entries:
+            continue
+        try:
+            entries[key] = generate_remedy_groq(label, crop_hint)
+            generated += 1
+        except Exception as e:
+            log.warning("Remedy generation failed for %s: %s", label, e)
+            failed.append(label)
+
+    save(entries, VISION_MODEL)
+    _entries = entries
+    return {
+        "path": REMEDY_STORE_PATH,
+        "entries": len(entries),
+        "generated": generated,
+        "failed": failed,
+        "seconds": round(time.monotonic() - started, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KrishiMitra remedy store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="pre-generate remedies for every disease class")
+    p_build.add_argument("--force", action="store_true", help="regenerate existing entries too")
+    args = parser.parse_args(argv)
+
+    report = build(force=args.force)
+    print(json.dumps(report, indent=2))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Whole-response cache in front of the chains for /krishimitra.
+
+    RESPONSE_CACHE_BACKEND=memory | redis | off     (default: memory)
+    RESPONSE_CACHE_REDIS_URL=redis://localhost:6379/0
+    RESPONSE_CACHE_TTL_<QNA|CROP|SOIL|IRRIGATION>=<seconds>   0 disables a module
+
+Keys are the detected module plus its normalised input fields; modules
+that read the forecast also include the Open-Meteo time bucket, so an
+entry never outlives the weather it was computed from. The redis
+backend (any Redis-compatible server) needs `pip install redis` and is
+shared by every worker; when it is unreachable the in-process LRU is
+used instead.
+
+Clients skip the lookup with `Cache-Control: no-cache` (the fresh result
+is stored) or `no-store` (nothing is stored), or with `"cache": false`
+in the payload / `?cache=0`.
+"""
+
+import os, json, math, time, asyncio, hashlib, threading
+
+from services import open_meteo
+from services.answer_cache import normalize_query
+from services.cache import TTLCache
+from services.geocoding import normalize_name
+from services.log import get_logger
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+MODULE_TTL = {
+    "qna_chain": float(os.getenv("RESPONSE_CACHE_TTL_QNA", str(24 * 3600))),
+    "crop_chain": float(os.getenv("RESPONSE_CACHE_TTL_CROP", "3600")),
+    "soil_chain": float(os.getenv("RESPONSE_CACHE_TTL_SOIL", "3600")),
+    "irrigation_chain": float(os.getenv("RESPONSE_CACHE_TTL_IRRIGATION", "3600")),
+}
+log = get_logger(__name__)
+
+
+def _word(value) -> str:
+    return " ".join(str(value).casefold().split())
+
+
+# Fields that change a module's answer, and how each is normalised.
+FIELDS = {
+    "qna_chain": {"query": normalize_query},
+    "crop_chain": {"location": normalize_name, "season": _word, "mode": _word},
+    "soil_chain": {"location": normalize_name, "crop": _word},
+    "irrigation_chain": {
+        "city": normalize_name, "crop": _word, "soil_type": _word,
+        "days_after_sowing": _word, "growth_stage": _word,
+    },
+}
+WEATHER_MODULES = {"crop_chain", "soil_chain", "irrigation_chain"}
+
+
+class MemoryBackend:
+    name = "memory"
+    blocking = False
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.cache = TTLCache(maxsize=maxsize)
+
+    def get(self, key: str):
+        return self.cache.get(key)
+
+    def set(self, key: str, entry: dict, ttl: float):
+        self.cache.set(key, entry, ttl=ttl)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class RedisBackend:
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str = RESPONSE_CACHE_REDIS_URL):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client.ping()
+        self.url = url
+
+    def get(self, key: str):
+        raw = self.client.get(f"krishimitra:response:{key}")
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, entry: dict, ttl: float):
+        self.client.set(f"krishimitra:response:{key}", json.dumps(entry, ensure_ascii=False), ex=max(1, math.ceil(ttl)))
+
+    def stats(self) -> dict:
+        return {"url": self.url}
+
+
+def load_backend(name: str = RESPONSE_CACHE_BACKEND):
+    """The configured backend, falling back to memory when redis is unavailable."""
+    if name == "off":
+        return None
+    if name == "redis":
+        try:
+            return RedisBackend()
+        except Exception as e:
+            log.warning("Response cache backend 'redis' unavailable, using memory: %s", e)
+    return MemoryBackend()
+
+
+backend = load_backend()
+_counters = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0, "errors": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _counters_lock:
+        _counters[key] += 1
+
+
+def key_for(module: str, data: dict):
+    """Cache key for a payload, or None when the module is not cached."""
+    if backend is None or module not in FIELDS or MODULE_TTL.get(module, 0) <= 0:
+        return None
+    fields = {
+        name: normalize(data[name])
+        for name, normalize in FIELDS[module].items()
+        if data.get(name) not in (None, "")
+    }
+    if module in WEATHER_MODULES:
+        fields["_bucket"] = open_meteo.bucket()
+    raw = module + json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def mode(data: dict, headers) -> str:
+    """'use' the cache, 'refresh' it (skip lookup, store result) or 'skip' it entirely."""
+    directives = {d.strip().lower() for d in headers.get("Cache-Control", "").split(",")}
+    if "no-store" in directives:
+        choice = "skip"
+    elif "no-cache" in directives or str(data.get("cache", "")).lower() in ("0", "false", "no"):
+        choice = "refresh"
+    else:
+        return "use"
+    _count("bypassed")
+    return choice
+
+
+def _ttl(module: str) -> float:
+    ttl = MODULE_TTL[module]
+    if module in WEATHER_MODULES:
+        ttl = min(ttl, (open_meteo.bucket() + 1) * open_meteo.BUCKET_SECONDS - time.time())
+    return max(ttl, 1.0)
+
+
+def get(key: str):
+    try:
+        entry = backend.get(key)
+    except Exception as e:
+        log.warning("Response cache read failed: %s", e)
+        _count("errors")
+        return None
+    _count("hits" if entry else "misses")
+    return entry
+
+
+def put(key: str, module: str, body: dict, store: bool = True):
+    """Wrap `body` as a cache entry (ETag + expiry) and store it unless `store` is False."""
+    payload = json.dumps(body, sort_keys=True, ensure_ascii=False, default=str)
+    ttl = _ttl(module)
+    entry = {
+        "body": body,
+        "etag": hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20],
+        "expires": time.time() + ttl,
+    }
+    if not store:
+        return entry
+    try:
+        backend.set(key, entry, ttl)
+        _count("stored")
+    except Exception as e:
+        log.warning("Response cache write failed: %s", e)
+        _count("errors")
+    return entry
+
+
+async def get_async(key: str):
+    return await asyncio.to_thread(get, key) if backend.blocking else get(key)
+
+
+async def put_async(key: str, module: str, body: dict, store: bool = True):
+    if backend.blocking and store:
+        return await asyncio.to_thread(put, key, module, body, store)
+    return put(key, module, body, store)
+
+
+def cacheable(body: dict) -> bool:
+    """Errors and degraded answers (served while Groq is down) are never stored."""
+    result = body.get("result")
+    if isinstance(result, dict) and ("error" in result or result.get("degraded")):
+        return False
+    return "error" not in body and not body.get("degraded")
+
+
+def headers(entry: dict, state: str) -> dict:
+    # Every response sits behind x-api-key, so only the client's own cache may keep it.
+    max_age = max(0, int(entry["expires"] - time.time()))
+    return {
+        "ETag": f'"{entry["etag"]}"',
+        "Cache-Control": f"private, max-age={max_age}",
+        "Vary": "x-api-key",
+        "X-Cache": state,
+    }
+
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    total = counters["hits"] + counters["misses"]
+    counters["hit_rate"] = round(counters["hits"] / total, 3) if total else 0.0
+    counters["backend"] = backend.name if backend else "off"
+    counters["store"] = backend.stats() if backend else None
+    return counters
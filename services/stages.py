@@ -0,0 +1,92 @@
+import os, time, contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from services.log import get_logger
+
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "32"))
+
+executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="stage")
+log = get_logger(__name__)
+
+
+class StageTimeout(TimeoutError):
+    pass
+
+
+class Stage:
+    """
+    One step of a chain.
+    `fn` is called with the results of `deps` as keyword arguments.
+    `optional` stages never fail the chain — errors and timeouts give None.
+    """
+
+    def __init__(self, name: str, fn, deps=(), timeout: float = None, optional: bool = False):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.optional = optional
+
+
+def run_stages(stages, timeout: float = None) -> dict:
+    """
+    Run a dependency graph of stages on the shared pool.
+    Each stage starts as soon as its deps are done, so independent
+    I/O overlaps and total latency follows the critical path.
+    Returns {stage_name: result}. The first required failure is re-raised.
+    """
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' depends on unknown stage(s): {missing}")
+
+    results, running, pending = {}, {}, list(stages)
+    overall = time.monotonic() + timeout if timeout else None
+
+    def _finish(stage, future):
+        try:
+            results[stage.name] = future.result()
+        except Exception as e:
+            if not stage.optional:
+                raise
+            log.warning("Optional stage '%s' failed: %s", stage.name, e)
+            results[stage.name] = None
+
+    try:
+        while pending or running:
+            for s in [s for s in pending if all(d in results for d in s.deps)]:
+                pending.remove(s)
+                kwargs = {d: results[d] for d in s.deps}
+                deadline = time.monotonic() + s.timeout if s.timeout else None
+                # copy the caller's context so metrics / logs keep the chain label
+                future = executor.submit(contextvars.copy_context().run, s.fn, **kwargs)
+                running[future] = (s, deadline)
+
+            if not running:
+                raise ValueError(f"Stage graph has a cycle: {[s.name for s in pending]}")
+
+            deadlines = [d for _, d in running.values() if d] + ([overall] if overall else [])
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, _ = running.pop(future)
+                _finish(stage, future)
+
+            now = time.monotonic()
+            if overall and now >= overall and (pending or running):
+                raise StageTimeout(f"Stage graph exceeded {timeout}s")
+            for future, (stage, deadline) in list(running.items()):
+                if deadline and now >= deadline and not future.done():
+                    running.pop(future)
+                    future.cancel()
+                    if not stage.optional:
+                        raise StageTimeout(f"Stage '{stage.name}' exceeded {stage.timeout}s")
+                    log.warning("Optional stage '%s' timed out", stage.name)
+                    results[stage.name] = None
+    finally:
+        for future in running:
+            future.cancel()
+
+    return results
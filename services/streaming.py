@@ -0,0 +1,71 @@
+"""
+Server-Sent Events helpers for the opt-in streaming mode of /krishimitra.
+
+Chains expose *_stream() generators that yield ("token", text) while the
+LLM is generating and exactly one ("result", value) at the end, where
+value is the same payload the non-streaming function returns.
+"""
+
+import json, time, asyncio, contextlib, contextvars
+
+from services import metrics
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+_DONE = object()
+
+
+def wants_stream(data, args, headers) -> bool:
+    flag = str((data or {}).get("stream") or args.get("stream") or "").lower()
+    return flag in ("1", "true", "yes") or "text/event-stream" in headers.get("Accept", "")
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_stream(module: str, events):
+    """
+    Turn a chain's event generator into SSE frames for the HTTP response.
+    Everything the chain runs while streaming is attributed to `module`,
+    and the attribution is undone when the stream ends or is closed.
+    """
+    key = "answer" if module == "qna_chain" else "result"
+    token = metrics.current_module.set(module)
+    started, outcome = time.perf_counter(), "ok"
+    try:
+        for kind, value in events:
+            if kind == "token":
+                yield sse("token", {"text": value})
+            else:
+                yield sse("result", {"module": module, key: value})
+    except Exception as e:
+        log.error("Stream failed: %s", e)
+        outcome = "error"
+        yield sse("error", {"error": str(e)})
+    finally:
+        metrics.observe_request(module, started, outcome)
+        metrics.current_module.reset(token)
+
+
+async def iterate_in_thread(gen):
+    """
+    Drive a blocking generator from async code, one item per worker-thread hop.
+    Every hop runs in the same context, so context variables the generator
+    sets (and resets) carry over from one item to the next.
+    """
+    context = contextvars.copy_context()
+    try:
+        while True:
+            item = await asyncio.to_thread(context.run, next, gen, _DONE)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        # Cancelled mid-item: the worker thread still owns the generator, leave it to the GC.
+        with contextlib.suppress(RuntimeError, ValueError):
+            await asyncio.to_thread(context.run, gen.close)
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
@@ -0,0 +1,235 @@
+"""
+Pluggable CPU inference backends for the plant-disease classifier.
+
+    VISION_BACKEND=eager | torchscript | onnx     (default: eager)
+    VISION_QUANTIZE=1                              use the dynamic int8 artifact
+    VISION_THREADS=<n>                             intra-op threads per worker
+
+The onnx backend needs `pip install onnxruntime`; when an artifact or
+runtime is missing the eager model is used instead.
+
+One-time export and an accuracy-parity check against the eager model:
+
+    python -m services.vision_backend export --backend onnx --quantize
+    python -m services.vision_backend parity samples/ --backend onnx --quantize
+"""
+
+import os, sys, glob, argparse
+
+from services.log import get_logger
+
+VISION_BACKEND = os.getenv("VISION_BACKEND", "eager").lower()
+VISION_QUANTIZE = os.getenv("VISION_QUANTIZE", "0") == "1"
+ARTIFACT_DIR = os.getenv("VISION_ARTIFACT_DIR", os.path.join(".cache", "vision"))
+VISION_THREADS = int(os.getenv(
+    "VISION_THREADS",
+    str(max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("WEB_CONCURRENCY", "1")))))
+))
+
+INPUT_SHAPE = (1, 3, 224, 224)
+BACKENDS = ["eager", "torchscript", "onnx"]
+log = get_logger(__name__)
+
+
+def configure_threads(threads: int = VISION_THREADS):
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed once parallel work has started
+
+
+def artifact_path(backend: str, quantize: bool = VISION_QUANTIZE) -> str:
+    ext = {"torchscript": "pt", "onnx": "onnx"}[backend]
+    name = f"model.int8.{ext}" if quantize else f"model.{ext}"
+    return os.path.join(ARTIFACT_DIR, name)
+
+
+class EagerBackend:
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, pixel_values):
+        import torch
+        with torch.no_grad():
+            return self.model(pixel_values=pixel_values).logits
+
+
+class TorchScriptBackend:
+    name = "torchscript"
+
+    def __init__(self, path: str):
+        import torch
+        self.module = torch.jit.load(path, map_location="cpu")
+        self.module.eval()
+
+    def __call__(self, pixel_values):
+        import torch
+        with torch.no_grad():
+            return self.module(pixel_values)
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path: str, threads: int = VISION_THREADS):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, pixel_values):
+        import torch
+        logits = self.session.run(None, {self.input_name: pixel_values.numpy()})[0]
+        return torch.from_numpy(logits)
+
+
+def _logits_only(model):
+    """Wrap the HF model so tracing / ONNX export sees a plain tensor -> tensor graph."""
+    import torch
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model(pixel_values=pixel_values).logits
+
+    return LogitsOnly().eval()
+
+
+def export(model, backend: str, quantize: bool = False) -> str:
+    """Convert the eager model once and write the artifact under ARTIFACT_DIR."""
+    import torch
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    path = artifact_path(backend, quantize)
+    wrapper = _logits_only(model)
+    example = torch.zeros(INPUT_SHAPE)
+
+    if backend == "torchscript":
+        if quantize:
+            wrapper = torch.ao.quantization.quantize_dynamic(wrapper, {torch.nn.Linear}, dtype=torch.qint8)
+        with torch.no_grad():
+            traced = torch.jit.trace(wrapper, example)
+        torch.jit.save(torch.jit.freeze(traced), path)
+
+    elif backend == "onnx":
+        fp32_path = artifact_path("onnx", quantize=False)
+        torch.onnx.export(
+            wrapper, example, fp32_path,
+            input_names=["pixel_values"], output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17,
+        )
+        if quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+
+    else:
+        raise ValueError(f"Nothing to export for backend '{backend}'")
+
+    log.info("Exported %s%s model to %s", backend, " (int8)" if quantize else "", path)
+    return path
+
+
+def load_backend(model, backend: str = VISION_BACKEND, quantize: bool = VISION_QUANTIZE):
+    """
+    Return a callable pixel_values -> logits for the configured backend.
+    Falls back to eager when the exported artifact is missing or unusable.
+    """
+    configure_threads()
+    if backend == "eager":
+        return EagerBackend(model)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown VISION_BACKEND '{backend}' — choose one of {BACKENDS}")
+
+    path = artifact_path(backend, quantize)
+    try:
+        if not os.path.exists(path):
+            export(model, backend, quantize)
+        if backend == "torchscript":
+            return TorchScriptBackend(path)
+        return OnnxBackend(path)
+    except Exception as e:
+        log.warning("Vision backend '%s' unavailable (%s), using eager: %s", backend, path, e)
+        return EagerBackend(model)
+
+
+def parity_check(processor, model, backend, image_paths) -> dict:
+    """Compare `backend` against the eager model on sample images."""
+    from PIL import Image
+
+    eager = EagerBackend(model)
+    mismatches, max_diff = [], 0.0
+    for path in image_paths:
+        image = Image.open(path).convert("RGB")
+        pixel_values = processor(images=image, return_tensors="pt")["pixel_values"]
+        ref = eager(pixel_values).softmax(dim=-1)
+        out = backend(pixel_values).softmax(dim=-1)
+        max_diff = max(max_diff, float((ref - out).abs().max()))
+        ref_label = model.config.id2label[int(ref.argmax())]
+        out_label = model.config.id2label[int(out.argmax())]
+        if ref_label != out_label:
+            mismatches.append({"image": path, "eager": ref_label, backend.name: out_label})
+
+    total = len(image_paths)
+    return {
+        "backend": backend.name,
+        "images": total,
+        "label_agreement": round((total - len(mismatches)) / total, 4) if total else None,
+        "max_prob_diff": round(max_diff, 5),
+        "mismatches": mismatches,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KrishiMitra vision backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="convert the eager model for a backend")
+    p_export.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    p_export.add_argument("--quantize", action="store_true")
+
+    p_parity = sub.add_parser("parity", help="compare a backend against the eager model")
+    p_parity.add_argument("samples", help="directory of leaf images")
+    p_parity.add_argument("--backend", choices=BACKENDS, default="onnx")
+    p_parity.add_argument("--quantize", action="store_true")
+    p_parity.add_argument("--min-agreement", type=float, default=1.0)
+
+    args = parser.parse_args(argv)
+
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+    from chains.disease_chain import VISION_MODEL
+    processor = AutoImageProcessor.from_pretrained(VISION_MODEL)
+    model = AutoModelForImageClassification.from_pretrained(VISION_MODEL).eval()
+
+    if args.command == "export":
+        export(model, args.backend, args.quantize)
+        return 0
+
+    images = sorted(
+        p for p in glob.glob(os.path.join(args.samples, "*"))
+        if p.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
+    )
+    if not images:
+        print(f"No images found in {args.samples}")
+        return 1
+    backend = load_backend(model, args.backend, args.quantize)
+    if backend.name != args.backend:
+        # load_backend fell back to eager; comparing eager with itself proves nothing
+        print(f"Backend '{args.backend}' could not be loaded (see the warning above); parity not checked")
+        return 1
+    report = parity_check(processor, model, backend, images)
+    print(report)
+    return 0 if (report["label_agreement"] or 0) >= args.min_agreement else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+import time
+
+import pytest
+
+from services import advisory_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = tmp_path / "advisories.json"
+    monkeypatch.setattr(advisory_store, "ADVISORY_STORE_PATH", str(path))
+    monkeypatch.setattr(advisory_store, "_entries", {})
+    monkeypatch.setattr(advisory_store, "_mtime", None)
+    monkeypatch.setattr(advisory_store, "_checked", None)
+    entries = {advisory_store._key("Jaipur", "Rabi"): {
+        "location": "Jaipur", "season": "Rabi", "generated_at": time.time(), "result": {"crops": ["Wheat"]},
+    }}
+    advisory_store.save(entries, str(path))
+    return path
+
+
+def test_season_aliases_hit_the_precomputed_entry(store):
+    for season in ("Rabi", "rabi ", "winter", "रबी"):
+        assert advisory_store.lookup("jaipur", season) == {"crops": ["Wheat"]}
+    assert advisory_store.lookup("Jaipur", "Kharif") is None
@@ -0,0 +1,36 @@
+from services.answer_cache import AnswerCache, normalize_query
+
+
+def test_normalize_folds_hinglish_spellings():
+    assert normalize_query("Gehu mein kaunsa KHAAD daalein??") == "gehu me konsa khad dale"
+    assert normalize_query("gehun me konsa fertilizer dalen") == normalize_query("Gehu mein kaunsa khaad daalein")
+
+
+def test_normalize_keeps_words_that_differ_in_meaning():
+    assert normalize_query("main kya karu") != normalize_query("me kya karu")
+    assert normalize_query("gehu ka beej") != normalize_query("gehu ki beej") != normalize_query("gehu ke beej")
+
+
+def test_exact_and_near_duplicate_hits():
+    cache = AnswerCache(db_path="", threshold=0.85)
+    cache.put("Gehu ki fasal me pehli sinchai kab kare", "21 din par")
+    cache.put("Dhan ki buwai kab kare", "June-July")
+    assert cache.get("gehu ki fasal mein pehli sinchaai kab karein") == "21 din par"
+    assert cache.get("gehu fasal me pehli sinchai kab kare") == "21 din par"
+    assert cache.get("dhan ki ropai kab kare") is None
+    assert (cache.exact_hits, cache.similar_hits, cache.misses) == (1, 1, 1)
+
+
+def test_different_numbers_or_topics_miss():
+    cache = AnswerCache(db_path="")
+    cache.put("5 acre gehu me kitna urea", "2.5 bori")
+    assert cache.get("6 acre gehu me kitna urea") is None
+    assert cache.get("aam ke ped me phal nahi") is None
+
+
+def test_stored_vectors_follow_the_index():
+    cache = AnswerCache(maxsize=1, db_path="")
+    cache.put("gehu me konsa khad dale", "DAP")
+    cache.put("dhan ki buwai kab kare", "June")
+    assert cache.get("gehu me konsa khad dalna") is None    # evicted: dropped from the index on lookup
+    assert set(cache._vectors) == set(cache._grams) == {"dhan ki buwai kab karna"}
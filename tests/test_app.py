@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.update(KRISHIMITRA_API_KEY="test-key", KRISHIMITRA_PROFILE="text", QNA_CACHE_DB="")
+
+import app
+from chains import qna_chain
+from services import response_cache
+
+HEADERS = {"x-api-key": "test-key"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(response_cache, "backend", response_cache.MemoryBackend())
+    return app.app.test_client()
+
+
+def test_groq_fallback_is_not_cached(client, monkeypatch):
+    monkeypatch.setattr(app, "krishimitra_answer", lambda query: qna_chain.FALLBACK_ANSWER)
+    for _ in range(2):
+        r = client.post("/krishimitra", json={"query": "gehu me kitna urea"}, headers=HEADERS)
+        assert r.status_code == 200 and r.get_json()["degraded"] is True
+        assert "X-Cache" not in r.headers and "Cache-Control" not in r.headers
+
+    monkeypatch.setattr(app, "krishimitra_answer", lambda query: "110 kg per acre")
+    r = client.post("/krishimitra", json={"query": "gehu me kitna urea"}, headers=HEADERS)
+    assert r.get_json() == {"module": "qna_chain", "answer": "110 kg per acre"}
+    assert r.headers["X-Cache"] == "MISS"
+    assert client.post("/krishimitra", json={"query": "gehu me kitna urea"}, headers=HEADERS).headers["X-Cache"] == "HIT"
@@ -0,0 +1,29 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pytest
+
+from services.batcher import MicroBatcher
+
+
+def test_results_come_back_in_order():
+    batcher = MicroBatcher(lambda items: [i * 2 for i in items], max_wait_ms=20)
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(batcher.submit, range(8))) == [i * 2 for i in range(8)]
+
+
+def test_short_result_list_fails_the_leftover_items():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch=4, max_wait_ms=2000)
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(batcher.submit, i, 5) for i in range(4)]
+        outcomes = [f.exception() or f.result() for f in futures]
+    assert sum(isinstance(o, RuntimeError) for o in outcomes) == 3
+    assert sum(isinstance(o, int) for o in outcomes) == 1
+
+
+def test_submit_times_out_by_default():
+    release = threading.Event()
+    batcher = MicroBatcher(lambda items: release.wait() and items, max_wait_ms=0, timeout=0.05)
+    with pytest.raises(FutureTimeout):
+        batcher.submit("slow")
+    release.set()
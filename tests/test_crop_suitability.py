@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from services import crop_suitability
+
+WARM_WET = ({"temperature": 28, "humidity": 80}, {"soil_moisture": 35, "soil_temperature": 27})
+COOL_DRY = ({"temperature": 18, "humidity": 50}, {"soil_moisture": 18, "soil_temperature": 16})
+
+
+@pytest.mark.parametrize("season, expected", [
+    ("Kharif", "kharif"), (" RABI ", "rabi"), ("winter", "rabi"), ("summer", "zaid"),
+    ("Zayad", "zaid"), ("रबी", "rabi"), ("rabi season", "rabi"),
+])
+def test_season_aliases(season, expected):
+    assert crop_suitability.canonical_season(season) == expected
+
+
+@pytest.mark.parametrize("season", ["", None, "spring", "rabbit"])
+def test_unknown_season_is_rejected(season):
+    with pytest.raises(crop_suitability.UnknownSeason):
+        crop_suitability.season_index(season)
+
+
+def test_memberships_are_trapezoids():
+    rice = crop_suitability.NAMES.index("Rice")
+    a, b, c, d = crop_suitability.RANGES[rice, 0]
+    temps = [[t, 80, 35, 27] for t in (a - 5, (a + b) / 2, b, c, d + 5)]
+    fit = crop_suitability.memberships(temps)[:, rice, 0]
+    assert fit.tolist() == pytest.approx([crop_suitability.FLOOR, 0.5, 1.0, 1.0, crop_suitability.FLOOR])
+
+
+def test_crops_out_of_season_score_zero():
+    s = crop_suitability.scores("rabi", crop_suitability.factor_values(*WARM_WET))
+    sown = crop_suitability.SEASON_MASK[:, crop_suitability.SEASONS.index("rabi")]
+    assert np.all(s[~sown] == 0) and np.all(s[sown] > 0)
+
+
+def test_shortlist_ranks_and_mixes_types():
+    picked = crop_suitability.shortlist("Kharif", *WARM_WET)
+    assert len(picked) == 3
+    assert [c["score"] for c in picked] == sorted((c["score"] for c in picked), reverse=True)
+    assert {"Major", "Minor"} <= {c["type"] for c in picked}
+    assert all("kharif" in crop_suitability.CROPS[c["name"]][1] for c in picked)
+
+
+def test_shortlist_follows_the_weather():
+    assert crop_suitability.shortlist("Kharif", *WARM_WET) != crop_suitability.shortlist("Rabi", *COOL_DRY)
+    assert "Rice" in [c["name"] for c in crop_suitability.shortlist("Kharif", *WARM_WET)]
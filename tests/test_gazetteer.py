@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from services import gazetteer
+from services.gazetteer import MIN_CONFIDENCE, Gazetteer
+
+TSV = os.path.join(os.path.dirname(__file__), "..", "data", "gazetteer_in.tsv")
+
+
+@pytest.fixture(scope="module")
+def index():
+    return Gazetteer.load([TSV])
+
+
+@pytest.mark.parametrize("query, name, state", [
+    ("Jaipur", "Jaipur", "Rajasthan"),
+    ("jaypur", "Jaipur", "Rajasthan"),
+    ("ludhiyana", "Ludhiana", "Punjab"),
+    ("नासिक", "Nashik", "Maharashtra"),
+    ("new delhi", "New Delhi", "Delhi"),
+    ("Aurangabad, Bihar", "Aurangabad", "Bihar"),
+    ("Aurangabad Maharashtra", "Aurangabad", "Maharashtra"),
+])
+def test_exact_names_and_aliases_are_confident(index, query, name, state):
+    found = index.match(query)
+    assert (found["name"], found["state"]) == (name, state)
+    assert found["confidence"] >= MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("query", ["Deesa", "Shivpur", "Rampura", "Sodha", "Palia", "vishakapatnm"])
+def test_near_misses_fall_through_to_network_geocoding(index, query):
+    found = index.match(query)
+    assert found is None or found["confidence"] < MIN_CONFIDENCE
+
+
+def test_every_row_resolves_to_itself(index):
+    for i, name in enumerate(index.names):
+        found = index.match(f"{name}, {index.state_names[index.states[i]]}")
+        assert (found["lat"], found["lon"]) == (index.lats[i], index.lons[i]), name
+
+
+def test_similarity_ignores_spelling_variants():
+    assert gazetteer.similarity("Ludhiana", "ludhiyana, Punjab") > 0.9
+    assert gazetteer.similarity("Jaipur", "Jaipur") == 1.0
+    assert gazetteer.similarity("", "Jaipur") == 0.0
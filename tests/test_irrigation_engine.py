@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from services import irrigation_engine as engine
+
+
+def test_extraterrestrial_radiation_matches_fao56_example_8():
+    # 20°S on 3 September: Ra = 32.2 MJ m-2 day-1
+    assert engine.extraterrestrial_radiation(-20, 246) == pytest.approx(32.2, abs=0.1)
+
+
+def test_hargreaves_et0():
+    ra = engine.extraterrestrial_radiation(26.9, 120)
+    expected = 0.0023 * (30 + 17.8) * np.sqrt(20) * 0.408 * ra
+    assert engine.hargreaves_et0(40, 20, 26.9, 120) == pytest.approx(expected)
+    assert engine.hargreaves_et0(20, 25, 26.9, 120) == 0    # Tmax < Tmin never goes negative
+    assert engine.hargreaves_et0([35, np.nan], [20, 20], 26.9, [120, 121]).tolist()[1] == 0
+
+
+def test_crop_coefficient_curve():
+    profile = engine.CROPS["wheat"]       # Kc 0.30 / 1.15 / 0.40, stages 20, 25, 60, 30
+    kc = engine.crop_coefficients(profile, [0, 20, 32.5, 45, 105, 135, 200])
+    assert kc.tolist() == pytest.approx([0.30, 0.30, 0.725, 1.15, 1.15, 0.40, 0.40])
+
+
+def test_start_day_defaults_to_mid_season():
+    profile = engine.CROPS["wheat"]
+    assert engine.start_day(profile) == 20 + 25 + 30
+    assert engine.start_day(profile, growth_stage="initial") == 10
+    assert engine.start_day(profile, days_after_sowing=-3) == 0
+
+
+def test_effective_rain_drops_light_showers():
+    assert engine.effective_rain([0, 2, 10, np.nan]).tolist() == [0, 0, 8, 0]
+
+
+def test_water_balance_refills_once_raw_is_passed():
+    etc = np.full(14, 5.0)
+    depletion, irrigation = engine.water_balance(etc, np.zeros(14), taw=100, raw=50, depletion0=0)
+    assert np.flatnonzero(irrigation).tolist() == [10]          # depletion 55 mm on day 11
+    assert irrigation[10] == pytest.approx(55 / engine.IRRIGATION_EFFICIENCY)
+    assert depletion[10] == 0 and depletion[-1] == 15
+
+
+def test_water_balance_waits_for_tomorrows_rain():
+    etc, peff = np.full(3, 5.0), np.array([0, 40, 0])
+    _, irrigation = engine.water_balance(etc, peff, taw=100, raw=50, depletion0=52)
+    assert irrigation.sum() == 0
+
+
+def test_water_balance_caps_one_application_and_broadcasts_plots():
+    etc = np.full((2, 2), 5.0)
+    depletion, irrigation = engine.water_balance(etc, np.zeros((2, 2)), taw=np.array([200, 100]), raw=10,
+                                                 depletion0=np.array([150, 0]))
+    assert irrigation[0, 0] == pytest.approx(engine.MAX_APPLICATION_MM / engine.IRRIGATION_EFFICIENCY)
+    assert depletion[0, 0] == 155 - engine.MAX_APPLICATION_MM
+    assert irrigation[1].tolist() == [0, 0]
+
+
+def test_plan_irrigation_on_a_dry_week():
+    forecast = {
+        "current": {"soil_moisture_0_to_10cm": 0.05},
+        "daily": {
+            "time": [f"2026-04-{d:02d}" for d in range(1, 8)],
+            "temperature_2m_max": [40] * 7,
+            "temperature_2m_min": [24] * 7,
+            "precipitation_sum": [0] * 7,
+        },
+    }
+    plan = engine.plan_irrigation(forecast, 26.9, "gehu", "sandy soil")
+    assert (plan["crop"], plan["soil"], plan["trend"]) == ("wheat", "sandy", "dry")
+    assert len(plan["schedule"]) == 7 and plan["totals"]["irrigation_mm"] > 0
+    assert "Paani dene ka schedule" in engine.describe_schedule(plan)
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from services import knowledge_base
+from services.knowledge_base import KnowledgeBase, tokens
+
+ENTRIES = [
+    {"id": "wheat-sowing", "questions": ["gehu ki buwai kab kare"], "keywords": ["wheat", "sowing"],
+     "answer": "Gehu ki buwai 1 se 25 November tak karein."},
+    {"id": "wheat-urea", "questions": ["gehu me urea kitna dale"], "keywords": ["urea"],
+     "answer": "Gehu me 110 kg urea per acre teen baar me dein."},
+    {"id": "rice-nursery", "questions": ["dhan ki nursery kab dale"], "keywords": ["paddy", "nursery"],
+     "answer": "Dhan ki nursery May ke aakhri hafte me dalein."},
+]
+
+
+def test_tokens_fold_scripts_spellings_and_crop_names():
+    assert tokens("गेहूं में यूरिया कितना डालें") == ["wheat", "urea", "kitna", "dale"]
+    assert tokens("Gehun mein yuriya kitni daalein") == ["wheat", "urea", "kitna", "dale"]
+    assert tokens("makke ki bowai kab karein?") == ["maize", "buwai", "kab"]
+
+
+def test_lookup_kinds():
+    kb = KnowledgeBase(ENTRIES)
+    assert kb.lookup("gehu ki buwai kab karein") == ("direct", kb.search("gehu ki buwai kab karein")[:1])
+    kind, found = kb.lookup("5 acre gehu me urea kitna")
+    assert kind == "context" and found[0]["id"] == "wheat-urea" and found[0]["confidence"] < 1
+    assert kb.lookup("aam ke ped me phal nahi") == ("miss", [])
+    assert kb.stats()["direct"] == 1 and kb.stats()["context"] == 1 and kb.stats()["misses"] == 1
+
+
+def test_equally_confident_entries_go_to_the_llm_together():
+    twin = dict(ENTRIES[0], id="wheat-sowing-2")
+    kind, found = KnowledgeBase([ENTRIES[0], twin]).lookup("gehu ki buwai kab kare")
+    assert kind == "context" and {h["id"] for h in found} == {"wheat-sowing", "wheat-sowing-2"}
+
+
+def test_bm25_prefers_the_shorter_entry():
+    long = dict(ENTRIES[2], id="rice-long", answer=ENTRIES[2]["answer"] + " Beej ko upchar karke boyein." * 10)
+    hits = KnowledgeBase([long, ENTRIES[2]]).search("dhan nursery")
+    assert [h["id"] for h in hits] == ["rice-nursery", "rice-long"]
+
+
+def test_empty_knowledge_base_misses():
+    assert KnowledgeBase().lookup("gehu ki buwai") == ("miss", [])
+
+
+@pytest.mark.parametrize("entry", json.loads(Path(knowledge_base.KNOWLEDGE_BASE_FILES[0]).read_text(encoding="utf-8")),
+                         ids=lambda e: e["id"])
+def test_bundled_questions_find_their_entry(entry):
+    for question in entry["questions"]:
+        assert knowledge_base.index.search(question)[0]["id"] == entry["id"]
@@ -0,0 +1,121 @@
+import asyncio, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import groq, httpx
+import pytest
+
+os.environ.setdefault("GROQ_API_KEY", "test")
+from services import llm_gateway
+from services.llm_gateway import RateLimited, TokenBucket
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions: replays `errors`, then answers."""
+
+    def __init__(self, errors=(), delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if error:
+            raise error
+        return SimpleNamespace(usage=None, text="ok")
+
+    def create(self, **kwargs):
+        time.sleep(self.delay)
+        return self._next()
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._next()
+
+
+def connection_error():
+    return groq.APIConnectionError(request=httpx.Request("POST", "http://groq.test"))
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    def install(completions, is_async=False):
+        name = "async_client" if is_async else "client"
+        monkeypatch.setattr(llm_gateway, name, SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        return completions
+
+    monkeypatch.setattr(llm_gateway, "bucket", TokenBucket(1000.0, 1000.0))
+    monkeypatch.setattr(llm_gateway, "_backoff", lambda attempt, error: 0.0)
+    return install
+
+
+def test_bucket_admits_the_burst_then_paces():
+    bucket = TokenBucket(rate_per_sec=20.0, capacity=2)
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    assert 0.08 < time.monotonic() - started < 0.3
+    assert bucket.throttled == 2
+
+
+def test_bucket_refuses_waits_past_the_timeout():
+    bucket = TokenBucket(rate_per_sec=1.0, capacity=1)
+    bucket.acquire()
+    with pytest.raises(RateLimited):
+        bucket.acquire(timeout=0.1)
+    assert bucket.tokens == pytest.approx(0.0, abs=0.01)   # a refused caller takes no token
+
+
+def test_retries_transient_errors(fake):
+    completions = fake(FakeCompletions(errors=[connection_error(), connection_error()]))
+    assert llm_gateway.chat("test-retry", model="m", messages=[]).text == "ok"
+    assert completions.calls == 3
+    assert llm_gateway.stats()["calls"]["test-retry"]["retries"] == 2
+
+
+def test_gives_up_after_max_retries(fake, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "GROQ_MAX_RETRIES", 1)
+    completions = fake(FakeCompletions(errors=[connection_error()] * 3))
+    with pytest.raises(groq.APIConnectionError):
+        llm_gateway.chat("test-give-up", model="m", messages=[])
+    assert completions.calls == 2
+
+
+def test_does_not_retry_client_errors(fake):
+    completions = fake(FakeCompletions(errors=[ValueError("bad request")]))
+    with pytest.raises(ValueError):
+        llm_gateway.chat("test-no-retry", model="m", messages=[])
+    assert completions.calls == 1
+
+
+def test_identical_calls_share_one_completion(fake):
+    completions = fake(FakeCompletions(delay=0.1))
+    with ThreadPoolExecutor(6) as pool:
+        responses = list(pool.map(lambda _: llm_gateway.chat("test-flight", model="m", messages=[]), range(6)))
+    assert completions.calls == 1
+    assert all(r is responses[0] for r in responses)
+    assert llm_gateway.stats()["calls"]["test-flight"]["coalesced"] == 5
+
+
+def test_identical_async_calls_share_one_completion(fake):
+    completions = fake(FakeAsyncCompletions(delay=0.05), is_async=True)
+
+    async def main():
+        return await asyncio.gather(*[llm_gateway.chat_async("test-flight-async", model="m", messages=[])
+                                      for _ in range(5)])
+
+    responses = asyncio.run(main())
+    assert completions.calls == 1
+    assert all(r is responses[0] for r in responses)
+
+
+def test_followers_see_the_leaders_error(fake):
+    fake(FakeCompletions(errors=[ValueError("bad request")], delay=0.1))
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(llm_gateway.chat, "test-flight-error", model="m", messages=[]) for _ in range(3)]
+        assert all(isinstance(f.exception(), ValueError) for f in futures)
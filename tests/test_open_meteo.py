@@ -0,0 +1,78 @@
+import threading, time
+
+import pytest
+
+from services import open_meteo
+from services.cache import TTLCache
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Fake _request that counts calls; `release` gates it, `hour` drives bucket()."""
+    state = {"calls": 0, "hour": 0, "release": threading.Event()}
+    state["release"].set()
+
+    def request(lat, lon):
+        state["calls"] += 1
+        state["release"].wait(5)
+        return {"cell": (lat, lon), "hour": state["hour"]}
+
+    monkeypatch.setattr(open_meteo, "_request", request)
+    monkeypatch.setattr(open_meteo, "bucket", lambda: state["hour"])
+    monkeypatch.setattr(open_meteo, "_cells", TTLCache(maxsize=100, ttl=3600))
+    monkeypatch.setattr(open_meteo, "_refreshing", set())
+    monkeypatch.setattr(open_meteo, "HOT_HITS", 2)
+    return state
+
+
+def wait_for_refresh():
+    deadline = time.monotonic() + 5
+    while open_meteo._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_nearby_points_share_a_cell(api):
+    assert open_meteo.fetch_forecast(28.61, 77.21) is open_meteo.fetch_forecast(28.63, 77.19)
+    assert api["calls"] == 1
+
+
+def test_cold_cell_refetches_when_the_bucket_changes(api):
+    open_meteo.fetch_forecast(28.6, 77.2)
+    api["hour"] = 1
+    assert open_meteo.fetch_forecast(28.6, 77.2)["hour"] == 1
+    assert api["calls"] == 2
+
+
+def test_hot_cell_is_served_stale_while_it_refreshes(api):
+    for _ in range(2):
+        open_meteo.fetch_forecast(28.6, 77.2)
+    api["hour"] = 1
+    api["release"].clear()
+    assert open_meteo.fetch_forecast(28.6, 77.2)["hour"] == 0     # stale, refresh started
+    api["release"].set()
+    wait_for_refresh()
+    assert open_meteo.fetch_forecast(28.6, 77.2)["hour"] == 1
+    assert api["calls"] == 2
+
+
+def test_one_refresh_per_cell_at_a_time(api):
+    for _ in range(2):
+        open_meteo.fetch_forecast(28.6, 77.2)
+    api["hour"] = 1
+    api["release"].clear()
+    for _ in range(5):
+        assert open_meteo.fetch_forecast(28.6, 77.2)["hour"] == 0
+    api["release"].set()
+    wait_for_refresh()
+    assert api["calls"] == 2
+
+
+def test_failed_refresh_keeps_serving_stale_and_can_retry(api, monkeypatch):
+    for _ in range(2):
+        open_meteo.fetch_forecast(28.6, 77.2)
+    api["hour"] = 1
+    monkeypatch.setattr(open_meteo, "_request", lambda lat, lon: 1 / 0)
+    assert open_meteo.fetch_forecast(28.6, 77.2)["hour"] == 0
+    wait_for_refresh()
+    assert open_meteo._refreshing == set()
+    assert open_meteo.fetch_forecast(28.6, 77.2)["hour"] == 0
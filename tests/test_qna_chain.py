@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ["QNA_CACHE_DB"] = ""
+
+from chains import qna_chain
+from services.answer_cache import AnswerCache
+from services.streaming import sse_stream
+
+QUERY = "mere aam ke ped me phal nahi aa rahe"   # not in the knowledge base
+
+
+def groq_stream(tokens, fail=False):
+    def stream(tag, **kwargs):
+        yield from tokens
+        if fail:
+            raise ConnectionError("connection reset")
+    return stream
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(qna_chain, "answer_cache", AnswerCache(db_path=""))
+
+
+def test_completed_stream_is_cached(monkeypatch):
+    monkeypatch.setattr(qna_chain.llm_gateway, "stream", groq_stream(["Khad ", "dalein."]))
+    events = list(qna_chain.krishimitra_answer_stream(QUERY))
+    assert events[-1] == ("result", "Khad dalein.")
+    assert qna_chain.answer_cache.get(QUERY) == "Khad dalein."
+
+
+def test_stream_cut_off_mid_answer_is_an_error_and_not_cached(monkeypatch):
+    monkeypatch.setattr(qna_chain.llm_gateway, "stream", groq_stream(["Khad "], fail=True))
+    frames = list(sse_stream("qna_chain", qna_chain.krishimitra_answer_stream(QUERY)))
+    assert frames[0].startswith("event: token") and frames[-1].startswith("event: error")
+    assert not any(frame.startswith("event: result") for frame in frames)
+    assert qna_chain.answer_cache.get(QUERY) is None
+
+
+def test_stream_that_never_starts_sends_the_fallback(monkeypatch):
+    monkeypatch.setattr(qna_chain.llm_gateway, "stream", groq_stream([], fail=True))
+    events = list(qna_chain.krishimitra_answer_stream(QUERY))
+    assert events == [("token", qna_chain.FALLBACK_ANSWER), ("result", qna_chain.FALLBACK_ANSWER)]
+    assert qna_chain.answer_cache.get(QUERY) is None
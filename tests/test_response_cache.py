@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from services import response_cache
+
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(response_cache, "backend", response_cache.MemoryBackend())
+
+
+def test_key_ignores_case_spacing_and_unrelated_fields():
+    a = response_cache.key_for("crop_chain", {"location": "Jaipur", "season": "Rabi"})
+    b = response_cache.key_for("crop_chain", {"location": "  jaipur ", "season": "RABI", "stream": False})
+    assert a is not None and a == b
+
+
+def test_key_changes_with_the_answer_fields():
+    base = {"city": "Pune", "crop": "wheat", "soil_type": "loamy"}
+    key = response_cache.key_for("irrigation_chain", base)
+    assert key != response_cache.key_for("irrigation_chain", dict(base, crop="rice"))
+    assert key != response_cache.key_for("irrigation_chain", dict(base, days_after_sowing=40))
+    assert key != response_cache.key_for("soil_chain", {"location": "Pune", "crop": "wheat"})
+
+
+def test_uncached_modules_have_no_key():
+    assert response_cache.key_for("irrigation_plots", {"plots": []}) is None
+    assert response_cache.key_for(None, {}) is None
+
+
+def test_headers_keep_responses_out_of_shared_caches():
+    entry = {"body": {}, "etag": "abc", "expires": time.time() + 60}
+    headers = response_cache.headers(entry, "HIT")
+    assert headers["Cache-Control"].startswith("private, max-age=")
+    assert "public" not in headers["Cache-Control"]
+    assert headers["Vary"] == "x-api-key"
+    assert headers["ETag"] == '"abc"'
+
+
+def test_errors_are_not_cacheable():
+    assert response_cache.cacheable({"module": "crop_chain", "result": {"crops": []}})
+    assert not response_cache.cacheable({"error": "boom"})
+    assert not response_cache.cacheable({"module": "crop_chain", "result": {"error": "boom"}})
+
+
+def test_degraded_answers_are_not_cacheable():
+    assert not response_cache.cacheable({"module": "qna_chain", "answer": "Sorry", "degraded": True})
+    assert not response_cache.cacheable({"module": "crop_chain", "result": {"crops": [], "degraded": True}})
@@ -0,0 +1,64 @@
+import asyncio, random, threading, time
+
+from chains.router import detect_module, dispatch_batch, dispatch_batch_async
+
+
+def test_detect_module():
+    assert detect_module({"query": "gehu me khad"}) == "qna_chain"
+    assert detect_module({"location": "Pune", "season": "kharif"}) == "crop_chain"
+    assert detect_module({"crop": "wheat", "location": "Pune"}) == "soil_chain"
+    assert detect_module({"city": "Pune"}) is None
+
+
+def test_batch_dedupes_and_keeps_input_order():
+    calls, lock = [], threading.Lock()
+
+    def handle(item):
+        time.sleep(random.uniform(0, 0.02))
+        with lock:
+            calls.append(item["query"])
+        return {"answer": item["query"].upper()}
+
+    items = [{"query": q} for q in ["a", "b", "a", "c", "b", "a"]]
+    results = dispatch_batch(items, handle)
+    assert [r["answer"] for r in results] == ["A", "B", "A", "C", "B", "A"]
+    assert [r["index"] for r in results] == list(range(6))
+    assert sorted(calls) == ["a", "b", "c"]
+
+
+def test_batch_dedupe_ignores_key_order():
+    calls = []
+    results = dispatch_batch([{"crop": "wheat", "location": "Pune"}, {"location": "Pune", "crop": "wheat"}],
+                             lambda item: calls.append(item) or {"ok": True})
+    assert len(calls) == 1 and [r["index"] for r in results] == [0, 1]
+
+
+def test_failing_item_only_fails_its_own_slot():
+    def handle(item):
+        if item["query"] == "bad":
+            raise ValueError("boom")
+        return {"answer": item["query"]}
+
+    results = dispatch_batch([{"query": "ok"}, {"query": "bad"}, "not a dict"], handle)
+    assert results[0] == {"answer": "ok", "index": 0}
+    assert results[1] == {"error": "boom", "index": 1}
+    assert "error" in results[2] and results[2]["index"] == 2
+
+
+def test_async_batch_dedupes_and_keeps_input_order():
+    calls = []
+
+    async def handle(item):
+        calls.append(item["query"])
+        await asyncio.sleep(random.uniform(0, 0.02))
+        if item["query"] == "bad":
+            raise ValueError("boom")
+        return {"answer": item["query"].upper()}
+
+    items = [{"query": q} for q in ["a", "bad", "b", "a", "b"]]
+    results = asyncio.run(dispatch_batch_async(items, handle))
+    assert results == [
+        {"answer": "A", "index": 0}, {"error": "boom", "index": 1}, {"answer": "B", "index": 2},
+        {"answer": "A", "index": 3}, {"answer": "B", "index": 4},
+    ]
+    assert sorted(calls) == ["a", "b", "bad"]
@@ -0,0 +1,58 @@
+import threading, time
+
+import pytest
+
+from services.stages import Stage, StageTimeout, run_stages
+
+
+def test_independent_stages_overlap_and_deps_get_results():
+    started = time.monotonic()
+    results = run_stages([
+        Stage("a", lambda: time.sleep(0.1) or 1),
+        Stage("b", lambda: time.sleep(0.1) or 2),
+        Stage("sum", lambda a, b: a + b, deps=["a", "b"]),
+    ])
+    assert results == {"a": 1, "b": 2, "sum": 3}
+    assert time.monotonic() - started < 0.18
+
+
+def test_optional_stage_failure_and_timeout_give_none():
+    release = threading.Event()
+    results = run_stages([
+        Stage("boom", lambda: 1 / 0, optional=True),
+        Stage("slow", release.wait, timeout=0.05, optional=True),
+        Stage("used", lambda boom, slow: (boom, slow), deps=["boom", "slow"]),
+    ])
+    release.set()
+    assert results == {"boom": None, "slow": None, "used": (None, None)}
+
+
+def test_required_stage_timeout_raises():
+    release = threading.Event()
+    with pytest.raises(StageTimeout, match="slow"):
+        run_stages([Stage("slow", release.wait, timeout=0.05)])
+    release.set()
+
+
+def test_graph_timeout_raises():
+    release = threading.Event()
+    with pytest.raises(StageTimeout):
+        run_stages([Stage("slow", release.wait)], timeout=0.05)
+    release.set()
+
+
+def test_dependency_failure_stops_dependents():
+    ran = []
+    with pytest.raises(ZeroDivisionError):
+        run_stages([
+            Stage("boom", lambda: 1 / 0),
+            Stage("after", lambda boom: ran.append(boom), deps=["boom"]),
+        ])
+    assert ran == []
+
+
+def test_bad_graphs_are_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        run_stages([Stage("a", lambda missing: 1, deps=["missing"])])
+    with pytest.raises(ValueError, match="cycle"):
+        run_stages([Stage("a", lambda b: 1, deps=["b"]), Stage("b", lambda a: 1, deps=["a"])])
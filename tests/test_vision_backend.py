@@ -0,0 +1,84 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("GROQ_API_KEY", "test")   # main() imports the disease chain
+
+transformers = pytest.importorskip("transformers")
+torch = pytest.importorskip("torch")
+from PIL import Image
+
+from services import vision_backend
+
+HAS_ONNX = all(importlib.util.find_spec(m) for m in ("onnx", "onnxruntime"))
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    config = transformers.MobileNetV2Config(depth_multiplier=0.35, num_labels=4,
+                                            id2label={i: f"class {i}" for i in range(4)})
+    return transformers.MobileNetV2ForImageClassification(config).eval()
+
+
+@pytest.fixture(scope="module")
+def samples(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("leaves")
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(4):
+        path = folder / f"leaf{i}.png"
+        Image.fromarray(rng.integers(0, 256, size=(240, 260, 3), dtype=np.uint8)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture(autouse=True)
+def artifact_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(vision_backend, "ARTIFACT_DIR", str(tmp_path))
+
+
+@pytest.mark.parametrize("backend", [
+    "torchscript",
+    pytest.param("onnx", marks=pytest.mark.skipif(not HAS_ONNX, reason="needs onnx and onnxruntime")),
+])
+def test_exported_backend_matches_eager(model, samples, backend):
+    loaded = vision_backend.load_backend(model, backend, quantize=False)
+    assert loaded.name == backend
+    report = vision_backend.parity_check(transformers.MobileNetV2ImageProcessor(), model, loaded, samples)
+    assert report["label_agreement"] == 1.0
+    assert report["max_prob_diff"] < 1e-4
+
+
+def test_batched_input_matches_single_images(model):
+    backend = vision_backend.load_backend(model, "torchscript", quantize=False)
+    pixels = torch.randn(3, 3, 224, 224)
+    batched = backend(pixels)
+    single = torch.cat([backend(pixels[i:i + 1]) for i in range(3)])
+    assert torch.allclose(batched, single, atol=1e-4)
+
+
+def test_unknown_backend_is_rejected(model):
+    with pytest.raises(ValueError):
+        vision_backend.load_backend(model, "tensorrt")
+
+
+def test_failed_backend_falls_back_to_eager_with_a_warning(model, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(vision_backend.log, "warning", lambda *args: warnings.append(args))
+    monkeypatch.setattr(vision_backend, "export", lambda *args: (_ for _ in ()).throw(RuntimeError("exporter missing")))
+    backend = vision_backend.load_backend(model, "onnx", quantize=False)
+    assert backend.name == "eager"
+    assert len(warnings) == 1 and "exporter missing" in str(warnings[0][-1])
+
+
+def test_parity_cli_fails_when_the_backend_falls_back(model, samples, monkeypatch):
+    monkeypatch.setattr(transformers.AutoImageProcessor, "from_pretrained",
+                        lambda name: transformers.MobileNetV2ImageProcessor())
+    monkeypatch.setattr(transformers.AutoModelForImageClassification, "from_pretrained", lambda name: model)
+    monkeypatch.setattr(vision_backend, "load_backend", lambda *args: vision_backend.EagerBackend(model))
+    folder = os.path.dirname(samples[0])
+    assert vision_backend.main(["parity", folder, "--backend", "onnx"]) == 1
+    assert vision_backend.main(["parity", folder, "--backend", "eager"]) == 0
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("torch")
+
+from services import vision_preprocess
+
+
+@pytest.fixture(params=["MobileNetV2ImageProcessor", "ViTImageProcessor"])
+def processor(request):
+    return getattr(transformers, request.param)()
+
+
+def test_fast_path_matches_the_processor(processor):
+    fast = vision_preprocess.FastPreprocessor(processor)
+    report = vision_preprocess.compare(processor, fast, vision_preprocess._probe_images())
+    assert report["max_abs_diff"] is not None and report["max_abs_diff"] <= vision_preprocess.TOLERANCE
+
+
+def test_load_preprocessor_picks_the_fast_path(processor):
+    assert vision_preprocess.load_preprocessor(processor).name == "fast"
+    assert vision_preprocess.load_preprocessor(processor, fast=False).name == "processor"
+
+
+def test_buffer_grows_to_the_largest_batch():
+    fast = vision_preprocess.FastPreprocessor(transformers.MobileNetV2ImageProcessor())
+    images = vision_preprocess._probe_images()
+    assert fast(images[:1]).shape[0] == 1 and len(fast._local.buffer) == 1
+    assert fast(images[:3]).shape[0] == 3 and len(fast._local.buffer) == 3
+    assert fast(images[:2]).shape[0] == 2 and len(fast._local.buffer) == 3
+
+
+def test_pixel_values_share_the_buffer():
+    fast = vision_preprocess.FastPreprocessor(transformers.MobileNetV2ImageProcessor())
+    pixels = fast(vision_preprocess._probe_images()[:2]).numpy()
+    assert np.shares_memory(pixels, fast._local.buffer)